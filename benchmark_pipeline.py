@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Python data pipeline
+
+Times the generator loaders/converters on files from generators_gamma/ and the
+statistics parsers and summaries on old_statistics/, each at a small, medium
+and large n. For every case the median wall time over several runs, the
+throughput (MB/s of input and items/s) and the peak Python heap (tracemalloc,
+NumPy buffers included) are reported.
+
+    python benchmark_pipeline.py --save-baseline        # record a baseline
+    python benchmark_pipeline.py                        # compare against it
+
+Comparison exits with status 1 if a case got slower or uses more memory than
+the baseline by more than --tolerance.
+"""
+
+import io
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+from pathlib import Path
+from statistics import median
+
+import numpy as np
+
+from generator_store import load_generators, load_text_generators, write_generators, KIND_GAMMA
+from gamma_isomorphism import parse_matrices, process_file, SRC_DIR
+from sagegen_parallel import load_generators_from_file, matrices_to_numpy, worker_command, GammaWorker
+from farey_symbol import gamma_generators
+from stats_data import (
+    deserialize_check_results, parse_check_results, create_summary_dataframe,
+    load_generator_matrices_for_n
+)
+
+BASELINE_VERSION = 1
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+STATS_DIR = Path('old_statistics')
+
+GENERATOR_SIZES = {'small': 20, 'medium': 60, 'large': 97}
+STATS_SIZES = {'small': 12, 'medium': 30, 'large': 41}
+# Computing generators is far slower than reading them
+COMPUTE_SIZES = {'small': 10, 'medium': 25, 'large': 40}
+
+
+def generator_file(n):
+    return SRC_DIR / f"gamma_{n}_generators.txt"
+
+
+def stats_file(n):
+    return STATS_DIR / f"gamma_{n}_stat.txt"
+
+
+class Case:
+    """
+    One benchmark at one size. setup() returns the argument passed to run(),
+    its cost is not measured. input_bytes and items set the throughput units.
+    """
+    def __init__(self, name, size, n, run, setup=None, input_path=None, items=None):
+        self.name = name
+        self.size = size
+        self.n = n
+        self.run = run
+        self.setup = setup or (lambda: None)
+        self.input_bytes = os.path.getsize(input_path) if input_path else None
+        self.items = items
+
+    @property
+    def key(self):
+        return f"{self.name}[{self.size}]"
+
+
+def quiet(fn, *args):
+    # Several loaders print progress, keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+
+def generator_cases(workdir):
+    cases = []
+    for size, n in GENERATOR_SIZES.items():
+        path = generator_file(n)
+        if not path.exists():
+            print(f"Skipping generator benchmarks at {size}: {path} not found")
+            continue
+        count = len(parse_matrices(path))
+        store = workdir / f"gamma_{n}_generators.bin"
+        write_generators(store, load_text_generators(path), n, KIND_GAMMA)
+
+        cases += [
+            Case('parse_matrices', size, n, lambda _, p=path: parse_matrices(p),
+                 input_path=path, items=count),
+            Case('process_file', size, n,
+                 lambda _, p=path, n=n: process_file(p, workdir / f"tilde_{n}.txt", n),
+                 input_path=path, items=count),
+            Case('load_generators_from_file', size, n,
+                 lambda _, p=path: quiet(load_generators_from_file, p),
+                 input_path=path, items=count),
+            Case('matrices_to_numpy', size, n, matrices_to_numpy,
+                 setup=lambda p=path: quiet(load_generators_from_file, p),
+                 input_path=path, items=count),
+            Case('load_text_generators', size, n, lambda _, p=path: load_text_generators(p),
+                 input_path=path, items=count),
+            Case('load_generator_store', size, n,
+                 lambda _, s=store: np.asarray(load_generators(s, verify=True)[1]).sum(),
+                 input_path=store, items=count),
+            Case('load_generator_matrices', size, n,
+                 lambda _, p=path, n=n: load_generator_matrices_for_n(str(p), n),
+                 input_path=path, items=count),
+        ]
+    return cases
+
+
+def stats_cases():
+    cases = []
+    for size, n in STATS_SIZES.items():
+        path = stats_file(n)
+        if not path.exists():
+            print(f"Skipping statistics benchmarks at {size}: {path} not found")
+            continue
+        count = len(parse_check_results(path))
+        cases += [
+            Case('deserialize_check_results', size, n, lambda _, p=path: deserialize_check_results(p),
+                 input_path=path, items=count),
+            Case('parse_check_results', size, n, lambda _, p=path: parse_check_results(p),
+                 input_path=path, items=count),
+            Case('create_summary_dataframe', size, n,
+                 lambda results, n=n: create_summary_dataframe({n: results}),
+                 setup=lambda p=path: parse_check_results(p),
+                 input_path=path, items=count),
+        ]
+    return cases
+
+
+def compute_cases(include_sage):
+    cases = []
+    for size, n in COMPUTE_SIZES.items():
+        path = generator_file(n)
+        count = len(parse_matrices(path)) if path.exists() else None
+        cases.append(Case('farey_generators', size, n, lambda _, n=n: gamma_generators(n), items=count))
+        if include_sage:
+            cases.append(Case('sage_generators', size, n, None, items=count))
+    return cases
+
+
+class SageRunner:
+    """
+    Times Sage requests on one persistent worker so interpreter start-up is
+    paid once and not counted
+    """
+    def __init__(self, workdir):
+        self.workdir = workdir
+        self.worker = None
+
+    def __call__(self, n):
+        if self.worker is None:
+            self.worker = GammaWorker(worker_command('sage'))
+        result = self.worker.request(n, str(self.workdir / f"sage_{n}.txt"))
+        if not result.get('ok'):
+            raise RuntimeError(result.get('error'))
+        return result
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.close()
+
+
+def measure(case, repeat, min_time, trace_memory=True):
+    arg = case.setup()
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeat:
+        gc.collect()
+        t0 = time.perf_counter()
+        case.run(arg)
+        times.append(time.perf_counter() - t0)
+        # Long cases stop early once they have used their time budget
+        if time.perf_counter() - start > min_time and len(times) >= 1:
+            break
+
+    peak = None
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        case.run(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    seconds = median(times)
+    return {
+        'name': case.name,
+        'size': case.size,
+        'n': case.n,
+        'runs': len(times),
+        'median_seconds': seconds,
+        'best_seconds': min(times),
+        'mb_per_second': case.input_bytes / seconds / 1e6 if case.input_bytes else None,
+        'items_per_second': case.items / seconds if case.items else None,
+        'peak_mb': peak / 1e6 if peak is not None else None,
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if data.get('version') != BASELINE_VERSION:
+        raise ValueError(f"{path}: unsupported baseline version {data.get('version')}")
+    return data
+
+
+def save_baseline(path, results):
+    data = {
+        'version': BASELINE_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.node(),
+        'results': results,
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def compare(result, base, tolerance):
+    """
+    Regression messages for one case, empty if it is within tolerance
+    """
+    problems = []
+    if base.get('n') != result['n']:
+        return problems
+    ratio = result['median_seconds'] / base['median_seconds']
+    if ratio > 1 + tolerance:
+        problems.append(f"time x{ratio:.2f} ({base['median_seconds']:.4f}s -> {result['median_seconds']:.4f}s)")
+    if result['peak_mb'] is not None and base.get('peak_mb'):
+        mem_ratio = result['peak_mb'] / base['peak_mb']
+        if mem_ratio > 1 + tolerance:
+            problems.append(f"peak memory x{mem_ratio:.2f} ({base['peak_mb']:.1f}MB -> {result['peak_mb']:.1f}MB)")
+    return problems
+
+
+def format_row(result, base):
+    rate = f"{result['mb_per_second']:8.1f} MB/s" if result['mb_per_second'] else ' ' * 13
+    items = f"{result['items_per_second']:12.0f} it/s" if result['items_per_second'] else ' ' * 17
+    peak = f"{result['peak_mb']:8.1f} MB" if result['peak_mb'] is not None else ' ' * 11
+    vs = ''
+    if base and base.get('n') == result['n']:
+        vs = f"  x{result['median_seconds'] / base['median_seconds']:.2f} vs baseline"
+    key = f"{result['name']}[{result['size']}] n={result['n']}"
+    return f"{key:<45} {result['median_seconds']:9.4f}s {rate} {items} {peak}{vs}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Python data pipeline')
+    parser.add_argument('-k', '--filter', help='only run cases whose name contains this string')
+    parser.add_argument('--sizes', nargs='+', choices=['small', 'medium', 'large'], default=['small', 'medium', 'large'])
+    parser.add_argument('--repeat', type=int, default=5, help='maximum runs per case')
+    parser.add_argument('--min-time', type=float, default=2.0, help='stop repeating a case after this many seconds')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--sage', action='store_true', help='also time Sage through a persistent worker')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown / memory growth')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix='hasty_bench_'))
+    sage = SageRunner(workdir)
+    try:
+        cases = generator_cases(workdir) + stats_cases() + compute_cases(args.sage)
+        for case in cases:
+            if case.name == 'sage_generators':
+                case.run = lambda _, n=case.n: sage(n)
+        cases = [c for c in cases if c.size in args.sizes]
+        if args.filter:
+            cases = [c for c in cases if args.filter in c.name]
+
+        baseline = None if args.save_baseline else load_baseline(args.baseline)
+        base_results = baseline['results'] if baseline else {}
+
+        results = {}
+        regressions = []
+        for case in cases:
+            # Memory of a subprocess is not visible to tracemalloc
+            trace_memory = not args.no_memory and case.name != 'sage_generators'
+            result = measure(case, args.repeat, args.min_time, trace_memory)
+            results[case.key] = result
+            base = base_results.get(case.key)
+            print(format_row(result, base))
+            if base:
+                regressions += [f"{case.key}: {p}" for p in compare(result, base, args.tolerance)]
+    finally:
+        sage.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    if args.save_baseline:
+        # Keep baseline entries of cases that were not run this time
+        previous = load_baseline(args.baseline)
+        merged = dict(previous['results']) if previous else {}
+        merged.update(results)
+        save_baseline(args.baseline, merged)
+        print(f"Baseline with {len(merged)} cases written to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+    if regressions:
+        print("-" * 60)
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for r in regressions:
+            print(f"  {r}")
+        return 1
+    print(f"No regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Dependency index over the generators of one Gamma(n)
+
+Generator i depends on the generators in its gens_giving_success. The index
+keeps these edges as CSR arrays in both directions, restricted to solved
+generators, together with the topological depth of every generator (0 for
+generators solved without using any other solved generator). Tree queries are
+breadth-first and bounded by a node budget, so deep or dense lineages cost at
+most the budget. For the network view large graphs are summarized into hub
+groups of at most a given number of nodes.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+UNREACHED = -1
+
+
+class DependencyTree(NamedTuple):
+    nodes: np.ndarray       # generator indices in BFS order, nodes[0] is the root
+    parents: np.ndarray     # position in nodes of each node's BFS parent, -1 for the root
+    levels: np.ndarray      # BFS distance from the root
+    truncated: bool         # True if the node budget stopped the search
+
+
+class NetworkSummary(NamedTuple):
+    group_of: np.ndarray        # group of every generator, -1 for unsolved ones
+    group_sizes: np.ndarray
+    group_depths: np.ndarray    # topological depth shown for the group
+    group_hubs: np.ndarray      # hub generator of the group, -1 for a depth group
+    edge_sources: np.ndarray    # group -> group dependency edges
+    edge_targets: np.ndarray
+    edge_weights: np.ndarray    # number of generator edges behind each group edge
+
+
+def _csr(rows, cols, num_rows):
+    order = np.argsort(rows, kind='stable')
+    offsets = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_rows), out=offsets[1:])
+    return offsets, cols[order]
+
+
+class DependencyIndex:
+    """
+    CSR dependency graph of the solved generators of one CheckResults
+    """
+    def __init__(self, results):
+        num = len(results)
+        self.num_generators = num
+        self.successful = results.successful()
+
+        rows = np.repeat(np.arange(num, dtype=np.int64), results.sequence_lengths())
+        cols = results.success_values
+        # Only edges between solved generators with a valid index are kept
+        valid = (cols >= 0) & (cols < num)
+        valid[valid] &= self.successful[cols[valid]]
+        valid &= self.successful[rows]
+        rows, cols = rows[valid], cols[valid]
+
+        self.offsets, self.targets = _csr(rows, cols, num)
+        self.reverse_offsets, self.sources = _csr(cols, rows, num)
+        self.depths = self._topological_depths()
+        self._closure_sizes = None
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    def dependencies(self, i):
+        """Generators that generator i was built from"""
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def dependents(self, i):
+        """Generators built using generator i"""
+        return self.sources[self.reverse_offsets[i]:self.reverse_offsets[i + 1]]
+
+    def in_degrees(self):
+        """Number of generators using each generator"""
+        return np.diff(self.reverse_offsets)
+
+    def summarize(self, max_nodes=2000):
+        """
+        Collapse the solved generators into at most max_nodes groups. The most
+        used generators (hubs) get a group each, every other generator joins
+        the group of its most used hub dependency, and generators without one
+        are grouped by topological depth. When there are more depth levels
+        than max_nodes, consecutive levels share a group shown at the lowest
+        depth among its generators. When everything fits, every solved generator is its own group.
+        """
+        num = self.num_generators
+        solved = np.flatnonzero(self.successful)
+        in_degrees = self.in_degrees()
+        max_depth = int(self.depths.max()) if num else -1
+        # Depth groups for depths -1 (on a cycle) .. max_depth, merged into
+        # num_buckets runs of consecutive levels when they exceed the budget
+        num_levels = max_depth + 2
+        num_buckets = max(1, min(num_levels, max_nodes))
+        bucket_of_level = np.arange(num_levels) * num_buckets // max(num_levels, 1)
+
+        if len(solved) <= max_nodes:
+            hubs = solved
+        else:
+            k = max(0, max_nodes - num_buckets)
+            hubs = solved[np.argsort(-in_degrees[solved], kind='stable')[:k]]
+            hubs = hubs[in_degrees[hubs] > 0]
+
+        raw_group = np.full(num, -1, dtype=np.int64)
+        raw_group[hubs] = np.arange(len(hubs))
+
+        rows = np.repeat(np.arange(num, dtype=np.int64), np.diff(self.offsets))
+        targets = self.targets
+        candidate = (raw_group[rows] < 0) & (raw_group[targets] >= 0)
+        if candidate.any():
+            c_rows, c_targets = rows[candidate], targets[candidate]
+            order = np.lexsort((-in_degrees[c_targets], c_rows))
+            c_rows, c_targets = c_rows[order], c_targets[order]
+            first = np.unique(c_rows, return_index=True)[1]
+            raw_group[c_rows[first]] = raw_group[c_targets[first]]
+
+        rest = solved[raw_group[solved] < 0]
+        raw_group[rest] = len(hubs) + bucket_of_level[self.depths[rest] + 1]
+
+        # Lowest depth of the generators in each depth group
+        bucket_depths = np.full(num_buckets, max_depth, dtype=np.int64)
+        np.minimum.at(bucket_depths, bucket_of_level[self.depths[rest] + 1], self.depths[rest])
+        raw_depths = np.concatenate([self.depths[hubs], bucket_depths])
+        raw_hubs = np.concatenate([hubs, np.full(len(bucket_depths), -1, dtype=np.int64)])
+
+        used, group_of_solved = np.unique(raw_group[solved], return_inverse=True)
+        group_of = np.full(num, -1, dtype=np.int64)
+        group_of[solved] = group_of_solved
+        num_groups = len(used)
+
+        sources, dests = group_of[rows], group_of[targets]
+        keep = sources != dests
+        pairs, weights = np.unique(sources[keep] * num_groups + dests[keep], return_counts=True)
+
+        return NetworkSummary(
+            group_of,
+            np.bincount(group_of_solved, minlength=num_groups),
+            raw_depths[used],
+            raw_hubs[used],
+            pairs // max(num_groups, 1),
+            pairs % max(num_groups, 1),
+            weights
+        )
+
+    def _topological_depths(self):
+        # Kahn's algorithm run one whole level at a time. Generators on a
+        # dependency cycle are never released and keep UNREACHED.
+        num = self.num_generators
+        depths = np.full(num, UNREACHED, dtype=np.int64)
+        remaining = np.diff(self.offsets)
+        frontier = np.flatnonzero(self.successful & (remaining == 0))
+        level = 0
+        while frontier.size:
+            depths[frontier] = level
+            starts = self.reverse_offsets[frontier]
+            counts = self.reverse_offsets[frontier + 1] - starts
+            if counts.sum() == 0:
+                break
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            released = self.sources[positions]
+            remaining = remaining - np.bincount(released, minlength=num)
+            frontier = np.unique(released[remaining[released] == 0])
+            level += 1
+        return depths
+
+    def levels(self):
+        """Generator indices grouped by topological depth"""
+        order = np.argsort(self.depths, kind='stable')
+        depths = self.depths[order]
+        keep = depths >= 0
+        order, depths = order[keep], depths[keep]
+        bounds = np.flatnonzero(np.diff(depths)) + 1
+        return np.split(order, bounds)
+
+    def closure_sizes(self):
+        """
+        Number of distinct generators each generator transitively depends on.
+        Computed once on first use with one bitset per generator, so memory
+        grows as num_generators**2 / 8 bytes in the worst case.
+        """
+        if self._closure_sizes is not None:
+            return self._closure_sizes
+        num = self.num_generators
+        reach = [0] * num
+        sizes = np.zeros(num, dtype=np.int64)
+        for level in self.levels():
+            for i in level.tolist():
+                bits = 0
+                for j in self.dependencies(i).tolist():
+                    bits |= reach[j] | (1 << j)
+                reach[i] = bits
+                sizes[i] = bin(bits).count('1')
+        self._closure_sizes = sizes
+        return sizes
+
+    def tree(self, root, max_nodes=500):
+        """
+        Breadth-first lineage of root through its dependencies. Every
+        generator appears once, at its shortest distance from root.
+        """
+        if not self.successful[root]:
+            empty = np.empty(0, dtype=np.int64)
+            return DependencyTree(empty, empty, empty, False)
+        nodes = [root]
+        parents = [-1]
+        levels = [0]
+        seen = {root}
+        head = 0
+        truncated = False
+        while head < len(nodes) and not truncated:
+            i = nodes[head]
+            for j in self.dependencies(i).tolist():
+                if j in seen:
+                    continue
+                if len(nodes) >= max_nodes:
+                    truncated = True
+                    break
+                seen.add(j)
+                nodes.append(j)
+                parents.append(head)
+                levels.append(levels[head] + 1)
+            head += 1
+        return DependencyTree(
+            np.array(nodes, dtype=np.int64),
+            np.array(parents, dtype=np.int64),
+            np.array(levels, dtype=np.int64),
+            truncated
+        )
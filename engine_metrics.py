@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Aggregation of the engine's per-phase metrics
+
+The C++ engine appends one JSON object per TestGammaN phase to
+metrics/engine_metrics.jsonl (HASTY_METRICS_FILE overrides the path). Phases
+are initial_check, build_equiv_classes, non_mult, one mult record per round of
+the MULT1 -> MULT2 -> MULT2_AK escalation, and a closing run record with the
+totals. This tool loads them into a flat DataFrame and reports, per n, where
+the time went: per phase and mult type, per round, and how busy the thread
+pools were.
+
+    python engine_metrics.py                    # all n in the default file
+    python engine_metrics.py --n 97 --rounds    # round by round for Gamma(97)
+"""
+
+import sys
+import json
+import argparse
+
+import pandas as pd
+
+DEFAULT_METRICS = 'metrics/engine_metrics.jsonl'
+
+SUM_COLUMNS = [
+    'wall_seconds', 'cpu_seconds', 'products', 'divides_radical_calls', 'check_element_calls', 'wide_fallbacks',
+    'classes_tested', 'classes_skipped', 'class_members_tested', 'new_successful', 'new_successful_classes'
+]
+# Per round levels, not summed over rounds
+LEVEL_COLUMNS = ['pair_cache_size', 'pair_cache_capacity']
+
+
+def pool_names(df):
+    """
+    Names of the thread pools reported in df, older runs had a small and a
+    large pool, newer ones a single scheduler
+    """
+    return [c[len('pool_'):-len('_threads')] for c in df.columns
+            if c.startswith('pool_') and c.endswith('_threads')]
+
+
+def load_engine_metrics(path=DEFAULT_METRICS):
+    """
+    One row per phase record. Pool statistics become pool_<name>_<field>
+    columns, slowest_classes stays a list per row.
+    """
+    records = []
+    with open(path, 'r') as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                # A run killed while writing leaves a partial last line
+                print(f"{path}:{lineno}: skipping malformed record ({e})")
+                continue
+            for pool, stats in record.pop('pools', {}).items():
+                for field, value in stats.items():
+                    record[f"pool_{pool}_{field}"] = value
+            records.append(record)
+
+    df = pd.DataFrame.from_records(records)
+    if df.empty:
+        return df
+    df['mult_type'] = df['mult_type'].fillna('')
+    for col in SUM_COLUMNS + LEVEL_COLUMNS:
+        # Counters added after a metrics file was started
+        df[col] = df[col].fillna(0) if col in df else 0
+    for pool in pool_names(df):
+        # Fraction of the pool's thread time spent running tasks
+        capacity = df[f"pool_{pool}_threads"] * df['wall_seconds']
+        df[f"pool_{pool}_utilization"] = (df[f"pool_{pool}_busy_seconds"] / capacity).where(capacity > 0)
+    return df
+
+
+def latest_runs(df):
+    """
+    Only the records of the most recent finished run of every n, or of the
+    unfinished one if n never finished. Runs of an n end with their run record.
+    """
+    if df.empty:
+        return df
+    is_run = (df['phase'] == 'run').astype(int)
+    run_id = is_run.groupby(df['n']).cumsum() - is_run
+    last_finished = run_id.where(is_run == 1).groupby(df['n']).transform('max')
+    last = last_finished.fillna(run_id.groupby(df['n']).transform('max'))
+    return df[run_id == last]
+
+
+def phase_summary(df):
+    """
+    Totals per n, phase and mult type, with each phase's share of the run
+    """
+    phases = df[df['phase'] != 'run']
+    summary = phases.groupby(['n', 'phase', 'mult_type'], sort=False).agg(
+        rounds=('round', 'size'),
+        **{col: (col, 'sum') for col in SUM_COLUMNS},
+        max_class_size=('max_class_size', 'max'),
+    ).reset_index()
+    total_wall = summary.groupby('n')['wall_seconds'].transform('sum')
+    summary['wall_share'] = summary['wall_seconds'] / total_wall
+    summary['cpu_per_wall'] = summary['cpu_seconds'] / summary['wall_seconds']
+    grouped = phases.groupby(['n', 'phase', 'mult_type'], sort=False)
+    for pool in pool_names(phases):
+        capacity = (phases[f"pool_{pool}_threads"] * phases['wall_seconds']).groupby(
+            [phases['n'], phases['phase'], phases['mult_type']], sort=False).sum()
+        utilization = grouped[f"pool_{pool}_busy_seconds"].sum() / capacity
+        summary[f"pool_{pool}_utilization"] = utilization.values
+        summary[f"pool_{pool}_max_queue_depth"] = grouped[f"pool_{pool}_max_queue_depth"].max().values
+    return summary
+
+
+def round_table(df, n):
+    columns = [
+        'round', 'phase', 'mult_type', 'wall_seconds', 'products', 'classes_tested', 'classes_skipped',
+        'max_class_size', 'pair_cache_size', 'new_successful', 'remaining'
+    ] + [f"pool_{pool}_utilization" for pool in pool_names(df)]
+    rounds = df[(df['n'] == n) & (df['phase'] != 'run')]
+    return rounds[columns].reset_index(drop=True)
+
+
+def slowest_classes(df, n, top=10):
+    """
+    The most expensive class tests of n over all phases
+    """
+    rows = []
+    for _, record in df[(df['n'] == n) & (df['phase'] != 'run')].iterrows():
+        for entry in record.get('slowest_classes') or []:
+            rows.append({
+                'phase': record['phase'],
+                'mult_type': record['mult_type'],
+                'round': record['round'],
+                'seconds': entry['seconds'],
+                'class_size': entry['size'],
+            })
+    if not rows:
+        return pd.DataFrame(columns=['phase', 'mult_type', 'round', 'seconds', 'class_size'])
+    return pd.DataFrame(rows).sort_values('seconds', ascending=False).head(top).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize engine phase metrics')
+    parser.add_argument('metrics', nargs='?', default=DEFAULT_METRICS)
+    parser.add_argument('--n', type=int, nargs='+', help='only these n')
+    parser.add_argument('--all-runs', action='store_true', help='aggregate every run instead of the latest per n')
+    parser.add_argument('--rounds', action='store_true', help='also list every phase/round')
+    parser.add_argument('--csv', help='write the phase summary to this CSV file')
+    args = parser.parse_args(argv)
+
+    df = load_engine_metrics(args.metrics)
+    if df.empty:
+        print(f"No metrics in {args.metrics}")
+        return 1
+    if not args.all_runs:
+        df = latest_runs(df)
+    if args.n:
+        df = df[df['n'].isin(args.n)]
+
+    summary = phase_summary(df)
+    if args.csv:
+        summary.to_csv(args.csv, index=False)
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.3f}'.format):
+        for n, group in summary.groupby('n'):
+            print(f"Gamma({n})")
+            print(group.drop(columns='n').to_string(index=False))
+            slow = slowest_classes(df, n, top=5)
+            if not slow.empty:
+                print("Slowest class tests:")
+                print(slow.to_string(index=False))
+            if args.rounds:
+                print("Rounds:")
+                print(round_table(df, n).to_string(index=False))
+            print("-" * 60)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Farey symbols for the principal congruence subgroups Gamma(n) without SageMath
+
+Follows the construction in SageMath's FareySymbol (farey.cpp, Monien/Kraemer):
+start from the fractions 0, 1, repeatedly split the free side with the largest
+diameter at its mediant and pair sides as soon as their pairing matrix lies in
++-Gamma(n). The generators come out in the same order as Gamma(n).generators().
+
+Instead of testing every free side for a partner, sides are looked up by their
+matrix [[a_right, a_left], [b_right, b_left]] mod n: side j pairs with side i
+exactly when M_j = +-M_i S^-1 (mod n).
+"""
+
+import sys
+import heapq
+import argparse
+from fractions import Fraction
+from pathlib import Path
+
+import numpy as np
+
+from generator_store import write_generators, KIND_GAMMA, KIND_TILDE, SRC_DIR, DST_DIR, STORE_SUFFIX
+
+EVEN = -2
+ODD = -3
+NO = 0
+
+INFINITY_LEFT = (-1, 0)
+INFINITY_RIGHT = (1, 0)
+
+SL2Z_S = (0, -1, 1, 0)
+SL2Z_T = (1, 1, 0, 1)
+MINUS_I = (-1, 0, 0, -1)
+
+
+def is_element_gamma(m, n):
+    a, b, c, d = m
+    return (a - 1) % n == 0 and b % n == 0 and c % n == 0 and (d - 1) % n == 0
+
+
+def is_element_pm_gamma(m, n):
+    return is_element_gamma(m, n) or is_element_gamma(tuple(-x for x in m), n)
+
+
+def _pairing_matrix(left_i, right_i, left_j, right_j):
+    # Matrix mapping side j onto side i (farey.cpp: FareySymbol::pairing_matrix)
+    ai, bi = left_i
+    ai1, bi1 = right_i
+    aj, bj = left_j
+    aj1, bj1 = right_j
+    return (aj1*bi1 + aj*bi, -aj*ai - aj1*ai1,
+            bj*bi + bj1*bi1, -ai1*bj1 - ai*bj)
+
+
+def _self_pairing_matrix(left, right, kind):
+    ai, bi = left
+    ai1, bi1 = right
+    if kind == EVEN:
+        return (ai1*bi1 + ai*bi, -ai*ai - ai1*ai1,
+                bi*bi + bi1*bi1, -ai1*bi1 - ai*bi)
+    return (ai1*bi1 + ai*bi1 + ai*bi, -ai*ai - ai*ai1 - ai1*ai1,
+            bi*bi + bi*bi1 + bi1*bi1, -ai1*bi1 - ai1*bi - ai*bi)
+
+
+def _pm_key(m, n):
+    a, b, c, d = m
+    t = (a % n, b % n, c % n, d % n)
+    u = (-a % n, -b % n, -c % n, -d % n)
+    return t if t < u else u
+
+
+class FareySymbol:
+    """
+    Farey symbol of Gamma(n): fractions, side pairings and generators
+    """
+    def __init__(self, n):
+        if n < 1:
+            raise ValueError(f"Level must be positive, got {n}")
+        self.n = n
+        self.level = n
+        self._sides = []         # side id -> [left vertex, right vertex]
+        self._keys = []          # side id -> +-[[a_right, a_left], [b_right, b_left]] mod n
+        self._pairing = []       # side id -> EVEN / ODD / NO / pairing label
+        self._partner = []       # side id -> paired side id
+        self._pairing_max = NO
+        self._generators = None
+        if n > 1:
+            self._build()
+
+    # --- construction -----------------------------------------------------
+
+    def _partner_key(self, sid):
+        (a0, b0), (a1, b1) = self._sides[sid]
+        # M S^-1 with S^-1 = [[0, 1], [-1, 0]]
+        return _pm_key((-a0, a1, -b0, b1), self.n)
+
+    def _new_side(self, left, right):
+        sid = len(self._sides)
+        self._sides.append([left, right])
+        self._keys.append(_pm_key((right[0], left[0], right[1], left[1]), self.n))
+        self._pairing.append(NO)
+        self._partner.append(-1)
+        return sid
+
+    def _position(self, sid):
+        left = self._sides[sid][0]
+        if left == INFINITY_LEFT:
+            return Fraction(-10**18)
+        return Fraction(left[0], left[1])
+
+    def _build(self):
+        n = self.n
+        self._free = {}
+        self._heap = []
+
+        if is_element_gamma((-1, 1, -1, 0), n):
+            vertices = [(-1, 1), (0, 1)]
+        else:
+            vertices = [(0, 1), (1, 1)]
+
+        first = self._new_side(INFINITY_LEFT, vertices[0])
+        middle = self._new_side(vertices[0], vertices[1])
+        last = self._new_side(vertices[1], INFINITY_RIGHT)
+        self._first, self._last = first, last
+        for sid in (first, middle, last):
+            self._register_free(sid)
+        for sid in (first, middle, last):
+            self._check_pair(sid)
+
+        while True:
+            sid = self._missing_pair()
+            if sid is None:
+                break
+            left_id, right_id = self._split(sid)
+            self._check_pair(left_id)
+            self._check_pair(right_id)
+
+        del self._free, self._heap
+
+    def _register_free(self, sid):
+        self._free.setdefault(self._keys[sid], []).append(sid)
+        if sid != self._first and sid != self._last:
+            (a0, b0), (a1, b1) = self._sides[sid]
+            # Largest diameter 1/(b0*b1) first, ties broken by position. The
+            # denominators stay far below 2**26, so a0/b0 orders them exactly.
+            heapq.heappush(self._heap, (b0*b1, a0 / b0, sid))
+
+    def _unregister_free(self, sid):
+        own = self._keys[sid]
+        bucket = self._free[own]
+        bucket.remove(sid)
+        if not bucket:
+            del self._free[own]
+
+    def _missing_pair(self):
+        if self._pairing[self._last] == NO:
+            return self._last
+        if self._pairing[self._first] == NO:
+            return self._first
+        while self._heap:
+            _, _, sid = self._heap[0]
+            if self._pairing[sid] == NO and self._sides[sid] is not None:
+                return sid
+            heapq.heappop(self._heap)
+        return None
+
+    def _split(self, sid):
+        left, right = self._sides[sid]
+        if sid == self._last:
+            vertex = (left[0] + 1, left[1])
+        elif sid == self._first:
+            vertex = (right[0] - 1, right[1])
+        else:
+            vertex = (left[0] + right[0], left[1] + right[1])
+
+        self._unregister_free(sid)
+        self._sides[sid] = None
+        left_id = self._new_side(left, vertex)
+        right_id = self._new_side(vertex, right)
+        if sid == self._first:
+            self._first = left_id
+        if sid == self._last:
+            self._last = right_id
+        self._register_free(left_id)
+        self._register_free(right_id)
+        return left_id, right_id
+
+    def _check_pair(self, sid):
+        if self._pairing[sid] != NO:
+            return
+        n = self.n
+        left, right = self._sides[sid]
+        for kind in (EVEN, ODD):
+            if is_element_pm_gamma(_self_pairing_matrix(left, right, kind), n):
+                self._unregister_free(sid)
+                self._pairing[sid] = kind
+                self._partner[sid] = sid
+                return
+
+        candidates = [j for j in self._free.get(self._partner_key(sid), ()) if j != sid]
+        if not candidates:
+            return
+        other = min(candidates, key=self._position)
+        self._unregister_free(sid)
+        self._unregister_free(other)
+        self._pairing_max += 1
+        self._pairing[sid] = self._pairing_max
+        self._pairing[other] = self._pairing_max
+        self._partner[sid] = other
+        self._partner[other] = sid
+
+    # --- results ----------------------------------------------------------
+
+    def _ordered_sides(self):
+        live = [sid for sid, side in enumerate(self._sides) if side is not None]
+        return sorted(live, key=self._position)
+
+    def fractions(self):
+        """
+        Farey sequence x_0 < x_1 < ... of the symbol
+        """
+        return [Fraction(*self._sides[sid][1]) for sid in self._ordered_sides()[:-1]]
+
+    def pairings(self):
+        """
+        Pairing labels of the sides in order, -2 = even, -3 = odd, k > 0 = free pair k
+        """
+        return [self._pairing[sid] for sid in self._ordered_sides()]
+
+    def nu2(self):
+        return self._pairing.count(EVEN)
+
+    def nu3(self):
+        return self._pairing.count(ODD)
+
+    def generators(self):
+        """
+        Generators as a list of (a, b, c, d) tuples, in SageMath's order
+        """
+        if self._generators is not None:
+            return self._generators
+        n = self.n
+        if n == 1:
+            self._generators = [SL2Z_S, SL2Z_T]
+            return self._generators
+
+        gens = []
+        seen = set()
+        contains_minus_i = is_element_gamma(MINUS_I, n)
+        for sid in self._ordered_sides():
+            label = self._pairing[sid]
+            if label in seen:
+                continue
+            left, right = self._sides[sid]
+            if label in (EVEN, ODD):
+                m = _self_pairing_matrix(left, right, label)
+            else:
+                other_left, other_right = self._sides[self._partner[sid]]
+                m = _pairing_matrix(left, right, other_left, other_right)
+                seen.add(label)
+            if not is_element_gamma(m, n):
+                m = tuple(-x for x in m)
+            if label == ODD and contains_minus_i:
+                m = tuple(-x for x in m)
+            gens.append(m)
+        if self.nu2() == 0 and self.nu3() == 0 and contains_minus_i:
+            gens.append(MINUS_I)
+        self._generators = gens
+        return gens
+
+    def cusp_widths(self):
+        """
+        Widths of the vertices x_0, ..., x_k, infinity (farey.cpp: init_cusp_widths)
+        """
+        if self.n == 1:
+            return [Fraction(1)]
+        sides = self._ordered_sides()
+        pairing = [self._pairing[sid] for sid in sides]
+        A = [self._sides[sid][1] for sid in sides[:-1]] + [INFINITY_RIGHT]
+        widths = []
+        for i in range(len(A)):
+            am, bm = A[i - 1]
+            ap, bp = A[(i + 1) % len(A)]
+            w = Fraction(abs(am*bp - ap*bm))
+            if pairing[i] == ODD:
+                w += Fraction(1, 2)
+            if pairing[(i + 1) % len(A)] == ODD:
+                w += Fraction(1, 2)
+            widths.append(w)
+        return widths
+
+    def index(self):
+        """
+        Index of +-Gamma(n) in PSL(2, Z)
+        """
+        return int(sum(self.cusp_widths()))
+
+    def generators_array(self):
+        """
+        Generators as an (N,4) int64 array, object dtype if an entry overflows int64
+        """
+        gens = self.generators()
+        bound = np.iinfo(np.int64).max
+        dtype = np.int64 if all(abs(x) <= bound for m in gens for x in m) else object
+        return np.array(gens, dtype=dtype).reshape(-1, 4)
+
+    def __repr__(self):
+        return f"FareySymbol(Gamma({self.n}))"
+
+
+def gamma_generators(n):
+    """
+    Generators of Gamma(n) as an (N,4) array [a, b, c, d], same order as SageMath
+    """
+    return FareySymbol(n).generators_array()
+
+
+def compute_and_store_gamma(n, gamma_dir=SRC_DIR, tilde_dir=DST_DIR):
+    """
+    Compute Gamma(n) generators and write the raw and gamma_isomorphism
+    transformed binary stores
+    """
+    from gamma_isomorphism import gamma_isomorphism
+
+    gens = gamma_generators(n)
+    fname = f"gamma_{n}_generators{STORE_SUFFIX}"
+    Path(gamma_dir).mkdir(exist_ok=True)
+    Path(tilde_dir).mkdir(exist_ok=True)
+    write_generators(Path(gamma_dir) / fname, gens, n, KIND_GAMMA)
+    write_generators(Path(tilde_dir) / fname, gamma_isomorphism(gens, n), n, KIND_TILDE)
+    return len(gens)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute Gamma(n) generators with Farey symbols')
+    parser.add_argument('start_n', type=int)
+    parser.add_argument('end_n', type=int, nargs='?', help='inclusive, defaults to start_n')
+    args = parser.parse_args(argv)
+
+    end_n = args.end_n if args.end_n is not None else args.start_n
+    for n in range(args.start_n, end_n + 1):
+        count = compute_and_store_gamma(n)
+        print(f"Gamma({n}): {count} generators")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,48 +1,114 @@
 #!/usr/bin/env python3
 import os
+import sys
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from generator_store import write_generators, store_path_for, KIND_TILDE
 
 SRC_DIR = Path('generators_gamma')
 DST_DIR = Path('generators_gamma_tilde')
-DST_DIR.mkdir(exist_ok=True)
-
-def parse_matrices(filename):
-	with open(filename) as f:
-		lines = [line.strip() for line in f if line.strip()]
-	# Each 4 lines is a matrix
-	matrices = []
-	for i in range(0, len(lines), 4):
-		mat = [int(lines[i]), int(lines[i+1]), int(lines[i+2]), int(lines[i+3])]
-		matrices.append(mat)
-	return matrices
-
-def gamma_isomorphism(mat, n):
-	# mat: [x11, x12, x21, x22]
-	mat[0] -= 1
-	mat[3] -= 1
-	for i in range(4):
-		mat[i] //= n
-	return mat
-
-def format_matrix(mat, width=16):
-	# Format as comma-separated, fixed width
-	return ', '.join(f'{x:>{width}}' for x in mat)
+
+CHUNK_BYTES = 1 << 22
+
+def parse_matrices(filename, chunk_bytes=CHUNK_BYTES):
+	# One integer per line, each 4 lines is a matrix. The file is read in
+	# blocks cut at the last newline so no number is split between chunks.
+	parts = []
+	tail = b''
+	with open(filename, 'rb') as f:
+		while True:
+			block = f.read(chunk_bytes)
+			if not block:
+				break
+			block = tail + block
+			cut = block.rfind(b'\n') + 1
+			tail = block[cut:]
+			if cut:
+				parts.append(np.array(block[:cut].split(), dtype=np.int64))
+	if tail.strip():
+		parts.append(np.array(tail.split(), dtype=np.int64))
+
+	values = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+	if values.size % 4 != 0:
+		raise ValueError(f"{filename}: {values.size} entries (should be multiple of 4)")
+	return values.reshape(-1, 4)
+
+def gamma_isomorphism(mats, n):
+	# mats: (N,4) rows [x11, x12, x21, x22], returns (X - I) / n
+	out = np.array(mats, dtype=np.int64).reshape(-1, 4)
+	out[:, 0] -= 1
+	out[:, 3] -= 1
+	rem = out % n
+	if rem.any():
+		bad = int(np.flatnonzero(rem.any(axis=1))[0])
+		raise ValueError(f"Gamma({n}): matrix {bad} is not congruent to I mod {n}: {mats[bad].tolist()}")
+	out //= n
+	return out
+
+def write_matrices(dst_path, tmats, width=16):
+	tmp_path = Path(str(dst_path) + '.tmp')
+	with open(tmp_path, 'w') as f:
+		np.savetxt(f, tmats, fmt=f'%{width}d', delimiter=', ')
+	os.replace(tmp_path, dst_path)
+
+def is_up_to_date(src_path, dst_path):
+	# Both the text output and its binary store must be newer than the input
+	src_mtime = os.path.getmtime(src_path)
+	for out_path in (dst_path, store_path_for(dst_path)):
+		if not os.path.exists(out_path) or os.path.getmtime(out_path) < src_mtime:
+			return False
+	return True
 
 def process_file(src_path, dst_path, n):
 	matrices = parse_matrices(src_path)
-	with open(dst_path, 'w') as f:
-		for mat in matrices:
-			tmat = gamma_isomorphism(mat, n)
-			f.write(format_matrix(tmat) + '\n')
+	tmats = gamma_isomorphism(matrices, n)
+	write_matrices(dst_path, tmats)
+	write_generators(store_path_for(dst_path), tmats, n, KIND_TILDE)
+	return len(tmats)
 
-def main():
+def collect_jobs(force=False):
+	jobs = []
 	for fname in os.listdir(SRC_DIR):
 		if not fname.endswith('.txt'):
 			continue
 		n = int(fname.split('_')[1])
 		src_path = SRC_DIR / fname
 		dst_path = DST_DIR / fname
-		process_file(src_path, dst_path, n)
+		if not force and is_up_to_date(src_path, dst_path):
+			continue
+		jobs.append((src_path, dst_path, n))
+	# Largest files first so they do not end up running alone at the tail
+	jobs.sort(key=lambda job: os.path.getsize(job[0]), reverse=True)
+	return jobs
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Convert generators_gamma into generators_gamma_tilde')
+	parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+	parser.add_argument('--force', action='store_true', help='rewrite outputs that are already up to date')
+	args = parser.parse_args(argv)
+
+	DST_DIR.mkdir(exist_ok=True)
+	jobs = collect_jobs(args.force)
+	if not jobs:
+		print('All outputs up to date')
+		return 0
+
+	failed = 0
+	with ProcessPoolExecutor(max_workers=args.workers) as executor:
+		future_to_job = {executor.submit(process_file, *job): job for job in jobs}
+		for future in as_completed(future_to_job):
+			src_path, dst_path, n = future_to_job[future]
+			try:
+				count = future.result()
+				print(f'Gamma({n}): {count} generators -> {dst_path}')
+			except Exception as e:
+				print(f'ERROR Gamma({n}): {e}')
+				failed += 1
+	return 1 if failed else 0
 
 if __name__ == '__main__':
-	main()
+	sys.exit(main())
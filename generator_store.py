@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Binary generator store shared by the Python tools and the C++ loader
+
+File layout (all little-endian):
+    0   8s   magic  b"HRGSTORE"
+    8   u32  format version
+    12  u32  header size in bytes (payload offset)
+    16  i64  n
+    24  i64  number of generators
+    32  u32  dtype code (1 = int64)
+    36  u32  kind (0 = Gamma(n) matrices, 1 = gamma_isomorphism applied)
+    40  u32  CRC32 of the payload
+    44  ...  reserved, zero filled up to the header size
+    64  ...  payload, contiguous (count, 4) int64 block [x11, x12, x21, x22]
+
+The C++ side (src/genstore.cppm) maps the same layout.
+"""
+
+import os
+import sys
+import zlib
+import struct
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+MAGIC = b"HRGSTORE"
+VERSION = 1
+HEADER_SIZE = 64
+HEADER_STRUCT = struct.Struct("<8sIIqqIII")
+
+DTYPE_INT64 = 1
+KIND_GAMMA = 0
+KIND_TILDE = 1
+
+STORE_SUFFIX = ".bin"
+
+SRC_DIR = Path('generators_gamma')
+DST_DIR = Path('generators_gamma_tilde')
+
+
+class StoreHeader(NamedTuple):
+    version: int
+    n: int
+    count: int
+    dtype: int
+    kind: int
+    checksum: int
+
+
+def store_path_for(text_path):
+    """
+    Path of the binary store that sits next to a gamma_n_generators.txt file
+    """
+    return Path(text_path).with_suffix(STORE_SUFFIX)
+
+
+def pack_header(n, count, checksum, kind=KIND_TILDE):
+    header = HEADER_STRUCT.pack(MAGIC, VERSION, HEADER_SIZE, n, count, DTYPE_INT64, kind, checksum)
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def read_header(path):
+    """
+    Read and validate the header of a generator store
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_STRUCT.size:
+        raise ValueError(f"{path}: truncated generator store header")
+
+    magic, version, header_size, n, count, dtype, kind, checksum = HEADER_STRUCT.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a generator store (bad magic {magic!r})")
+    if version != VERSION or header_size != HEADER_SIZE:
+        raise ValueError(f"{path}: unsupported generator store version {version}")
+    if dtype != DTYPE_INT64:
+        raise ValueError(f"{path}: unsupported dtype code {dtype}")
+
+    expected_size = HEADER_SIZE + count * 4 * 8
+    actual_size = os.path.getsize(path)
+    if actual_size != expected_size:
+        raise ValueError(f"{path}: expected {expected_size} bytes, found {actual_size}")
+
+    return StoreHeader(version, n, count, dtype, kind, checksum)
+
+
+def write_generators(path, generators, n, kind=KIND_TILDE):
+    """
+    Write an (N,4) or (N,2,2) integer array as a generator store.
+    The file is written to a temporary name and renamed into place.
+    """
+    arr = np.ascontiguousarray(np.asarray(generators).reshape(-1, 4), dtype='<i8')
+    checksum = zlib.crc32(arr) & 0xFFFFFFFF
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(pack_header(n, arr.shape[0], checksum, kind))
+        f.write(arr.tobytes())
+    os.replace(tmp_path, path)
+    return StoreHeader(VERSION, n, arr.shape[0], DTYPE_INT64, kind, checksum)
+
+
+def load_generators(path, verify=False):
+    """
+    Memory-map a generator store as a read-only (N,4) int64 array.
+    Returns (header, array).
+    """
+    header = read_header(path)
+    if header.count == 0:
+        arr = np.empty((0, 4), dtype='<i8')
+    else:
+        arr = np.memmap(path, dtype='<i8', mode='r', offset=HEADER_SIZE, shape=(header.count, 4))
+
+    if verify and (zlib.crc32(arr) & 0xFFFFFFFF) != header.checksum:
+        raise ValueError(f"{path}: checksum mismatch")
+    return header, arr
+
+
+def load_text_generators(path):
+    """
+    Read a text generator file, either one integer per line (Sage output)
+    or comma-separated rows of four (generators_gamma_tilde), as an (N,4) int64
+    array, or an object array of Python ints when an entry does not fit in int64
+    """
+    with open(path, 'r') as f:
+        text = f.read().replace(',', ' ')
+    tokens = text.split()
+    try:
+        values = np.array(tokens, dtype=np.int64)
+    except OverflowError:
+        values = np.array([int(x) for x in tokens], dtype=object)
+    if values.size % 4 != 0:
+        raise ValueError(f"Invalid file format: {values.size} entries (should be multiple of 4)")
+    return values.reshape(-1, 4)
+
+
+def convert_text_file(src_path, n, kind, dst_path=None):
+    """
+    Convert one text generator file into a binary store next to it
+    """
+    if dst_path is None:
+        dst_path = store_path_for(src_path)
+    arr = load_text_generators(src_path)
+    return write_generators(dst_path, arr, n, kind)
+
+
+def n_from_filename(fname):
+    # gamma_{n}_generators.txt -> n
+    return int(Path(fname).name.split('_')[1])
+
+
+def convert_tree(src_dir, kind):
+    """
+    Convert every gamma_n_generators.txt in a directory
+    """
+    converted = 0
+    for fname in sorted(os.listdir(src_dir)):
+        if not fname.endswith('.txt'):
+            continue
+        src_path = Path(src_dir) / fname
+        header = convert_text_file(src_path, n_from_filename(fname), kind)
+        print(f"Gamma({header.n}): {header.count} generators -> {store_path_for(src_path)}")
+        converted += 1
+    return converted
+
+
+def main():
+    dirs = sys.argv[1:]
+    if not dirs:
+        convert_tree(SRC_DIR, KIND_GAMMA)
+        convert_tree(DST_DIR, KIND_TILDE)
+        return
+    for d in dirs:
+        kind = KIND_TILDE if Path(d).name.endswith('_tilde') else KIND_GAMMA
+        convert_tree(d, kind)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Batched NumPy versions of the group law and element checks in src/radlib.cppm
+
+Every function works on a whole (N,4) array of gamma_isomorphism transformed
+generators [x1, x2, x3, x4] at once and returns the same answers as the C++
+function of the same name. Arithmetic is done in int64 when a bound on the
+result shows it cannot overflow, otherwise the batch is promoted to Python
+integers (object dtype), which plays the role of the i128 casts in the engine.
+"""
+
+import sys
+import time
+import argparse
+from enum import IntEnum
+
+import numpy as np
+
+from generator_store import load_generators, load_text_generators, DST_DIR, STORE_SUFFIX
+
+INT64_MAX = np.iinfo(np.int64).max
+
+
+class CheckElementSuccessType(IntEnum):
+    NONE = 0
+    RAD_31 = 1
+    RAD_21 = 2
+    X2_EQ_N = 3
+    X3_EQ_N = 4
+
+
+class AkSuccessType(IntEnum):
+    NONE = 0
+    LEFT_MULTIPLY = 1
+    RIGHT_MULTIPLY = 2
+    LEFT_MULTIPLY_INVERT = 3
+    RIGHT_MULTIPLY_INVERT = 4
+
+
+def as_matrices(mats):
+    """(N,4) view of mats, int64 unless it already holds Python integers"""
+    mats = np.asarray(mats)
+    if mats.dtype != object:
+        mats = mats.astype(np.int64, copy=False)
+    return mats.reshape(-1, 4)
+
+
+def max_abs(a):
+    """Largest absolute value in a as a Python int, 0 for an empty array"""
+    if a.size == 0:
+        return 0
+    if a.dtype == object:
+        return max(abs(int(x)) for x in a.flat)
+    # abs(INT64_MIN) wraps, so take the extremes separately
+    return max(abs(int(a.max())), abs(int(a.min())))
+
+
+def promote(bound, *arrays):
+    """
+    arrays unchanged if bound fits in int64, otherwise as object arrays
+    """
+    if bound <= INT64_MAX or all(a.dtype == object for a in arrays):
+        return arrays if len(arrays) > 1 else arrays[0]
+    promoted = tuple(a.astype(object) for a in arrays)
+    return promoted if len(promoted) > 1 else promoted[0]
+
+
+def group_multiplication(lhs, rhs, n):
+    """
+    X + Y + nXY for every pair of rows (broadcasting like NumPy)
+    """
+    lhs, rhs = as_matrices(lhs), as_matrices(rhs)
+    ml, mr = max_abs(lhs), max_abs(rhs)
+    lhs, rhs = promote(abs(n) * 2 * ml * mr + ml + mr, lhs, rhs)
+
+    l0, l1, l2, l3 = lhs[:, 0], lhs[:, 1], lhs[:, 2], lhs[:, 3]
+    r0, r1, r2, r3 = rhs[:, 0], rhs[:, 1], rhs[:, 2], rhs[:, 3]
+    return np.stack([
+        n*(l0*r0 + l1*r2) + l0 + r0,
+        n*(l0*r1 + l1*r3) + l1 + r1,
+        n*(l2*r0 + l3*r2) + l2 + r2,
+        n*(l2*r1 + l3*r3) + l3 + r3
+    ], axis=1)
+
+
+def group_inversion(mats):
+    """
+    Same as radlib's group_inversion_: swap x1 and x4 and negate x2 and x3
+    """
+    mats = as_matrices(mats)
+    return np.stack([mats[:, 3], -mats[:, 1], -mats[:, 2], mats[:, 0]], axis=1)
+
+
+def gcd(a, b):
+    """
+    Elementwise Euclid, every lane stops as soon as its remainder is zero
+    """
+    a, b = np.broadcast_arrays(np.asarray(a), np.asarray(b))
+    a, b = a.copy(), b.copy()
+    active = np.flatnonzero(b != 0)
+    while active.size:
+        r = a[active] % b[active]
+        a[active] = b[active]
+        b[active] = r
+        active = active[r != 0]
+    return a
+
+
+def divides_radical(a, b):
+    """
+    True where every prime factor of a divides b (and where a == 0),
+    elementwise over non-negative a and b
+    """
+    a, b = np.broadcast_arrays(np.asarray(a), np.asarray(b))
+    a, b = a.copy(), b.copy()
+    result = np.ones(a.shape, dtype=bool)
+    active = np.flatnonzero(a != 0)
+    while active.size:
+        g = gcd(a[active], b[active])
+        coprime = g == 1
+        result[active[coprime]] = a[active[coprime]] == 1
+        active, g = active[~coprime], g[~coprime]
+
+        # Divide g out of a as often as it goes
+        reduced = a[active] // g
+        dividing = np.flatnonzero(reduced % g == 0)
+        while dividing.size:
+            reduced[dividing] //= g[dividing]
+            dividing = dividing[reduced[dividing] % g[dividing] == 0]
+        a[active] = reduced
+
+        done = reduced == 1
+        result[active[done]] = True
+        active = active[~done]
+    return result
+
+
+def check_element(mats, n):
+    """
+    CheckElementSuccessType code of every matrix, as a uint8 array
+    """
+    mats = as_matrices(mats)
+    x1, x2, x3 = abs(mats[:, 0]), abs(mats[:, 1]), abs(mats[:, 2])
+    codes = np.zeros(len(mats), dtype=np.uint8)
+
+    # Same order as the C++ early returns, later tests only see what is left
+    todo = np.arange(len(mats))
+    for code, test in (
+        (CheckElementSuccessType.RAD_31, lambda idx: divides_radical(x3[idx], x1[idx])),
+        (CheckElementSuccessType.RAD_21, lambda idx: divides_radical(x2[idx], x1[idx])),
+        (CheckElementSuccessType.X2_EQ_N, lambda idx: x2[idx] == n),
+        (CheckElementSuccessType.X3_EQ_N, lambda idx: x3[idx] == n),
+    ):
+        if todo.size == 0:
+            break
+        hit = np.asarray(test(todo), dtype=bool)
+        codes[todo[hit]] = code
+        todo = todo[~hit]
+    return codes
+
+
+def check_element_sequence(mats, n):
+    """
+    For every matrix the first k < 6 at which the x1/x3 recursion
+    x1, x3 <- x1 + x3, n*x1 + 1 gives divides_radical(|x3|, |x1|).
+    Returns (success, k) arrays, k is 0 where success is False.
+    """
+    mats = as_matrices(mats)
+    x1, x3 = mats[:, 0].copy(), mats[:, 2].copy()
+    success = np.zeros(len(mats), dtype=bool)
+    ks = np.zeros(len(mats), dtype=np.uint8)
+    todo = np.arange(len(mats))
+    for k in range(6):
+        if todo.size == 0:
+            break
+        m1, m3 = max_abs(x1[todo]), max_abs(x3[todo])
+        x1, x3 = promote(max(m1 + m3, abs(n) * m1 + 1), x1, x3)
+        x1[todo], x3[todo] = x1[todo] + x3[todo], n*x1[todo] + 1
+        hit = divides_radical(abs(x3[todo]), abs(x1[todo]))
+        success[todo[hit]] = True
+        ks[todo[hit]] = k
+        todo = todo[~hit]
+    return success, ks
+
+
+def check_element_Ak(mats, n, lower_k, upper_k):
+    """
+    Batched check_element_Ak: for every matrix the first k in [lower_k, upper_k)
+    and multiplication by A_k = [[k, -k^2], [1, -k]] (or its radlib inverse)
+    after which check_element succeeds. Returns (AkSuccessType codes, k).
+    """
+    mats = as_matrices(mats)
+    info = np.zeros(len(mats), dtype=np.uint8)
+    ks = np.zeros(len(mats), dtype=np.int32)
+    todo = np.arange(len(mats))
+    for k in range(lower_k, upper_k):
+        if todo.size == 0:
+            break
+        a_k = np.array([[k, -k*k, 1, -k]], dtype=np.int64)
+        a_k_inv = group_inversion(a_k)
+        for success_type, product in (
+            (AkSuccessType.LEFT_MULTIPLY, lambda m: group_multiplication(m, a_k, n)),
+            (AkSuccessType.RIGHT_MULTIPLY, lambda m: group_multiplication(a_k, m, n)),
+            (AkSuccessType.LEFT_MULTIPLY_INVERT, lambda m: group_multiplication(m, a_k_inv, n)),
+            (AkSuccessType.RIGHT_MULTIPLY_INVERT, lambda m: group_multiplication(a_k_inv, m, n)),
+        ):
+            if todo.size == 0:
+                break
+            hit = check_element(product(mats[todo]), n) != CheckElementSuccessType.NONE
+            info[todo[hit]] = success_type
+            ks[todo[hit]] = k
+            todo = todo[~hit]
+    return info, ks
+
+
+def load_tilde_generators(n, directory=DST_DIR):
+    """
+    gamma_isomorphism transformed generators of Gamma(n), from the binary
+    store if there is one (same preference as load_group_generators in C++)
+    """
+    store = directory / f"gamma_{n}_generators{STORE_SUFFIX}"
+    if store.exists():
+        _, gens = load_generators(store)
+        return gens
+    return load_text_generators(directory / f"gamma_{n}_generators.txt")
+
+
+def initial_check(mats, n):
+    """
+    TestGammaN::run_initial_check over all generators at once.
+    Returns (indices of successful generators, check_element codes).
+    """
+    codes = check_element(mats, n)
+    return np.flatnonzero(codes != CheckElementSuccessType.NONE), codes
+
+
+def initial_check_for_n(n, directory=DST_DIR):
+    return initial_check(load_tilde_generators(n, directory), n)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Batch initial check of Gamma(n) generators')
+    parser.add_argument('n', type=int, nargs='+')
+    args = parser.parse_args(argv)
+
+    for n in args.n:
+        start = time.time()
+        successful, codes = initial_check_for_n(n)
+        counts = np.bincount(codes, minlength=len(CheckElementSuccessType))
+        by_type = ', '.join(f"{t.name}={counts[t]}" for t in CheckElementSuccessType if t != CheckElementSuccessType.NONE)
+        print(f"Gamma({n}): {len(successful)}/{len(codes)} successful after initial check "
+              f"({by_type}) in {time.time() - start:.3f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Long-lived Gamma(n) generator worker for sagegen_parallel
+
+Speaks newline-delimited JSON over stdin/stdout. On startup it prints
+    {"event": "ready", "engine": ..., "pid": ..., "startup_seconds": ...}
+then for every request line {"n": n, "path": path} it writes the generators
+(one integer per line, same as call_sage_gamma_direct) and answers
+    {"event": "result", "n": n, "ok": true, "count": ..., "seconds": ..., "path": ...}
+or
+    {"event": "result", "n": n, "ok": false, "error": ..., "seconds": ...}
+The worker exits when stdin is closed.
+
+Run it under Sage with `sage -python sage_worker.py --engine sage`, or with a
+plain interpreter and `--engine farey` (native Farey symbols, no Sage needed).
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+
+_startup = time.time()
+
+
+def sage_engine():
+    from sage.all import Gamma
+
+    def compute(n):
+        gens = Gamma(n).generators()
+        return [[int(x) for x in g.matrix().list()] for g in gens]
+    return compute
+
+
+def farey_engine():
+    from farey_symbol import FareySymbol
+
+    def compute(n):
+        return FareySymbol(n).generators()
+    return compute
+
+
+ENGINES = {
+    'sage': sage_engine,
+    'farey': farey_engine,
+}
+
+
+def write_generator_file(path, gens):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write("\n".join(str(x) for m in gens for x in m) + "\n")
+    os.replace(tmp_path, path)
+
+
+def send(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def handle(compute, request):
+    n = request['n']
+    start = time.time()
+    try:
+        gens = compute(n)
+        if request.get('path'):
+            write_generator_file(request['path'], gens)
+        return {'event': 'result', 'n': n, 'ok': True, 'count': len(gens),
+                'seconds': time.time() - start, 'path': request.get('path')}
+    except Exception as e:
+        return {'event': 'result', 'n': n, 'ok': False, 'error': f"{type(e).__name__}: {e}",
+                'traceback': traceback.format_exc(), 'seconds': time.time() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Persistent Gamma(n) generator worker')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='sage')
+    args = parser.parse_args(argv)
+
+    compute = ENGINES[args.engine]()
+    send({'event': 'ready', 'engine': args.engine, 'pid': os.getpid(),
+          'startup_seconds': time.time() - _startup})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            send({'event': 'error', 'error': f"Invalid request {line!r}: {e}"})
+            continue
+        send(handle(compute, request))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,8 @@ Parallel computation of Gamma(n) generators using local SageMath
 
 import subprocess
 import re
+import sys
+import json
 import numpy as np
 import threading
 import queue
@@ -12,6 +14,12 @@ import time
 import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from farey_symbol import gamma_generators
+from generator_store import (
+    load_generators, load_text_generators, read_header, write_generators,
+    KIND_GAMMA, STORE_SUFFIX
+)
+
 def call_sage_gamma_direct(n, filename):
     """
     Call local SageMath to compute Gamma(n).generators() and write directly to file
@@ -34,9 +42,12 @@ for g in gens:
     output_lines.append(str(matrix[1,0]))
     output_lines.append(str(matrix[1,1]))
 
-# Write all data in one operation
-with open("generators/{filename}", "w") as f:
+# Write all data in one operation, under a temporary name so an
+# interrupted run never leaves a partial file behind
+import os
+with open("generators/{filename}.tmp", "w") as f:
     f.write("\\n".join(output_lines) + "\\n")
+os.replace("generators/{filename}.tmp", "generators/{filename}")
 
 print(f"SUCCESS: {{len(gens)}} generators written to {filename}")
 """
@@ -103,18 +114,15 @@ def load_generators_from_file(filename):
 
 def matrices_to_numpy(matrices_data):
     """
-    Convert matrix data to numpy arrays (handling string entries)
+    Convert matrix data (nested lists, possibly of strings) to a single
+    (N,2,2) array. int64 unless an entry overflows, then object dtype.
     """
-    result = []
-    for m in matrices_data:
-        # Convert string entries to integers if needed
-        if isinstance(m[0][0], str):
-            matrix = np.array([[int(m[0][0]), int(m[0][1])], 
-                              [int(m[1][0]), int(m[1][1])]], dtype=object)
-        else:
-            matrix = np.array(m, dtype=object)
-        result.append(matrix)
-    return result
+    try:
+        result = np.array(matrices_data, dtype=np.int64)
+    except (OverflowError, ValueError):
+        ints = [[[int(x) for x in row] for row in m] for m in matrices_data]
+        result = np.array(ints, dtype=object)
+    return result.reshape(-1, 2, 2)
 
 def print_matrices(matrices):
     """
@@ -226,9 +234,227 @@ def compute_gamma_range_parallel(start_n, end_n, max_workers=32, timeout_per_com
     
     return completed, skipped, failed
 
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sage_worker.py')
+
+def worker_command(engine='sage'):
+    """
+    Command line for one persistent worker (see sage_worker.py).
+    'sage' runs inside the sageenv conda environment, 'farey' is the
+    pure-Python stand-in that needs no Sage install.
+    """
+    if engine == 'sage':
+        return ['conda', 'run', '--no-capture-output', '-n', 'sageenv',
+                'sage', '-python', WORKER_SCRIPT, '--engine', 'sage']
+    return [sys.executable, WORKER_SCRIPT, '--engine', engine]
+
+class GammaWorker:
+    """
+    One long-lived worker process, requests and results are JSON lines.
+    stdout is read by a daemon thread so reads can time out.
+    """
+    def __init__(self, command, startup_timeout=None):
+        self.command = command
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump_stdout, daemon=True).start()
+        try:
+            self.ready = self._read_message(startup_timeout)
+        except Exception:
+            self.close(timeout=0)
+            raise
+        if self.ready.get('event') != 'ready':
+            self.close(timeout=0)
+            raise RuntimeError(f"Unexpected worker greeting: {self.ready}")
+
+    def _pump_stdout(self):
+        for line in self.process.stdout:
+            self._lines.put(line)
+        # End of output
+        self._lines.put(None)
+
+    def _read_message(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(f"No answer from worker within {timeout}s") from None
+            if line is None:
+                raise RuntimeError(f"Worker exited with return code {self.process.wait()}")
+            line = line.strip()
+            # Sage and conda may print banners, only JSON lines are protocol
+            if line.startswith('{'):
+                return json.loads(line)
+
+    def request(self, n, path, timeout=None):
+        """
+        Result message for one n. On timeout the worker is killed and
+        TimeoutError raised, None waits as long as it takes.
+        """
+        self.process.stdin.write(json.dumps({'n': n, 'path': path}) + "\n")
+        self.process.stdin.flush()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            try:
+                message = self._read_message(remaining)
+            except TimeoutError:
+                self.process.kill()
+                raise TimeoutError(f"Gamma({n}) took longer than {timeout}s, worker killed") from None
+            if message.get('event') == 'result':
+                return message
+            print(f"Worker {self.ready.get('pid')}: {message}")
+
+    def close(self, timeout=10):
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+
+class GammaWorkerPool:
+    """
+    Pool of persistent workers that are started once and fed n values over a pipe
+    """
+    def __init__(self, num_workers, engine='sage', timeout=None):
+        self.command = worker_command(engine)
+        self.engine = engine
+        # Seconds one request may take, None for no limit
+        self.timeout = timeout
+        # Start all workers concurrently, each one pays the Sage import once
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = [executor.submit(GammaWorker, self.command) for _ in range(num_workers)]
+        started = []
+        error = None
+        for future in futures:
+            try:
+                started.append(future.result())
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            # __exit__ does not run when __init__ raises, close the started ones here
+            for worker in started:
+                worker.close()
+            raise error
+        self.workers = started
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for worker in self.workers:
+            if worker is not None:
+                worker.close()
+        self.workers = []
+
+    @staticmethod
+    def _failure(n, error):
+        return {'event': 'result', 'n': n, 'ok': False, 'error': error, 'seconds': None}
+
+    def _serve(self, index, jobs, results):
+        # Every job taken from the queue puts exactly one result, map()
+        # waits for one per job
+        while True:
+            try:
+                n, path = jobs.get_nowait()
+            except queue.Empty:
+                return
+            worker = self.workers[index]
+            if worker is None:
+                results.put(self._failure(n, "worker could not be restarted"))
+                continue
+            try:
+                results.put(worker.request(n, path, self.timeout))
+                continue
+            except Exception as e:
+                results.put(self._failure(n, str(e)))
+            # Replace the dead worker so the remaining jobs still run
+            worker.close()
+            try:
+                self.workers[index] = GammaWorker(self.command, startup_timeout=self.timeout)
+            except Exception as e:
+                print(f"Worker {index} could not be restarted: {e}")
+                self.workers[index] = None
+
+    def map(self, jobs):
+        """
+        Run (n, path) jobs, yields result messages in completion order
+        """
+        job_queue = queue.Queue()
+        for job in jobs:
+            job_queue.put(job)
+        num_jobs = job_queue.qsize()
+        results = queue.Queue()
+        threads = [
+            threading.Thread(target=self._serve, args=(i, job_queue, results), daemon=True)
+            for i in range(len(self.workers))
+        ]
+        for t in threads:
+            t.start()
+        for _ in range(num_jobs):
+            yield results.get()
+        for t in threads:
+            t.join()
+
+def compute_gamma_range_pooled(start_n, end_n, num_workers=32, engine='sage', timeout_per_computation=None):
+    """
+    Compute Gamma(n) generators for n from start_n to end_n with a pool of
+    persistent workers, so interpreter and Sage startup is paid once per worker.
+    A computation running past timeout_per_computation seconds is failed and
+    its worker restarted, None waits as long as it takes.
+    """
+    os.makedirs('generators', exist_ok=True)
+    jobs = []
+    skipped = 0
+    for n in range(start_n, end_n + 1):
+        full_path = f"generators/gamma_{n}_generators.txt"
+        if os.path.exists(full_path):
+            print(f"Gamma({n}) generators already exist in {full_path}, skipping...")
+            skipped += 1
+            continue
+        jobs.append((n, full_path))
+
+    completed = 0
+    failed = 0
+    start_time = time.time()
+    if jobs:
+        num_workers = max(1, min(num_workers, len(jobs)))
+        print(f"Starting {num_workers} persistent '{engine}' workers...")
+        with GammaWorkerPool(num_workers, engine, timeout_per_computation) as pool:
+            startup = max(w.ready.get('startup_seconds', 0.0) for w in pool.workers)
+            print(f"Workers ready in {time.time() - start_time:.2f}s (slowest worker startup {startup:.2f}s)")
+            for result in pool.map(jobs):
+                n = result['n']
+                if result['ok']:
+                    completed += 1
+                    print(f"Gamma({n}): {result['count']} generators computed in {result['seconds']:.2f}s -> {result['path']}")
+                else:
+                    failed += 1
+                    print(f"FAILED Gamma({n}): {result['error']}")
+
+    total_time = time.time() - start_time
+    print("-" * 60)
+    print(f"SUMMARY:")
+    print(f"Completed: {completed}")
+    print(f"Skipped (already existed): {skipped}")
+    print(f"Failed: {failed}")
+    print(f"Total time: {total_time:.2f}s")
+    return completed, skipped, failed
+
 def call_sage_gamma_for_matrices(n):
     """
-    Legacy function for getting matrices data (for GammaGroup class)
+    Legacy function for getting Gamma(n) generators from SageMath as an (N,2,2) array
     """
     try:
         # Use temporary file approach
@@ -238,9 +464,9 @@ def call_sage_gamma_for_matrices(n):
         
         num_generators = call_sage_gamma_direct(n, tmp_filename)
         if num_generators:
-            matrices_data = load_generators_from_file(tmp_filename)
+            gens = load_text_generators(tmp_filename)
             os.unlink(tmp_filename)  # Clean up temp file
-            return matrices_data
+            return gens.reshape(-1, 2, 2)
         else:
             return None
     except Exception as e:
@@ -249,24 +475,62 @@ def call_sage_gamma_for_matrices(n):
 
 class GammaGroup:
     """
-    Python interface to SageMath Gamma groups
+    Python interface to Gamma groups, generators come from the native
+    Farey symbol engine (same generators as SageMath's Gamma(n).generators())
     """
-    def __init__(self, n):
+    def __init__(self, n, cache_dir='generators'):
         self.n = n
         self.level = n
+        self.cache_dir = cache_dir
         self._generators = None
-    
+
+    def cache_path(self):
+        return os.path.join(self.cache_dir, f"gamma_{self.n}_generators{STORE_SUFFIX}")
+
+    def _ensure_cache(self):
+        """
+        Make sure the binary store exists, converting the Sage text file or
+        computing the generators if needed. Returns the generators if they
+        overflow int64 and can therefore not be stored.
+        """
+        path = self.cache_path()
+        text_path = os.path.join(self.cache_dir, f"gamma_{self.n}_generators.txt")
+        has_text = os.path.exists(text_path)
+        # A text file regenerated by Sage after the store was written wins
+        if os.path.exists(path) and not (has_text and os.path.getmtime(text_path) > os.path.getmtime(path)):
+            return None
+        if has_text:
+            gens = load_text_generators(text_path)
+        else:
+            gens = gamma_generators(self.n)
+        if gens.dtype == object:
+            return gens
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_generators(path, gens, self.n, KIND_GAMMA)
+        return None
+
     def generators(self):
         """
-        Get generators as numpy arrays
+        Get generators as one (N,2,2) array, memory-mapped int64 from the
+        cached store, or object dtype when an entry does not fit in int64
         """
         if self._generators is None:
-            matrices_data = call_sage_gamma_for_matrices(self.n)
-            if matrices_data:
-                self._generators = matrices_to_numpy(matrices_data)
-            else:
-                self._generators = []
+            gens = self._ensure_cache()
+            if gens is None:
+                _, gens = load_generators(self.cache_path())
+            self._generators = gens.reshape(-1, 2, 2)
         return self._generators
+
+    def num_generators(self):
+        """
+        Number of generators, read from the store header without mapping the data
+        """
+        if self._generators is not None:
+            return len(self._generators)
+        gens = self._ensure_cache()
+        if gens is not None:
+            return len(gens)
+        return read_header(self.cache_path()).count
     
     def __repr__(self):
         return f"Gamma({self.n})"
@@ -289,13 +553,26 @@ def main():
         start_n = int(input("Start n (default 1): ") or "1")
         end_n = int(input("End n (default 100): ") or "100")
         max_workers = int(input("Number of parallel workers (default 32): ") or "32")
+        use_pool = (input("Use persistent worker pool (Y/n): ") or "y").lower().startswith("y")
+        timeout = None
+        if use_pool:
+            timeout_text = input("Timeout per computation in seconds (default none): ")
+            timeout = float(timeout_text) if timeout_text else None
         
         print(f"\nStarting parallel computation...")
-        completed, skipped, failed = compute_gamma_range_parallel(
-            start_n=start_n,
-            end_n=end_n, 
-            max_workers=max_workers
-        )
+        if use_pool:
+            completed, skipped, failed = compute_gamma_range_pooled(
+                start_n=start_n,
+                end_n=end_n,
+                num_workers=max_workers,
+                timeout_per_computation=timeout
+            )
+        else:
+            completed, skipped, failed = compute_gamma_range_parallel(
+                start_n=start_n,
+                end_n=end_n, 
+                max_workers=max_workers
+            )
         
         print(f"\nParallel computation finished!")
         print(f"Check the generated gamma_*_generators.txt files")
@@ -5,31 +5,79 @@ export module containers;
 
 import std;
 
+// Equivalence classes in CSR form: class c has the members
+// members[offsets[c]:offsets[c+1]] in ascending order, root roots[c] and
+// flag flags[c]. Class order is not meaningful.
+export struct ClassIndex {
+    std::vector<int> offsets{0};
+    std::vector<int> members;
+    std::vector<int> roots;
+    std::vector<std::uint8_t> flags;
+
+    std::size_t size() const {
+        return roots.size();
+    }
+
+    std::span<const int> members_of(std::size_t c) const {
+        return std::span<const int>(members).subspan(offsets[c], offsets[c + 1] - offsets[c]);
+    }
+
+    bool flag(std::size_t c) const {
+        return flags[c] != 0;
+    }
+
+    void clear() {
+        offsets.assign(1, 0);
+        members.clear();
+        roots.clear();
+        flags.clear();
+    }
+};
+
+// Union-find over 0..n-1 with a flag per class. Everything lives in flat
+// arrays indexed by element. The members of a class form a circular list
+// through next_, so merging two classes splices their lists in O(1), and
+// the live roots are kept in roots_. classes() returns a CSR snapshot that
+// is patched after unions: classes untouched since the last snapshot are
+// copied over as blocks, only the merged ones are walked and sorted.
 export class UnionFind {
 private:
     std::vector<int> parent_;
-    std::vector<int> rank_;
-    std::unordered_map<int, bool> class_bool_;
+    // Class size and flag, valid at roots
+    std::vector<int> size_;
+    std::vector<std::uint8_t> flag_;
+    std::vector<int> next_;
+
+    // Position of a root in roots_, -1 once it has been united into another
+    std::vector<int> root_slot_;
+    std::vector<int> roots_;
+
+    // Roots that absorbed another class since the last snapshot
+    std::vector<int> changed_roots_;
+    std::vector<std::uint8_t> changed_;
+
+    ClassIndex index_;
+    ClassIndex spare_;
+    // Class of a root in index_, valid for roots not in changed_roots_
+    std::vector<int> class_of_root_;
 
-    int _last_num_classes = -1;
-    int _last_largest_class_size = -1;
 public:
-    UnionFind(int n) : parent_(n), rank_(n, 0) {
+    UnionFind(int n)
+        : parent_(n), size_(n, 1), flag_(n, 0), next_(n), root_slot_(n), roots_(n),
+          changed_(n, 0), class_of_root_(n)
+    {
         std::iota(parent_.begin(), parent_.end(), 0); // Each element is its own parent initially
-        _last_num_classes = n;
-        _last_largest_class_size = 1;
+        std::iota(next_.begin(), next_.end(), 0);
+        std::iota(root_slot_.begin(), root_slot_.end(), 0);
+        std::iota(roots_.begin(), roots_.end(), 0);
+        std::iota(class_of_root_.begin(), class_of_root_.end(), 0);
+        index_.offsets.resize(n + 1);
+        std::iota(index_.offsets.begin(), index_.offsets.end(), 0);
+        index_.members = roots_;
+        index_.roots = roots_;
+        index_.flags.assign(n, 0);
     }
 
-    // Find with path compression
-    /*
-    int find(int x) {
-        if (parent_[x] != x) {
-            parent_[x] = find(parent_[x]); // Path compression
-        }
-        return parent_[x];
-    }
-    */
-
     int find(int x) {
         // Find the root of the component
         int root = x;
@@ -46,29 +94,33 @@ public:
         return root;
     }
 
-    // Union by rank
-    void unite(int x, int y) {
+    // Union by size, false if x and y already were in the same class
+    bool unite(int x, int y) {
         int root_x = find(x);
         int root_y = find(y);
-        
-        if (root_x != root_y) {
-            bool merged_bool = class_bool_[root_x] || class_bool_[root_y];
-            
-            if (rank_[root_x] < rank_[root_y]) {
-                parent_[root_x] = root_y;
-                class_bool_[root_y] = merged_bool;
-                class_bool_.erase(root_x);
-            } else if (rank_[root_x] > rank_[root_y]) {
-                parent_[root_y] = root_x;
-                class_bool_[root_x] = merged_bool;
-                class_bool_.erase(root_y);
-            } else {
-                parent_[root_y] = root_x;
-                rank_[root_x]++;
-                class_bool_[root_x] = merged_bool;
-                class_bool_.erase(root_y);
-            }
+        if (root_x == root_y) {
+            return false;
         }
+        if (size_[root_x] < size_[root_y]) {
+            std::swap(root_x, root_y);
+        }
+        parent_[root_y] = root_x;
+        size_[root_x] += size_[root_y];
+        flag_[root_x] = flag_[root_x] || flag_[root_y];
+        std::swap(next_[root_x], next_[root_y]);
+
+        int slot = root_slot_[root_y];
+        int last = roots_.back();
+        roots_[slot] = last;
+        root_slot_[last] = slot;
+        roots_.pop_back();
+        root_slot_[root_y] = -1;
+
+        if (!changed_[root_x]) {
+            changed_[root_x] = 1;
+            changed_roots_.push_back(root_x);
+        }
+        return true;
     }
 
     // Check if two elements are in same equivalence class
@@ -78,60 +130,245 @@ public:
 
     void set_val(int x, bool val) {
         int root_x = find(x);
-        class_bool_[root_x] = val;
+        flag_[root_x] = val;
+        if (!changed_[root_x]) {
+            index_.flags[class_of_root_[root_x]] = val;
+        }
     }
 
     bool get_val(int x) {
-        int root_x = find(x);
-        return class_bool_[root_x];
-    }
-
-    std::unordered_map<int, std::pair<std::vector<int>, bool>> get_classes_with_bool() {
-        std::unordered_map<int, std::pair<std::vector<int>, bool>> classes;
-        classes.reserve(_last_num_classes);
-        for (int i = 0; i < parent_.size(); ++i) {
-            int root = find(i);
-            auto &entry = classes[root];
-            entry.first.reserve(_last_largest_class_size);
-            entry.first.push_back(i);
-            entry.second = class_bool_[root];
+        return flag_[find(x)] != 0;
+    }
+
+    int class_size(int x) {
+        return size_[find(x)];
+    }
+
+    std::size_t num_classes() const {
+        return roots_.size();
+    }
+
+    // The current classes. Unions do not touch the snapshot, it is only
+    // patched by the next call, which invalidates spans from members_of().
+    const ClassIndex& classes() {
+        if (changed_roots_.empty()) {
+            return index_;
         }
-        _last_num_classes = classes.size();
-        return classes;
+        ClassIndex& next = spare_;
+        next.clear();
+        next.offsets.reserve(roots_.size() + 1);
+        next.members.reserve(parent_.size());
+        next.roots.reserve(roots_.size());
+        next.flags.reserve(roots_.size());
+
+        // After the members of the class have been appended
+        auto push_class = [&](int root) {
+            class_of_root_[root] = next.roots.size();
+            next.offsets.push_back(next.members.size());
+            next.roots.push_back(root);
+            next.flags.push_back(flag_[root]);
+        };
+        for (std::size_t c = 0; c < index_.size(); ++c) {
+            int root = index_.roots[c];
+            if (root_slot_[root] == -1 || changed_[root]) {
+                continue;
+            }
+            auto members = index_.members_of(c);
+            next.members.insert(next.members.end(), members.begin(), members.end());
+            push_class(root);
+        }
+        for (int root : changed_roots_) {
+            changed_[root] = 0;
+            if (root_slot_[root] == -1) {
+                continue;
+            }
+            std::size_t begin = next.members.size();
+            int member = root;
+            do {
+                next.members.push_back(member);
+                member = next_[member];
+            } while (member != root);
+            std::sort(next.members.begin() + begin, next.members.end());
+            push_class(root);
+        }
+        changed_roots_.clear();
+
+        std::swap(index_, spare_);
+        return index_;
     }
 
-    std::vector<std::pair<std::vector<int>, bool>> get_classes_list_with_bool() {
-        std::vector<std::pair<std::vector<int>, bool>> result;
-        auto class_map = get_classes_with_bool();
-        result.reserve(class_map.size());
-        for (auto& [root, class_info] : class_map) {
-            result.push_back(std::move(class_info));
+};
+
+// Per generator product and attempt counts. Every thread accumulates into a
+// block of its own without synchronization, totals() merges the blocks and
+// must only be called while no thread is counting (e.g. between phases).
+export class GeneratorCounters {
+public:
+    struct Count {
+        std::uint64_t products = 0;
+        std::uint64_t attempts = 0;
+    };
+
+private:
+    struct Block {
+        // Sparse, a thread only sees the generators of the classes it tests
+        std::unordered_map<int, Count> counts;
+    };
+
+    inline static std::atomic<std::size_t> next_id_{0};
+
+    std::size_t id_;
+    std::size_t num_;
+    std::mutex mutex_;
+    std::vector<std::unique_ptr<Block>> blocks_;
+
+    Block& local() {
+        // Keyed by id, not address, so a new instance never picks up the
+        // block of a destroyed one
+        thread_local std::size_t last_id = static_cast<std::size_t>(-1);
+        thread_local Block* last_block = nullptr;
+        thread_local std::unordered_map<std::size_t, Block*> blocks_by_owner;
+        if (last_id == id_) {
+            return *last_block;
+        }
+        auto it = blocks_by_owner.find(id_);
+        if (it == blocks_by_owner.end()) {
+            std::lock_guard lock(mutex_);
+            blocks_.push_back(std::make_unique<Block>());
+            it = blocks_by_owner.emplace(id_, blocks_.back().get()).first;
         }
-        return result;
+        last_id = id_;
+        last_block = it->second;
+        return *last_block;
+    }
+
+public:
+    explicit GeneratorCounters(std::size_t num) : id_(next_id_.fetch_add(1)), num_(num) {}
+
+    GeneratorCounters(const GeneratorCounters&) = delete;
+    GeneratorCounters& operator=(const GeneratorCounters&) = delete;
+
+    void add(int genidx, std::uint64_t products, std::uint64_t attempts) {
+        auto& count = local().counts[genidx];
+        count.products += products;
+        count.attempts += attempts;
     }
 
+    std::vector<Count> totals() {
+        std::vector<Count> out(num_);
+        std::lock_guard lock(mutex_);
+        for (const auto& block : blocks_) {
+            for (const auto& [genidx, count] : block->counts) {
+                out[genidx].products += count.products;
+                out[genidx].attempts += count.attempts;
+            }
+        }
+        return out;
+    }
 };
 
-export class ThreadSafeUnionFind {
+// Lock-free union-find for uniting from many threads at once. Roots are
+// linked by CAS, the smaller index becoming the root so there are no link
+// cycles, and find() halves paths with CAS as it goes. Flags can only be
+// set, unite() carries them to the new root and mark() retries on the new
+// root if its class was linked away meanwhile, so no mark is lost.
+// to_union_find() gives the sequential UnionFind once no thread unites.
+export class ConcurrentUnionFind {
 private:
-	mutable std::shared_mutex mutex_;
-	UnionFind uf_;
+    std::unique_ptr<std::atomic<int>[]> parent_;
+    std::unique_ptr<std::atomic<std::uint8_t>[]> flag_;
+    int n_;
+
 public:
-	ThreadSafeUnionFind(int n) : uf_(n) {}
+    ConcurrentUnionFind(int n)
+        : parent_(std::make_unique<std::atomic<int>[]>(n)),
+          flag_(std::make_unique<std::atomic<std::uint8_t>[]>(n)),
+          n_(n)
+    {
+        for (int i = 0; i < n; ++i) {
+            parent_[i].store(i, std::memory_order_relaxed);
+            flag_[i].store(0, std::memory_order_relaxed);
+        }
+    }
 
-    void unite(int x, int y) {
-        std::unique_lock lock(mutex_);
-        uf_.unite(x, y);
+    int find(int x) {
+        while (true) {
+            int parent = parent_[x].load();
+            if (parent == x) {
+                return x;
+            }
+            int grandparent = parent_[parent].load();
+            if (grandparent != parent) {
+                // Path halving, losing the race only skips the shortcut
+                parent_[x].compare_exchange_weak(parent, grandparent);
+            }
+            x = grandparent;
+        }
+    }
+
+    // False if x and y already were in the same class
+    bool unite(int x, int y) {
+        while (true) {
+            int root_x = find(x);
+            int root_y = find(y);
+            if (root_x == root_y) {
+                return false;
+            }
+            if (root_x > root_y) {
+                std::swap(root_x, root_y);
+            }
+            int expected = root_y;
+            if (parent_[root_y].compare_exchange_strong(expected, root_x)) {
+                if (flag_[root_y].load()) {
+                    mark(root_x);
+                }
+                return true;
+            }
+        }
     }
 
     bool same_class(int x, int y) {
-        std::shared_lock lock(mutex_);
-        return uf_.same_class(x, y);
+        while (true) {
+            int root_x = find(x);
+            int root_y = find(y);
+            if (root_x == root_y) {
+                return true;
+            }
+            // root_x still a root means the classes were apart at some point
+            // after root_y was read
+            if (parent_[root_x].load() == root_x) {
+                return false;
+            }
+        }
     }
 
-    int find(int x) {
-        std::shared_lock lock(mutex_);
-        return uf_.find(x);
+    void mark(int x) {
+        int root = find(x);
+        while (true) {
+            flag_[root].store(1);
+            int parent = parent_[root].load();
+            if (parent == root) {
+                return;
+            }
+            root = find(parent);
+        }
+    }
+
+    bool is_marked(int x) {
+        return flag_[find(x)].load() != 0;
+    }
+
+    UnionFind to_union_find() {
+        UnionFind uf(n_);
+        for (int i = 0; i < n_; ++i) {
+            uf.unite(i, find(i));
+        }
+        for (int i = 0; i < n_; ++i) {
+            if (parent_[i].load() == i && flag_[i].load()) {
+                uf.set_val(i, true);
+            }
+        }
+        return uf;
     }
 
 };
@@ -0,0 +1,300 @@
+module;
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+export module genstore;
+
+import std;
+import radlib;
+
+// Binary generator store, see generator_store.py for the writer.
+// A 64 byte little-endian header followed by a contiguous (count, 4) i64 block.
+
+export constexpr std::array<char,8> GENSTORE_MAGIC = {'H','R','G','S','T','O','R','E'};
+export constexpr u32 GENSTORE_VERSION = 1;
+export constexpr u32 GENSTORE_DTYPE_INT64 = 1;
+
+export enum class GeneratorStoreKind : u32 {
+    GAMMA = 0,
+    TILDE = 1
+};
+
+export struct GeneratorStoreHeader {
+    std::array<char,8> magic;
+    u32 version;
+    u32 header_size;
+    i64 n;
+    i64 count;
+    u32 dtype;
+    GeneratorStoreKind kind;
+    u32 checksum;
+    std::array<u8,20> reserved;
+};
+static_assert(sizeof(GeneratorStoreHeader) == 64);
+static_assert(sizeof(std::array<i64,4>) == 4 * sizeof(i64));
+
+constexpr std::array<u32,256> make_crc32_table() {
+    std::array<u32,256> table{};
+    for (u32 i = 0; i < 256; ++i) {
+        u32 c = i;
+        for (i32 k = 0; k < 8; ++k) {
+            c = (c & 1) ? (0xEDB88320u ^ (c >> 1)) : (c >> 1);
+        }
+        table[i] = c;
+    }
+    return table;
+}
+
+constexpr std::array<u32,256> crc32_table = make_crc32_table();
+
+// Same polynomial as zlib.crc32 on the Python side
+export u32 crc32(const u8* data, std::size_t size) {
+    u32 c = 0xFFFFFFFFu;
+    for (std::size_t i = 0; i < size; ++i) {
+        c = crc32_table[(c ^ data[i]) & 0xFF] ^ (c >> 8);
+    }
+    return c ^ 0xFFFFFFFFu;
+}
+
+// Read-only memory mapping of a generator store. The generators are
+// exposed as a span straight into the mapping, nothing is parsed.
+export class MappedGeneratorStore {
+private:
+    void* _data = nullptr;
+    std::size_t _size = 0;
+    GeneratorStoreHeader _header{};
+
+public:
+    explicit MappedGeneratorStore(const std::string& path) {
+        int fd = ::open(path.c_str(), O_RDONLY);
+        if (fd < 0) {
+            throw std::runtime_error("Failed to open generator store: " + path);
+        }
+        struct stat st;
+        if (::fstat(fd, &st) != 0) {
+            ::close(fd);
+            throw std::runtime_error("Failed to stat generator store: " + path);
+        }
+        _size = static_cast<std::size_t>(st.st_size);
+        if (_size < sizeof(GeneratorStoreHeader)) {
+            ::close(fd);
+            throw std::runtime_error("Truncated generator store header: " + path);
+        }
+
+        _data = ::mmap(nullptr, _size, PROT_READ, MAP_PRIVATE, fd, 0);
+        ::close(fd);
+        if (_data == MAP_FAILED) {
+            _data = nullptr;
+            throw std::runtime_error("Failed to mmap generator store: " + path);
+        }
+
+        std::memcpy(&_header, _data, sizeof(GeneratorStoreHeader));
+        if (_header.magic != GENSTORE_MAGIC) {
+            throw std::runtime_error("Not a generator store (bad magic): " + path);
+        }
+        if (_header.version != GENSTORE_VERSION || _header.header_size != sizeof(GeneratorStoreHeader)) {
+            throw std::runtime_error("Unsupported generator store version: " + path);
+        }
+        if (_header.dtype != GENSTORE_DTYPE_INT64) {
+            throw std::runtime_error("Unsupported generator store dtype: " + path);
+        }
+        if (_header.count < 0 || _size != _header.header_size + _header.count * sizeof(std::array<i64,4>)) {
+            throw std::runtime_error("Generator store size does not match its header: " + path);
+        }
+        ::madvise(_data, _size, MADV_SEQUENTIAL);
+    }
+
+    ~MappedGeneratorStore() {
+        if (_data != nullptr) {
+            ::munmap(_data, _size);
+        }
+    }
+
+    MappedGeneratorStore(const MappedGeneratorStore&) = delete;
+    MappedGeneratorStore& operator=(const MappedGeneratorStore&) = delete;
+
+    MappedGeneratorStore(MappedGeneratorStore&& other) noexcept
+        : _data(std::exchange(other._data, nullptr)),
+          _size(std::exchange(other._size, 0)),
+          _header(other._header)
+    {}
+
+    const GeneratorStoreHeader& header() const {
+        return _header;
+    }
+
+    std::span<const std::array<i64,4>> generators() const {
+        auto payload = static_cast<const u8*>(_data) + _header.header_size;
+        return {
+            reinterpret_cast<const std::array<i64,4>*>(payload),
+            static_cast<std::size_t>(_header.count)
+        };
+    }
+
+    bool verify_checksum() const {
+        auto payload = static_cast<const u8*>(_data) + _header.header_size;
+        return crc32(payload, _size - _header.header_size) == _header.checksum;
+    }
+};
+
+export std::string generator_store_path_tilde(i64 n) {
+    return get_project_file_path("generators_gamma_tilde/gamma_" + std::to_string(n) + "_generators.bin");
+}
+
+export template<integral I>
+std::vector<std::array<I,4>> load_group_generators_store(I n, bool verify = true) {
+    MappedGeneratorStore store(generator_store_path_tilde(static_cast<i64>(n)));
+    const auto& header = store.header();
+
+    if (header.kind != GeneratorStoreKind::TILDE) {
+        throw std::runtime_error("Generator store does not hold gamma_isomorphism transformed generators");
+    }
+    if (header.n != static_cast<i64>(n)) {
+        throw std::runtime_error("Generator store n does not match requested n");
+    }
+    if (verify && !store.verify_checksum()) {
+        throw std::runtime_error("Generator store checksum mismatch");
+    }
+
+    auto gens = store.generators();
+    std::vector<std::array<I,4>> generators;
+    generators.reserve(gens.size());
+    for (const auto& mat : gens) {
+        for (int i = 0; i < 4; ++i) {
+            if (mat[i] > n*n*n*n) {
+                throw std::runtime_error("Generator entry larger than n**4: " + std::to_string(mat[i]));
+            }
+        }
+        generators.push_back(cast_matrix<I>(mat));
+    }
+    return generators;
+}
+
+// Prefers the binary store and falls back to the text tilde file
+export template<integral I>
+std::vector<std::array<I,4>> load_group_generators(I n) {
+    if (std::filesystem::exists(generator_store_path_tilde(static_cast<i64>(n)))) {
+        return load_group_generators_store<I>(n);
+    }
+    return load_group_generators_tilde<I>(n);
+}
+
+// Radical index sidecar, gamma_n_generators.rad next to the generator file:
+// a 64 byte header followed by a (count, NUM_GENERATOR_RADICALS) u64 block
+// holding generator_radicals() of every generator. generators_checksum is the
+// crc32 of the generators it was built from, a mismatch means it is stale.
+
+export constexpr std::array<char,8> RADINDEX_MAGIC = {'H','R','G','R','A','D','I','X'};
+export constexpr u32 RADINDEX_VERSION = 1;
+
+export struct RadicalIndexHeader {
+    std::array<char,8> magic;
+    u32 version;
+    u32 header_size;
+    i64 n;
+    i64 count;
+    u32 columns;
+    u32 generators_checksum;
+    u32 checksum;
+    std::array<u8,20> reserved;
+};
+static_assert(sizeof(RadicalIndexHeader) == 64);
+static_assert(sizeof(GeneratorRadicals) == NUM_GENERATOR_RADICALS * sizeof(u64));
+
+export using RadicalIndex = std::vector<GeneratorRadicals>;
+
+export std::string radical_index_path_tilde(i64 n) {
+    return get_project_file_path("generators_gamma_tilde/gamma_" + std::to_string(n) + "_generators.rad");
+}
+
+u32 generators_checksum(std::span<const std::array<i64,4>> gens) {
+    return crc32(reinterpret_cast<const u8*>(gens.data()), gens.size_bytes());
+}
+
+export RadicalIndex build_radical_index(std::span<const std::array<i64,4>> gens, i32 n) {
+    RadicalIndex index(gens.size());
+    for (std::size_t i = 0; i < gens.size(); ++i) {
+        index[i] = generator_radicals(gens[i], n);
+    }
+    return index;
+}
+
+// The index stored at path if it matches gens, std::nullopt otherwise
+export std::optional<RadicalIndex> read_radical_index(
+    const std::string& path, std::span<const std::array<i64,4>> gens, i32 n
+) {
+    std::ifstream file(path, std::ios::binary);
+    if (!file.is_open()) {
+        return std::nullopt;
+    }
+    RadicalIndexHeader header{};
+    if (!file.read(reinterpret_cast<char*>(&header), sizeof(header))) {
+        return std::nullopt;
+    }
+    if (header.magic != RADINDEX_MAGIC || header.version != RADINDEX_VERSION ||
+        header.header_size != sizeof(RadicalIndexHeader) || header.columns != NUM_GENERATOR_RADICALS ||
+        header.n != n || header.count != static_cast<i64>(gens.size()) ||
+        header.generators_checksum != generators_checksum(gens)) {
+        return std::nullopt;
+    }
+    RadicalIndex index(gens.size());
+    auto payload = reinterpret_cast<char*>(index.data());
+    std::size_t payload_size = index.size() * sizeof(GeneratorRadicals);
+    if (!file.read(payload, payload_size)) {
+        return std::nullopt;
+    }
+    if (crc32(reinterpret_cast<const u8*>(payload), payload_size) != header.checksum) {
+        return std::nullopt;
+    }
+    return index;
+}
+
+export void write_radical_index(
+    const std::string& path, const RadicalIndex& index, std::span<const std::array<i64,4>> gens, i32 n
+) {
+    auto payload = reinterpret_cast<const u8*>(index.data());
+    std::size_t payload_size = index.size() * sizeof(GeneratorRadicals);
+
+    RadicalIndexHeader header{};
+    header.magic = RADINDEX_MAGIC;
+    header.version = RADINDEX_VERSION;
+    header.header_size = sizeof(RadicalIndexHeader);
+    header.n = n;
+    header.count = index.size();
+    header.columns = NUM_GENERATOR_RADICALS;
+    header.generators_checksum = generators_checksum(gens);
+    header.checksum = crc32(payload, payload_size);
+
+    // Renamed into place so a concurrent reader never sees a partial file
+    std::string tmp_path = path + ".tmp";
+    {
+        std::ofstream file(tmp_path, std::ios::binary | std::ios::trunc);
+        if (!file.is_open()) {
+            throw std::runtime_error("Failed to open radical index: " + tmp_path);
+        }
+        file.write(reinterpret_cast<const char*>(&header), sizeof(header));
+        file.write(reinterpret_cast<const char*>(payload), payload_size);
+        if (!file) {
+            throw std::runtime_error("Failed to write radical index: " + tmp_path);
+        }
+    }
+    std::filesystem::rename(tmp_path, path);
+}
+
+// Reads the sidecar of Gamma(n), or builds the index and stores it for the
+// next run. A sidecar that cannot be written only costs the rebuild.
+export RadicalIndex load_or_build_radical_index(std::span<const std::array<i64,4>> gens, i32 n) {
+    std::string path = radical_index_path_tilde(n);
+    if (auto index = read_radical_index(path, gens, n)) {
+        return std::move(*index);
+    }
+    RadicalIndex index = build_radical_index(gens, n);
+    try {
+        write_radical_index(path, index, gens, n);
+    } catch (const std::exception& e) {
+        std::println("Could not store radical index: {}", e.what());
+    }
+    return index;
+}
@@ -0,0 +1,288 @@
+module;
+
+#include <time.h>
+export module instrument;
+
+import std;
+import threadpool;
+
+// Engine instrumentation. Hot kernels bump per-thread counters, the
+// TestGammaN phases are wrapped in a PhaseTimer and the resulting
+// PhaseMetrics are written as JSON lines, see engine_metrics.py for the
+// aggregation on the Python side. Build with HASTY_INSTRUMENT=0 to compile
+// the counters out.
+
+#ifndef HASTY_INSTRUMENT
+#define HASTY_INSTRUMENT 1
+#endif
+
+export constexpr bool instrumentation_enabled = HASTY_INSTRUMENT != 0;
+
+export enum class Counter : std::size_t {
+    PRODUCTS = 0,
+    DIVIDES_RADICAL = 1,
+    CHECK_ELEMENT = 2,
+    // i64 products redone in i128 after overflowing
+    WIDE_FALLBACK = 3,
+    NUM_COUNTERS = 4
+};
+
+constexpr std::size_t num_counters = static_cast<std::size_t>(Counter::NUM_COUNTERS);
+
+export struct CounterSnapshot {
+    std::array<std::uint64_t, num_counters> values{};
+
+    std::uint64_t operator[](Counter c) const {
+        return values[static_cast<std::size_t>(c)];
+    }
+
+    CounterSnapshot since(const CounterSnapshot& earlier) const {
+        CounterSnapshot out;
+        for (std::size_t i = 0; i < num_counters; ++i) {
+            out.values[i] = values[i] - earlier.values[i];
+        }
+        return out;
+    }
+};
+
+// One block per thread, only written by its owner. The registry keeps
+// blocks of finished threads so their counts stay in the totals.
+struct ThreadCounters {
+    std::array<std::atomic<std::uint64_t>, num_counters> values{};
+};
+
+class CounterRegistry {
+private:
+    std::mutex _mutex;
+    std::vector<std::unique_ptr<ThreadCounters>> _blocks;
+
+public:
+    ThreadCounters* add_thread() {
+        std::lock_guard lock(_mutex);
+        _blocks.push_back(std::make_unique<ThreadCounters>());
+        return _blocks.back().get();
+    }
+
+    CounterSnapshot snapshot() {
+        std::lock_guard lock(_mutex);
+        CounterSnapshot out;
+        for (const auto& block : _blocks) {
+            for (std::size_t i = 0; i < num_counters; ++i) {
+                out.values[i] += block->values[i].load(std::memory_order_relaxed);
+            }
+        }
+        return out;
+    }
+};
+
+CounterRegistry& counter_registry() {
+    static CounterRegistry registry;
+    return registry;
+}
+
+ThreadCounters& local_counters() {
+    thread_local ThreadCounters* counters = counter_registry().add_thread();
+    return *counters;
+}
+
+export inline void bump_counter(Counter c, std::uint64_t amount = 1) {
+    if constexpr (instrumentation_enabled) {
+        // Single writer, a relaxed load/store pair avoids a locked add
+        auto& value = local_counters().values[static_cast<std::size_t>(c)];
+        value.store(value.load(std::memory_order_relaxed) + amount, std::memory_order_relaxed);
+    }
+}
+
+// Totals over all threads since program start
+export CounterSnapshot counter_totals() {
+    return counter_registry().snapshot();
+}
+
+export double process_cpu_seconds() {
+    timespec ts;
+    ::clock_gettime(CLOCK_PROCESS_CPUTIME_ID, &ts);
+    return ts.tv_sec + ts.tv_nsec * 1e-9;
+}
+
+// Keeps the most expensive class tests of a phase, safe to call from
+// worker threads
+export class SlowestClasses {
+private:
+    std::mutex _mutex;
+    std::size_t _keep;
+    // (seconds, class size), smallest time first
+    std::vector<std::pair<double, std::size_t>> _entries;
+
+public:
+    explicit SlowestClasses(std::size_t keep = 5) : _keep(keep) {}
+
+    void add(std::size_t class_size, double seconds) {
+        std::lock_guard lock(_mutex);
+        if (_entries.size() == _keep && seconds <= _entries.front().first) {
+            return;
+        }
+        _entries.emplace_back(seconds, class_size);
+        std::ranges::sort(_entries);
+        if (_entries.size() > _keep) {
+            _entries.erase(_entries.begin());
+        }
+    }
+
+    // Slowest first
+    std::vector<std::pair<double, std::size_t>> take() {
+        std::lock_guard lock(_mutex);
+        auto out = std::move(_entries);
+        _entries.clear();
+        std::ranges::reverse(out);
+        return out;
+    }
+};
+
+export struct PhaseMetrics {
+    std::int64_t n = 0;
+    std::string phase;
+    // Only set for the mult phase
+    std::string mult_type;
+    std::int64_t round = 0;
+
+    double wall_seconds = 0.0;
+    double cpu_seconds = 0.0;
+    CounterSnapshot counters;
+
+    std::uint64_t classes_tested = 0;
+    std::uint64_t class_members_tested = 0;
+    std::uint64_t max_class_size = 0;
+    // Classes not tested because nothing new could be tried against them
+    std::uint64_t classes_skipped = 0;
+    // MULT2 pair product cache after it was extended, mult phase only
+    std::uint64_t pair_cache_size = 0;
+    std::uint64_t pair_cache_capacity = 0;
+    std::vector<std::pair<double, std::size_t>> slowest_classes;
+
+    std::int64_t new_successful = 0;
+    std::int64_t new_successful_classes = 0;
+    std::int64_t successful_total = 0;
+    std::int64_t remaining = 0;
+
+    std::vector<std::pair<std::string, PoolStats>> pools;
+
+    std::string to_json() const {
+        std::string out = std::format(
+            "{{\"n\": {}, \"phase\": \"{}\", \"mult_type\": {}, \"round\": {}, "
+            "\"wall_seconds\": {}, \"cpu_seconds\": {}, "
+            "\"products\": {}, \"divides_radical_calls\": {}, \"check_element_calls\": {}, \"wide_fallbacks\": {}, "
+            "\"classes_tested\": {}, \"class_members_tested\": {}, \"max_class_size\": {}, \"classes_skipped\": {}, "
+            "\"pair_cache_size\": {}, \"pair_cache_capacity\": {}, "
+            "\"new_successful\": {}, \"new_successful_classes\": {}, "
+            "\"successful_total\": {}, \"remaining\": {}",
+            n, phase, mult_type.empty() ? std::string("null") : "\"" + mult_type + "\"", round,
+            wall_seconds, cpu_seconds,
+            counters[Counter::PRODUCTS], counters[Counter::DIVIDES_RADICAL], counters[Counter::CHECK_ELEMENT],
+            counters[Counter::WIDE_FALLBACK],
+            classes_tested, class_members_tested, max_class_size, classes_skipped,
+            pair_cache_size, pair_cache_capacity,
+            new_successful, new_successful_classes,
+            successful_total, remaining
+        );
+
+        out += ", \"slowest_classes\": [";
+        for (std::size_t i = 0; i < slowest_classes.size(); ++i) {
+            out += std::format("{}{{\"seconds\": {}, \"size\": {}}}",
+                i ? ", " : "", slowest_classes[i].first, slowest_classes[i].second);
+        }
+        out += "], \"pools\": {";
+        for (std::size_t i = 0; i < pools.size(); ++i) {
+            const auto& [name, stats] = pools[i];
+            out += std::format(
+                "{}\"{}\": {{\"threads\": {}, \"tasks_enqueued\": {}, \"tasks_completed\": {}, "
+                "\"idle_seconds\": {}, \"busy_seconds\": {}, \"mean_queue_depth\": {}, \"max_queue_depth\": {}}}",
+                i ? ", " : "", name, stats.threads, stats.tasks_enqueued, stats.tasks_completed,
+                stats.idle_seconds, stats.busy_seconds,
+                stats.tasks_enqueued ? double(stats.queue_depth_sum) / stats.tasks_enqueued : 0.0,
+                stats.max_queue_depth
+            );
+        }
+        out += "}}";
+        return out;
+    }
+};
+
+// Started on construction, stop() returns the timing, counter and pool
+// deltas of the phase, the caller fills in the rest. Timers may nest, each
+// one gets its own pool peak window. Counters and CPU time are process
+// wide, so the deltas are only those of one TestGammaN while it is the
+// only one running.
+export class PhaseTimer {
+private:
+    std::vector<std::pair<std::string, ThreadPool*>> _pools;
+    std::vector<PoolStats> _pool_start;
+    std::vector<std::size_t> _peak_windows;
+    CounterSnapshot _counters_start;
+    std::chrono::steady_clock::time_point _wall_start;
+    double _cpu_start;
+
+public:
+    explicit PhaseTimer(std::vector<std::pair<std::string, ThreadPool*>> pools)
+        : _pools(std::move(pools))
+    {
+        for (auto& [name, pool] : _pools) {
+            _pool_start.push_back(pool->Stats());
+            _peak_windows.push_back(pool->OpenPeakWindow());
+        }
+        _counters_start = counter_totals();
+        _cpu_start = process_cpu_seconds();
+        _wall_start = std::chrono::steady_clock::now();
+    }
+
+    PhaseTimer(const PhaseTimer&) = delete;
+    PhaseTimer& operator=(const PhaseTimer&) = delete;
+
+    ~PhaseTimer() {
+        for (std::size_t i = 0; i < _pools.size(); ++i) {
+            _pools[i].second->ClosePeakWindow(_peak_windows[i]);
+        }
+    }
+
+    PhaseMetrics stop(std::string phase) const {
+        PhaseMetrics metrics;
+        metrics.phase = std::move(phase);
+        metrics.wall_seconds = std::chrono::duration<double>(
+            std::chrono::steady_clock::now() - _wall_start).count();
+        metrics.cpu_seconds = process_cpu_seconds() - _cpu_start;
+        metrics.counters = counter_totals().since(_counters_start);
+        for (std::size_t i = 0; i < _pools.size(); ++i) {
+            PoolStats stats = _pools[i].second->Stats().since(_pool_start[i]);
+            stats.max_queue_depth = _pools[i].second->WindowPeak(_peak_windows[i]);
+            metrics.pools.emplace_back(_pools[i].first, stats);
+        }
+        return metrics;
+    }
+};
+
+// Appends one JSON object per line, writes are serialized. The counters
+// and CPU time in the records are process wide (see PhaseTimer), so run
+// one TestGammaN at a time when the per-n numbers matter.
+export class MetricsWriter {
+private:
+    std::mutex _mutex;
+    std::ofstream _file;
+
+public:
+    explicit MetricsWriter(const std::string& path) {
+        auto parent = std::filesystem::path(path).parent_path();
+        if (!parent.empty()) {
+            std::filesystem::create_directories(parent);
+        }
+        _file.open(path, std::ios::app);
+        if (!_file.is_open()) {
+            throw std::runtime_error("Failed to open metrics file: " + path);
+        }
+    }
+
+    void write(const PhaseMetrics& metrics) {
+        std::string line = metrics.to_json();
+        std::lock_guard lock(_mutex);
+        _file << line << '\n';
+        _file.flush();
+    }
+};
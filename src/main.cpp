@@ -1,22 +1,45 @@
 
 import std;
 import radlib;
+import genstore;
 import threadpool;
 import tests;
 import test_class;
 import containers;
+import instrument;
 
 void run_gamma_test() {
     std::println("Hello, Hasty Radical!\n");
 
-
-    auto run_gamma = [](int n) {
-        auto gens = load_group_generators_tilde<i64>(n);
+    // Per-phase metrics as JSON lines, aggregate with engine_metrics.py
+    const char* metrics_env = std::getenv("HASTY_METRICS_FILE");
+    std::string metrics_path = metrics_env != nullptr ? 
+        std::string(metrics_env) : get_project_file_path("metrics/engine_metrics.jsonl");
+    MetricsWriter metrics_writer(metrics_path);
+    std::println("Writing phase metrics to {}", metrics_path);
+
+    // Memory budget of the MULT2 pair product cache in MiB
+    const char* pair_cache_mb = std::getenv("HASTY_PAIR_CACHE_MB");
+
+    // HASTY_THREADS, HASTY_CLASSES_IN_FLIGHT and HASTY_TASKS_PER_CLASS
+    SchedulerConfig scheduler_config = SchedulerConfig::FromEnv();
+    std::println(
+        "Scheduler: {} threads, {} classes in flight, {} tasks per class",
+        scheduler_config.threads, scheduler_config.max_classes_in_flight, scheduler_config.max_tasks_per_class
+    );
+
+    auto run_gamma = [&metrics_writer, pair_cache_mb, &scheduler_config](int n) {
+        auto gens = load_group_generators<i64>(n);
         i32 num_gens = gens.size();
         std::println("Loaded {} generators for Gamma({})", num_gens, n);
 
 
-        auto tgn = TestGammaN(std::move(gens), n);
+        auto tgn = TestGammaN(std::move(gens), n, scheduler_config);
+        tgn.set_metrics_writer(&metrics_writer);
+        tgn.set_radical_index(load_or_build_radical_index(tgn.get_generators(), n));
+        if (pair_cache_mb != nullptr) {
+            tgn.set_pair_cache_bytes(std::stoull(pair_cache_mb) << 20);
+        }
 
         std::chrono::steady_clock::time_point begin = std::chrono::steady_clock::now();
 
@@ -34,9 +57,7 @@ void run_gamma_test() {
         elapsed_seconds = end - begin;
         std::println("Building initial equivalence classes took {} seconds", elapsed_seconds.count());
 
-        auto classes = tgn.get_equiv_classes_with_bool();
-        
-        std::println("Found {} equivalence classes after initial check for Gamma({})", classes.size(), n);
+        std::println("Found {} equivalence classes after initial check for Gamma({})", tgn.get_equiv_classes().size(), n);
         std::println("Successful generators after initial check: {}", tgn.get_successful_generators().size());
 
         tgn.run_non_mult_class_tests();
@@ -66,6 +87,12 @@ void run_gamma_test() {
         }
 
         std::println("Successful generators after mult check: {}", tgn.get_successful_generators().size());
+        tgn.finish_run();
+        tgn.write_statistics(get_project_file_path("statistics"));
+        const auto& run_metrics = tgn.get_phase_metrics().back();
+        std::println("Gamma({}) took {} seconds wall, {} seconds CPU, {} products in {} mult rounds", 
+            n, run_metrics.wall_seconds, run_metrics.cpu_seconds, 
+            run_metrics.counters[Counter::PRODUCTS], run_metrics.round);
         std::println("Finished Gamma({})", n);
         std::println("-------------------------------------------------");
         std::println("");
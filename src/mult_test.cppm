@@ -31,91 +31,166 @@ export struct MultResult {
     std::reference_wrapper<const std::vector<i32>> perm = std::cref(global_perms[0][0]);
     i32 inversion_bitmap = -1;
     i32 num_mult = -1;
+    // Group multiplications done by the call, successful or not
+    i32 num_products = 0;
 };
 
-export template<integral I>
-MultResult check_one_mult(
-    const std::vector<std::array<I,4>>& factors,
-    const std::vector<bool>& factors_are_k,
-    i32 n
-)
-{
-    int num_mult = factors.size();
-    const auto& perms = global_perms[num_mult];
+// The eight products of two generators lo <= hi in both orders and with
+// both inversions, as used by the MULT2 searches for factors 1 and 2
+export struct PairProducts {
+    std::array<std::array<i64,4>,8> products;
 
-    if (num_mult >= global_perms.size()) {
-        throw std::runtime_error("check_one_mult: number of multipliers exceeds precomputed permutations");
-    }
-    if (factors.size() != factors_are_k.size()) {
-        throw std::runtime_error("check_one_mult: factors and factors_are_k size mismatch");
+    // first_is_hi: hi is the left factor, inversion_bits: bit 0 inverts the
+    // left factor and bit 1 the right one
+    static constexpr i32 index(bool first_is_hi, i32 inversion_bits) {
+        return (first_is_hi << 2) | inversion_bits;
     }
+};
 
-    for (const auto& p : perms) {
-    for (i32 gi = 0; gi < (1 << num_mult); ++gi) {
-        // We don't need to try inversion of k-factors
-        // So if there are any k-factors that should be inverted
-        // We skip this iteration
-        bool skip_iteration_due_to_k = false;
-        for (i32 kidx = 0; kidx < num_mult; ++kidx) {
-            if (factors_are_k[p[kidx]] && ((1 << kidx) & gi)) {
-                skip_iteration_due_to_k = true;
-                break;
+// std::nullopt if a product does not fit in i64
+export std::optional<PairProducts> compute_pair_products(
+    const std::array<i64,4>& lo, const std::array<i64,4>& hi, i32 n
+) {
+    PairProducts out;
+    for (bool first_is_hi : {false, true}) {
+        for (i32 bits = 0; bits < 4; ++bits) {
+            auto left = first_is_hi ? hi : lo;
+            auto right = first_is_hi ? lo : hi;
+            if (bits & 1) {
+                group_inversion_(left, n);
+            }
+            if (bits & 2) {
+                group_inversion_(right, n);
+            }
+            if (!group_multiplication_checked_(left, right, out.products[PairProducts::index(first_is_hi, bits)], n)) {
+                return std::nullopt;
             }
         }
-        if (skip_iteration_due_to_k) {
-            continue;
-        }
+    }
+    return out;
+}
 
-        bool first_factor_in_product = false;
-        std::array<I, 4> totest{}; // Group identity
-        // We create the product
-        for (i32 pos = 0; pos < num_mult; ++pos) {
-            bool should_invert = (1 << pos) & gi;
+// Cached products of factors 1 and 2 of a check_one_mult call, swapped if
+// factor 1 is the hi generator of the pair
+export struct PairProductsRef {
+    const PairProducts* products = nullptr;
+    bool swapped = false;
+};
 
-            i32 factor_after_perm = p[pos];
-            if (factor_after_perm == 0) {
-                first_factor_in_product = true;
-            }
+// Partial products of the current permutation p: entry (pos, bits) is the
+// product of factors p[0..pos] with the inversions given by the low pos+1
+// bits of an inversion bitmap. Every entry is computed and checked at most
+// once, and entries are kept across consecutive permutations for the
+// positions they share, so the enumeration walks a prefix tree of
+// (factor, inverted?) choices instead of rebuilding every product.
+// Products of factors 1 and 2 alone are taken from pair if it is set.
+template<integral I>
+class PrefixProducts {
+private:
+    static constexpr i32 MAX_MULT = 4;
 
-            auto multip = cast_matrix<I>(factors[factor_after_perm]);
-            if (should_invert) {
-                group_inversion_(multip, n);
-            }
+    enum class State : u8 {
+        EMPTY,
+        COMPUTED,
+        CHECKED_NONE,
+        CHECKED_SUCCESS
+    };
 
-            totest = group_multiplication(totest, multip, n);
+    const std::vector<std::array<I,4>>& _factors;
+    i32 _n;
+    PairProductsRef _pair;
+    const std::vector<i32>* _perm = nullptr;
+    std::array<std::array<ProductChain<I>, 1 << MAX_MULT>, MAX_MULT> _products;
+    std::array<std::array<State, 1 << MAX_MULT>, MAX_MULT> _states;
+    ProductChain<I> _identity;
+    i32 _num_products = 0;
 
-            // Intermediate check, we test product smaller than the full product (pos < (num_mult - 1)). 
-            // This exact product subproduct will emerge both when the next factor
-            // is to be inverted and when it isn't, thus we only test this subproduct
-            // when the next factor is to be inverted ((1 << (pos+1)) & gi) to not test twice.
-            // Since this is the non equiv mult test. We also only do this if the first factor is in the product
-            // Also there has to be at least on multiplication (pos > 0)
-            if ((pos < (num_mult - 1)) && ((1 << (pos+1)) & gi) && pos > 0 && first_factor_in_product) {
-                // Intermediate check
-                if (check_element(totest, n) != CheckElementSuccessType::NONE) {
-                    return { true, std::cref(p), gi, pos };
-                }
+public:
+    PrefixProducts(const std::vector<std::array<I,4>>& factors, i32 n, PairProductsRef pair)
+        : _factors(factors), _n(n), _pair(pair)
+    {
+        for (auto& states : _states) {
+            states.fill(State::EMPTY);
+        }
+    }
+
+    void set_permutation(const std::vector<i32>& perm) {
+        i32 shared = 0;
+        if (_perm != nullptr) {
+            while (shared < perm.size() && (*_perm)[shared] == perm[shared]) {
+                ++shared;
             }
         }
+        for (i32 pos = shared; pos < MAX_MULT; ++pos) {
+            _states[pos].fill(State::EMPTY);
+        }
+        _perm = &perm;
+    }
 
-        // The product is produced, check it
-        if (check_element(totest, n) != CheckElementSuccessType::NONE) {
-            return { true, std::cref(p), gi, num_mult };
+    const ProductChain<I>& product(i32 pos, i32 bitmap) {
+        if (pos < 0) {
+            return _identity;
         }
-    }}
+        i32 bits = bitmap & ((1 << (pos + 1)) - 1);
+        if (_states[pos][bits] == State::EMPTY && pos == 1 && is_pair_prefix()) {
+            bool first_is_hi = ((*_perm)[0] == 2) != _pair.swapped;
+            _products[pos][bits] = ProductChain<I>(
+                cast_matrix<I>(_pair.products->products[PairProducts::index(first_is_hi, bits)])
+            );
+            _states[pos][bits] = State::COMPUTED;
+        }
+        if (_states[pos][bits] == State::EMPTY) {
+            ProductChain<I> chain = product(pos - 1, bits);
+            auto multip = _factors[(*_perm)[pos]];
+            if ((1 << pos) & bits) {
+                group_inversion_(multip, _n);
+            }
+            chain.multiply_right(multip, _n);
+            ++_num_products;
+            _products[pos][bits] = chain;
+            _states[pos][bits] = State::COMPUTED;
+        }
+        return _products[pos][bits];
+    }
 
-    return { false, std::cref(global_perms[0][0]), 0, 0 };
-}
+    // check_element of product(pos, bitmap)
+    bool check(i32 pos, i32 bitmap) {
+        if (pos < 0) {
+            return _identity.check(_n) != CheckElementSuccessType::NONE;
+        }
+        const ProductChain<I>& chain = product(pos, bitmap);
+        State& state = _states[pos][bitmap & ((1 << (pos + 1)) - 1)];
+        if (state == State::COMPUTED) {
+            state = chain.check(_n) != CheckElementSuccessType::NONE ? State::CHECKED_SUCCESS : State::CHECKED_NONE;
+        }
+        return state == State::CHECKED_SUCCESS;
+    }
 
-export template<integral I>
-MultResult check_one_mult_equiv(
+    i32 num_products() const {
+        return _num_products;
+    }
+
+private:
+    bool is_pair_prefix() const {
+        i32 first = (*_perm)[0];
+        i32 second = (*_perm)[1];
+        return _pair.products != nullptr && ((first == 1 && second == 2) || (first == 2 && second == 1));
+    }
+};
+
+// Enumerates permutations and inversion bitmaps in the same order as a
+// product by product rebuild would and returns the first success.
+// Intermediate products are only checked once factor 0 is in them if
+// require_first_factor is set.
+template<integral I, bool require_first_factor>
+MultResult check_one_mult_impl(
     const std::vector<std::array<I,4>>& factors,
     const std::vector<bool>& factors_are_k,
-    i32 n
+    i32 n,
+    PairProductsRef pair_products
 )
 {
     int num_mult = factors.size();
-    const auto& perms = global_perms[num_mult];
 
     if (num_mult >= global_perms.size()) {
         throw std::runtime_error("check_one_mult: number of multipliers exceeds precomputed permutations");
@@ -123,8 +198,16 @@ MultResult check_one_mult_equiv(
     if (factors.size() != factors_are_k.size()) {
         throw std::runtime_error("check_one_mult: factors and factors_are_k size mismatch");
     }
+    const auto& perms = global_perms[num_mult];
 
+    if (pair_products.products != nullptr && num_mult < 3) {
+        throw std::runtime_error("check_one_mult: pair products given for less than three factors");
+    }
+    PrefixProducts<I> prefixes(factors, n, pair_products);
     for (const auto& p : perms) {
+        prefixes.set_permutation(p);
+        i32 first_factor_pos = std::ranges::find(p, 0) - p.begin();
+
     for (i32 gi = 0; gi < (1 << num_mult); ++gi) {
         // We don't need to try inversion of k-factors
         // So if there are any k-factors that should be inverted
@@ -140,31 +223,47 @@ MultResult check_one_mult_equiv(
             continue;
         }
 
-        std::array<I, 4> totest{}; // Group identity
-        // We create the product
-        for (i32 pos = 0; pos < num_mult; ++pos) {
-            bool should_invert = (1 << pos) & gi;
-
-            auto multip = cast_matrix<I>(factors[p[pos]]);
-            if (should_invert) {
-                group_inversion_(multip, n);
-            }
-
-            totest = group_multiplication(totest, multip, n);
-
-            if (pos < num_mult - 1 && ((1 << (pos+1)) & gi) && pos > 0) {
-                // Intermediate check
-                if (check_element(totest, n) != CheckElementSuccessType::NONE) {
-                    return { true, std::cref(p), gi, pos };
+        for (i32 pos = 1; pos < num_mult - 1; ++pos) {
+            // Intermediate check, we test product smaller than the full product (pos < (num_mult - 1)). 
+            // This exact product subproduct will emerge both when the next factor
+            // is to be inverted and when it isn't, thus we only test this subproduct
+            // when the next factor is to be inverted ((1 << (pos+1)) & gi) to not test twice.
+            // In the non equiv mult test we also only do this if the first factor is in the product
+            // Also there has to be at least on multiplication (pos > 0)
+            if (((1 << (pos+1)) & gi) && (!require_first_factor || pos >= first_factor_pos)) {
+                if (prefixes.check(pos, gi)) {
+                    return { true, std::cref(p), gi, pos, prefixes.num_products() };
                 }
             }
         }
 
         // The product is produced, check it
-        if (check_element(totest, n) != CheckElementSuccessType::NONE) {
-            return { true, std::cref(p), gi, num_mult };
+        if (prefixes.check(num_mult - 1, gi)) {
+            return { true, std::cref(p), gi, num_mult, prefixes.num_products() };
         }
     }}
 
-    return { false, std::cref(global_perms[0][0]), 0, 0 };
-}
\ No newline at end of file
+    return { false, std::cref(global_perms[0][0]), 0, 0, prefixes.num_products() };
+}
+
+export template<integral I>
+MultResult check_one_mult(
+    const std::vector<std::array<I,4>>& factors,
+    const std::vector<bool>& factors_are_k,
+    i32 n,
+    PairProductsRef pair_products = {}
+)
+{
+    return check_one_mult_impl<I, true>(factors, factors_are_k, n, pair_products);
+}
+
+export template<integral I>
+MultResult check_one_mult_equiv(
+    const std::vector<std::array<I,4>>& factors,
+    const std::vector<bool>& factors_are_k,
+    i32 n,
+    PairProductsRef pair_products = {}
+)
+{
+    return check_one_mult_impl<I, false>(factors, factors_are_k, n, pair_products);
+}
@@ -0,0 +1,208 @@
+module;
+
+#include <future>
+export module pair_cache;
+
+import std;
+import radlib;
+import threadpool;
+import mult_test;
+
+// Products of pairs of successful generators, shared by all MULT2 and
+// MULT2_AK class tests. Extended between rounds with the pairs of newly
+// successful generators only, read without locking while the class tests
+// run. Bounded by a byte budget, when full the least used pairs are
+// evicted, use counts are halved on every extension so old hits fade.
+
+export constexpr std::size_t DEFAULT_PAIR_CACHE_BYTES = std::size_t(256) << 20;
+
+export class PairProductCache {
+private:
+    // Rough per pair cost of the index, slot and bookkeeping
+    static constexpr std::size_t BYTES_PER_PAIR = sizeof(PairProducts) + 64;
+
+    i32 _n;
+    std::size_t _capacity;
+
+    std::unordered_map<u64, u32> _index;
+    std::vector<PairProducts> _slots;
+    std::vector<u64> _slot_keys;
+    std::vector<u32> _free_slots;
+    std::unique_ptr<std::atomic<u32>[]> _hits;
+
+    // Generators all of whose pairs have been offered to the cache, in the
+    // order they completed
+    std::unordered_set<i32> _paired;
+    std::vector<i32> _paired_order;
+    // Generator whose pairs ran out of room, the pairs with
+    // _paired_order[0, _resume_from) have been offered
+    i32 _resume_gen = -1;
+    std::size_t _resume_from = 0;
+
+    static u64 pair_key(i32 lo, i32 hi) {
+        return (static_cast<u64>(lo) << 32) | static_cast<u32>(hi);
+    }
+
+public:
+    PairProductCache(i32 n, std::size_t max_bytes = DEFAULT_PAIR_CACHE_BYTES)
+        : _n(n)
+    {
+        set_max_bytes(max_bytes);
+    }
+
+    // Drops all cached pairs, 0 disables the cache
+    void set_max_bytes(std::size_t max_bytes) {
+        _capacity = std::min<std::size_t>(max_bytes / BYTES_PER_PAIR, std::numeric_limits<u32>::max());
+        _index.clear();
+        _slots.clear();
+        _slot_keys.clear();
+        _free_slots.clear();
+        _paired.clear();
+        _paired_order.clear();
+        _resume_gen = -1;
+        _resume_from = 0;
+        _hits = std::make_unique<std::atomic<u32>[]>(_capacity);
+    }
+
+    std::size_t size() const {
+        return _index.size();
+    }
+
+    std::size_t capacity() const {
+        return _capacity;
+    }
+
+    // Safe to call concurrently, but not during extend()
+    PairProductsRef find(i32 mat1_idx, i32 mat2_idx) const {
+        bool swapped = mat1_idx > mat2_idx;
+        auto it = _index.find(swapped ? pair_key(mat2_idx, mat1_idx) : pair_key(mat1_idx, mat2_idx));
+        if (it == _index.end()) {
+            return {};
+        }
+        _hits[it->second].fetch_add(1, std::memory_order_relaxed);
+        return {&_slots[it->second], swapped};
+    }
+
+    // Adds the pairs of successful generators not seen before, computed on
+    // pool. At most capacity() pairs are offered per call, the next call
+    // continues where it stopped, so every pair is offered exactly once and
+    // the hit counts decide which ones stay.
+    void extend(
+        std::span<const std::array<i64,4>> generators,
+        const std::unordered_set<i32>& successful,
+        ThreadPool& pool
+    ) {
+        if (_capacity == 0) {
+            return;
+        }
+        std::vector<i32> new_gens;
+        for (i32 idx : successful) {
+            if (!_paired.contains(idx)) {
+                new_gens.push_back(idx);
+            }
+        }
+        if (new_gens.empty()) {
+            return;
+        }
+        // The generator left unfinished by the last call goes first, so the
+        // partners it has been offered with stay a prefix of _paired_order
+        std::ranges::sort(new_gens, [this](i32 lhs, i32 rhs) {
+            return std::make_pair(lhs != _resume_gen, lhs) < std::make_pair(rhs != _resume_gen, rhs);
+        });
+
+        std::vector<u64> new_keys;
+        for (i32 gen : new_gens) {
+            std::size_t first = gen == _resume_gen ? _resume_from : 0;
+            // Every generator paired so far, then gen itself
+            std::size_t num_partners = _paired_order.size() + 1;
+            std::size_t p = first;
+            for (; p < num_partners && new_keys.size() < _capacity; ++p) {
+                i32 other = p < _paired_order.size() ? _paired_order[p] : gen;
+                new_keys.push_back(other < gen ? pair_key(other, gen) : pair_key(gen, other));
+            }
+            if (p < num_partners) {
+                _resume_gen = gen;
+                _resume_from = p;
+                break;
+            }
+            _paired.insert(gen);
+            _paired_order.push_back(gen);
+            _resume_gen = -1;
+        }
+        if (new_keys.empty()) {
+            return;
+        }
+
+        for (std::size_t slot = 0; slot < _slots.size(); ++slot) {
+            _hits[slot].store(_hits[slot].load(std::memory_order_relaxed) / 2, std::memory_order_relaxed);
+        }
+        make_room(new_keys.size());
+
+        std::vector<u32> new_slots(new_keys.size());
+        for (std::size_t i = 0; i < new_keys.size(); ++i) {
+            if (!_free_slots.empty()) {
+                new_slots[i] = _free_slots.back();
+                _free_slots.pop_back();
+            } else {
+                new_slots[i] = _slots.size();
+                _slots.emplace_back();
+                _slot_keys.push_back(0);
+            }
+        }
+
+        // Each task fills its own range of slots
+        std::vector<u8> fits(new_keys.size());
+        std::size_t chunk = std::max<std::size_t>(256, new_keys.size() / (4 * pool.NumberOfThreads()) + 1);
+        std::vector<std::future<void>> futures;
+        for (std::size_t begin = 0; begin < new_keys.size(); begin += chunk) {
+            std::size_t end = std::min(begin + chunk, new_keys.size());
+            futures.push_back(pool.Enqueue([&, begin, end] {
+                for (std::size_t i = begin; i < end; ++i) {
+                    i32 lo = static_cast<i32>(new_keys[i] >> 32);
+                    i32 hi = static_cast<i32>(new_keys[i] & 0xFFFFFFFF);
+                    auto products = compute_pair_products(generators[lo], generators[hi], _n);
+                    fits[i] = products.has_value();
+                    if (products.has_value()) {
+                        _slots[new_slots[i]] = *products;
+                    }
+                }
+            }));
+        }
+        for (auto& future : futures) {
+            future.get();
+        }
+
+        // Pairs that do not fit in i64 are left to the class tests
+        for (std::size_t i = 0; i < new_keys.size(); ++i) {
+            u32 slot = new_slots[i];
+            if (fits[i]) {
+                _index.emplace(new_keys[i], slot);
+                _slot_keys[slot] = new_keys[i];
+                _hits[slot].store(0, std::memory_order_relaxed);
+            } else {
+                _free_slots.push_back(slot);
+            }
+        }
+    }
+
+private:
+    // Evicts the least used pairs until count new ones fit
+    void make_room(std::size_t count) {
+        std::size_t available = _free_slots.size() + (_capacity - _slots.size());
+        if (available >= count) {
+            return;
+        }
+        std::vector<std::pair<u32, u32>> by_use;
+        by_use.reserve(_index.size());
+        for (const auto& [key, slot] : _index) {
+            by_use.emplace_back(_hits[slot].load(std::memory_order_relaxed), slot);
+        }
+        std::size_t evict = std::min(count - available, by_use.size());
+        std::ranges::nth_element(by_use, by_use.begin() + evict);
+        for (std::size_t i = 0; i < evict; ++i) {
+            u32 slot = by_use[i].second;
+            _index.erase(_slot_keys[slot]);
+            _free_slots.push_back(slot);
+        }
+    }
+};
@@ -0,0 +1,230 @@
+// Python bindings for the TestGammaN phases
+//
+//   import numpy as np, hastyradical
+//   gens = np.ascontiguousarray(tilde_generators, dtype=np.int64)   # (N,4)
+//   t = hastyradical.TestGammaN(gens, n)       # no copy, t keeps gens alive
+//   t.run_initial_check()
+//   t.build_initial_equiv_classes()
+//   t.run_non_mult_class_tests()
+//   t.run_mult_class_tests(hastyradical.MultType.MULT1)
+//   states = t.success_states()                # dict of NumPy arrays
+//   metrics = t.phase_metrics()                # list of dicts, one per phase
+//
+// All phases release the GIL while they run.
+
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+
+import std;
+import radlib;
+import tests;
+import test_class;
+import containers;
+import instrument;
+
+namespace py = pybind11;
+
+static_assert(sizeof(std::array<i64,4>) == 4 * sizeof(i64));
+
+namespace {
+
+using GeneratorArray = py::array_t<i64, py::array::c_style | py::array::forcecast>;
+
+template<typename T>
+py::array_t<T> to_numpy(const std::vector<T>& values)
+{
+	py::array_t<T> out(values.size());
+	std::copy(values.begin(), values.end(), out.mutable_data());
+	return out;
+}
+
+class PyTestGammaN {
+public:
+	PyTestGammaN(GeneratorArray gens, i32 n)
+		: _gens(std::move(gens))
+	{
+		if (_gens.ndim() != 2 || _gens.shape(1) != 4) {
+			throw std::invalid_argument("generators must be an (N,4) int64 array");
+		}
+		// int64 C-contiguous input is viewed in place, anything else was
+		// converted once by forcecast and the converted copy is held here
+		std::span<const std::array<i64,4>> view(
+			reinterpret_cast<const std::array<i64,4>*>(_gens.data()),
+			static_cast<std::size_t>(_gens.shape(0))
+		);
+		_test = std::make_unique<TestGammaN>(view, n);
+	}
+
+	TestGammaN& test() { return *_test; }
+
+	GeneratorArray generators() const { return _gens; }
+
+	py::array_t<i32> successful_generators() const
+	{
+		std::vector<i32> succ(
+			_test->get_successful_generators().begin(),
+			_test->get_successful_generators().end()
+		);
+		std::ranges::sort(succ);
+		return to_numpy(succ);
+	}
+
+	// Equivalence classes in CSR form: members of class c are
+	// members[offsets[c]:offsets[c+1]], successful[c] is the class flag
+	py::dict equiv_classes()
+	{
+		const ClassIndex& classes = _test->get_equiv_classes();
+		std::vector<i64> offsets(classes.offsets.begin(), classes.offsets.end());
+		py::dict out;
+		out["offsets"] = to_numpy(offsets);
+		out["members"] = to_numpy(classes.members);
+		out["successful"] = to_numpy(classes.flags).attr("astype")("bool");
+		return out;
+	}
+
+	// One entry per generator. perm holds the factor permutation of a mult
+	// success padded with -1, k_value the Ak/sequence/mult k, -1 if unused.
+	// products and attempts are the work spent testing each generator.
+	py::dict success_states()
+	{
+		const auto& states = _test->get_success_states();
+		auto counts = _test->get_generator_counts();
+		std::size_t num = states.size();
+
+		py::array_t<u8> success_type(num);
+		py::array_t<i32> parent(num);
+		py::array_t<i32> multiplier1(num);
+		py::array_t<i32> multiplier2(num);
+		py::array_t<i32> k_value(num);
+		py::array_t<i32> inversion_bitmap(num);
+		py::array_t<i32> num_mult(num);
+		py::array_t<i32> perm(std::vector<py::ssize_t>{static_cast<py::ssize_t>(num), 4});
+		py::array_t<u64> products(num);
+		py::array_t<u64> attempts(num);
+
+		auto type_v = success_type.mutable_unchecked<1>();
+		auto parent_v = parent.mutable_unchecked<1>();
+		auto mult1_v = multiplier1.mutable_unchecked<1>();
+		auto mult2_v = multiplier2.mutable_unchecked<1>();
+		auto k_v = k_value.mutable_unchecked<1>();
+		auto inv_v = inversion_bitmap.mutable_unchecked<1>();
+		auto num_mult_v = num_mult.mutable_unchecked<1>();
+		auto perm_v = perm.mutable_unchecked<2>();
+		auto products_v = products.mutable_unchecked<1>();
+		auto attempts_v = attempts.mutable_unchecked<1>();
+
+		for (std::size_t i = 0; i < num; ++i) {
+			const SuccessState& state = states[i];
+			type_v(i) = static_cast<u8>(state.success_type);
+			parent_v(i) = state.success_type == SuccessState::SuccessType::NONE ? -1 : state.success_parent_genidx;
+			mult1_v(i) = -1;
+			mult2_v(i) = -1;
+			k_v(i) = -1;
+			inv_v(i) = -1;
+			num_mult_v(i) = -1;
+			products_v(i) = counts[i].products;
+			attempts_v(i) = counts[i].attempts;
+			for (std::size_t j = 0; j < 4; ++j) {
+				perm_v(i, j) = -1;
+			}
+
+			if (state.ak_success_solution.has_value()) {
+				k_v(i) = state.ak_success_solution->k_value;
+			}
+			if (state.seq_success_solution.has_value()) {
+				k_v(i) = state.seq_success_solution->k_value;
+			}
+			if (state.mult_success_solution.has_value()) {
+				const auto& mult = *state.mult_success_solution;
+				mult1_v(i) = mult.multiplier1_genidx;
+				mult2_v(i) = mult.multiplier2_genidx;
+				k_v(i) = mult.k_value;
+				inv_v(i) = mult.mult_result.inversion_bitmap;
+				num_mult_v(i) = mult.mult_result.num_mult;
+				const auto& p = mult.mult_result.perm.get();
+				for (std::size_t j = 0; j < p.size() && j < 4; ++j) {
+					perm_v(i, j) = p[j];
+				}
+			}
+		}
+
+		py::dict out;
+		out["success_type"] = success_type;
+		out["parent"] = parent;
+		out["multiplier1"] = multiplier1;
+		out["multiplier2"] = multiplier2;
+		out["k_value"] = k_value;
+		out["inversion_bitmap"] = inversion_bitmap;
+		out["num_mult"] = num_mult;
+		out["perm"] = perm;
+		out["products"] = products;
+		out["attempts"] = attempts;
+		return out;
+	}
+
+private:
+	GeneratorArray _gens;
+	std::unique_ptr<TestGammaN> _test;
+};
+
+}
+
+PYBIND11_MODULE(hastyradical, m) {
+	m.doc() = "TestGammaN phases of the HastyRadical engine";
+
+	py::enum_<MultType>(m, "MultType")
+		.value("MULT1", MultType::MULT1)
+		.value("MULT2", MultType::MULT2)
+		.value("MULT2_AK", MultType::MULT2_AK);
+
+	py::enum_<SuccessState::SuccessType>(m, "SuccessType")
+		.value("NONE", SuccessState::SuccessType::NONE)
+		.value("SUCCESS_BY_INITIAL_TEST", SuccessState::SuccessType::SUCCESS_BY_INITIAL_TEST)
+		.value("SUCCESS_BY_EQUIVALENCE", SuccessState::SuccessType::SUCCESS_BY_EQUIVALENCE)
+		.value("SUCCESS_BY_AK_TEST", SuccessState::SuccessType::SUCCESS_BY_AK_TEST)
+		.value("SUCCESS_BY_SEQUENCE_TEST", SuccessState::SuccessType::SUCCESS_BY_SEQUENCE_TEST)
+		.value("SUCCESS_BY_MULT_TEST", SuccessState::SuccessType::SUCCESS_BY_MULT_TEST);
+
+	py::class_<PyTestGammaN>(m, "TestGammaN")
+		.def(py::init<GeneratorArray, i32>(), py::arg("generators"), py::arg("n"),
+			"View an (N,4) int64 array of gamma_isomorphism transformed generators")
+		.def_property_readonly("n", [](PyTestGammaN& self) { return self.test().get_n(); })
+		.def_property_readonly("generators", &PyTestGammaN::generators)
+		.def("run_initial_check",
+			[](PyTestGammaN& self) { self.test().run_initial_check(); },
+			py::call_guard<py::gil_scoped_release>())
+		.def("build_initial_equiv_classes",
+			[](PyTestGammaN& self) { self.test().build_initial_equiv_classes(); },
+			py::call_guard<py::gil_scoped_release>())
+		.def("run_non_mult_class_tests",
+			[](PyTestGammaN& self) { self.test().run_non_mult_class_tests(); },
+			py::call_guard<py::gil_scoped_release>())
+		.def("run_mult_class_tests",
+			[](PyTestGammaN& self, MultType mult_type) { return self.test().run_mult_class_tests(mult_type); },
+			py::arg("mult_type"),
+			py::call_guard<py::gil_scoped_release>(),
+			"Returns the number of newly successful generators")
+		.def("set_pair_cache_bytes",
+			[](PyTestGammaN& self, std::size_t max_bytes) { self.test().set_pair_cache_bytes(max_bytes); },
+			py::arg("max_bytes"),
+			"Memory budget of the MULT2 pair product cache, 0 disables it")
+		.def("successful_generators", &PyTestGammaN::successful_generators)
+		.def("num_successful", [](PyTestGammaN& self) {
+			return self.test().get_successful_generators().size();
+		})
+		.def("equiv_classes", &PyTestGammaN::equiv_classes)
+		.def("success_states", &PyTestGammaN::success_states)
+		.def("write_statistics",
+			[](PyTestGammaN& self, const std::string& directory) { self.test().write_statistics(directory); },
+			py::arg("directory"),
+			"Write gamma_<n>_stat.txt and gamma_<n>_stat.bin into directory")
+		.def("phase_metrics", [](PyTestGammaN& self) {
+			// Same records as the engine's JSON lines output
+			py::list out;
+			auto loads = py::module_::import("json").attr("loads");
+			for (const auto& metrics : self.test().get_phase_metrics()) {
+				out.append(loads(metrics.to_json()));
+			}
+			return out;
+		}, "Metrics of every phase run so far, as dicts");
+}
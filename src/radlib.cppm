@@ -3,6 +3,7 @@ module;
 export module radlib;
 
 import std;
+import instrument;
 
 // ---------- types ----------
 export using u8 = std::uint8_t;
@@ -61,6 +62,7 @@ void gamma_isomorphism_inv(std::array<I,4>& mat, i32 n) {
 
 export template<integral I>
 void group_multiplication_(const std::array<I,4>& lhs, const std::array<I,4>& rhs, std::array<I,4>& out, i32 n) {
+    bump_counter(Counter::PRODUCTS);
     // Unrolled 2x2 matrix multiplication, out = X + Y + nXY
     out[idx(0,0)] = n*(lhs[idx(0,0)] * rhs[idx(0,0)] + lhs[idx(0,1)] * rhs[idx(1,0)]);
     out[idx(0,1)] = n*(lhs[idx(0,0)] * rhs[idx(0,1)] + lhs[idx(0,1)] * rhs[idx(1,1)]);
@@ -125,6 +127,7 @@ export enum class CheckElementSuccessType : u8 {
 
 export template<integral I>
 CheckElementSuccessType check_element(const std::array<I,4>& mat, i32 n) {
+    bump_counter(Counter::CHECK_ELEMENT);
     // not correct
     if (divides_radical(abs(mat[idx(1,0)]), abs(mat[idx(0,0)])))
         return CheckElementSuccessType::RAD_31;
@@ -137,6 +140,98 @@ CheckElementSuccessType check_element(const std::array<I,4>& mat, i32 n) {
     return CheckElementSuccessType::NONE;
 }
 
+// ---------- dual width products ----------
+
+// out = X + Y + nXY in i64, false and out untouched if any intermediate
+// overflowed. i64 min counts as overflow so abs() of a result is safe.
+export bool group_multiplication_checked_(
+    const std::array<i64,4>& lhs, const std::array<i64,4>& rhs, std::array<i64,4>& out, i32 n
+) {
+    bool overflow = false;
+    // x + y + n*(a*b + c*d)
+    auto entry = [&overflow, n](i64 a, i64 b, i64 c, i64 d, i64 x, i64 y) {
+        i64 ab, cd, sum, scaled, r;
+        overflow |= __builtin_mul_overflow(a, b, &ab);
+        overflow |= __builtin_mul_overflow(c, d, &cd);
+        overflow |= __builtin_add_overflow(ab, cd, &sum);
+        overflow |= __builtin_mul_overflow(static_cast<i64>(n), sum, &scaled);
+        overflow |= __builtin_add_overflow(scaled, x, &r);
+        overflow |= __builtin_add_overflow(r, y, &r);
+        overflow |= r == std::numeric_limits<i64>::min();
+        return r;
+    };
+    std::array<i64,4> result = {
+        entry(lhs[idx(0,0)], rhs[idx(0,0)], lhs[idx(0,1)], rhs[idx(1,0)], lhs[0], rhs[0]),
+        entry(lhs[idx(0,0)], rhs[idx(0,1)], lhs[idx(0,1)], rhs[idx(1,1)], lhs[1], rhs[1]),
+        entry(lhs[idx(1,0)], rhs[idx(0,0)], lhs[idx(1,1)], rhs[idx(1,0)], lhs[2], rhs[2]),
+        entry(lhs[idx(1,0)], rhs[idx(0,1)], lhs[idx(1,1)], rhs[idx(1,1)], lhs[3], rhs[3])
+    };
+    if (overflow)
+        return false;
+    bump_counter(Counter::PRODUCTS);
+    out = result;
+    return true;
+}
+
+// Running product start * f1 * f2 * ... that check_element can be applied
+// to at any point
+export template<integral I>
+class ProductChain {
+private:
+    std::array<I,4> _value;
+
+public:
+    explicit ProductChain(const std::array<I,4>& start = group_identity<I>()) : _value(start) {}
+
+    void multiply_right(const std::array<I,4>& rhs, i32 n) {
+        _value = group_multiplication(_value, rhs, n);
+    }
+
+    CheckElementSuccessType check(i32 n) const {
+        return check_element(_value, n);
+    }
+};
+
+// Multiplies in i64 and only redoes a product that overflows in i128, the
+// chain then stays in i128. Every redo bumps Counter::WIDE_FALLBACK.
+template<>
+class ProductChain<i64> {
+private:
+    std::array<i64,4> _narrow;
+    std::array<i128,4> _wide;
+    bool _is_wide = false;
+
+public:
+    explicit ProductChain(const std::array<i64,4>& start = group_identity<i64>()) : _narrow(start) {}
+
+    void multiply_right(const std::array<i64,4>& rhs, i32 n) {
+        if (!_is_wide) {
+            if (group_multiplication_checked_(_narrow, rhs, _narrow, n))
+                return;
+            bump_counter(Counter::WIDE_FALLBACK);
+            _wide = cast_matrix<i128>(_narrow);
+            _is_wide = true;
+        }
+        _wide = group_multiplication(_wide, cast_matrix<i128>(rhs), n);
+    }
+
+    CheckElementSuccessType check(i32 n) const {
+        return _is_wide ? check_element(_wide, n) : check_element(_narrow, n);
+    }
+
+    bool is_wide() const {
+        return _is_wide;
+    }
+};
+
+// check_element(lhs * rhs), in i64 where it fits for i64 matrices
+template<integral I>
+CheckElementSuccessType check_product(const std::array<I,4>& lhs, const std::array<I,4>& rhs, i32 n) {
+    ProductChain<I> chain(lhs);
+    chain.multiply_right(rhs, n);
+    return chain.check(n);
+}
+
 export struct SuccessStateAk {
 
     enum class SuccessType : u8 {
@@ -149,12 +244,15 @@ export struct SuccessStateAk {
 
     SuccessType info;
     i32 k_value;
+    // Products computed before returning, up to four per k tried
+    i32 num_products = 0;
 };
 
 export template<integral I>
 SuccessStateAk check_element_Ak(const std::array<I,4>& mat, i32 n, i32 lower_k, i32 upper_k) {
 
     std::array<I,4> test_map;
+    i32 num_products = 0;
     for (u16 k = lower_k; k < upper_k; ++k) {
         test_map[0] = k;
         test_map[1] = -k*k;
@@ -162,26 +260,25 @@ SuccessStateAk check_element_Ak(const std::array<I,4>& mat, i32 n, i32 lower_k,
         test_map[3] = -k;
 
         // Left multiply
-        std::array<I,4> result;
-        result = group_multiplication(mat, test_map, n);
-        if (check_element(result, n) != CheckElementSuccessType::NONE) 
-            return {SuccessStateAk::SuccessType::LEFT_MULTIPLY, k};
+        ++num_products;
+        if (check_product(mat, test_map, n) != CheckElementSuccessType::NONE) 
+            return {SuccessStateAk::SuccessType::LEFT_MULTIPLY, k, num_products};
         // Right multiply
-        result = group_multiplication(test_map, mat, n);
-        if (check_element(result, n) != CheckElementSuccessType::NONE) 
-            return {SuccessStateAk::SuccessType::RIGHT_MULTIPLY, k};
+        ++num_products;
+        if (check_product(test_map, mat, n) != CheckElementSuccessType::NONE) 
+            return {SuccessStateAk::SuccessType::RIGHT_MULTIPLY, k, num_products};
         // Invert and left multiply and right multiply
         group_inversion_(test_map, n);
-        result = group_multiplication(mat, test_map, n);
-        if (check_element(result, n) != CheckElementSuccessType::NONE) 
-            return {SuccessStateAk::SuccessType::LEFT_MULTIPLY_INVERT, k};
-        result = group_multiplication(test_map, mat, n);
-        if (check_element(result, n) != CheckElementSuccessType::NONE) 
-            return {SuccessStateAk::SuccessType::RIGHT_MULTIPLY_INVERT, k};
+        ++num_products;
+        if (check_product(mat, test_map, n) != CheckElementSuccessType::NONE) 
+            return {SuccessStateAk::SuccessType::LEFT_MULTIPLY_INVERT, k, num_products};
+        ++num_products;
+        if (check_product(test_map, mat, n) != CheckElementSuccessType::NONE) 
+            return {SuccessStateAk::SuccessType::RIGHT_MULTIPLY_INVERT, k, num_products};
     
     }
 
-    return {SuccessStateAk::SuccessType::NONE, 0};
+    return {SuccessStateAk::SuccessType::NONE, 0, num_products};
 }
 
 export struct SuccessStateSeq {
@@ -195,13 +292,12 @@ export struct SuccessStateSeq {
     u8 k;
 };
 
-export template<integral I>
-SuccessStateSeq check_element_sequence(const std::array<I,4>& mat, i32 n)
+// Continues the sequence at step first_k from x1, x3
+template<integral I>
+SuccessStateSeq check_element_sequence_from(I x1, I x3, i32 first_k, i32 n)
 {
-    I x1 = mat[0];
-    I x3 = mat[2];
     I temp;
-    for (i32 k = 0; k < 6; ++k) {
+    for (i32 k = first_k; k < 6; ++k) {
         temp = x1 + x3;
         x3 = n*x1  + 1;
         x1 = temp;
@@ -213,6 +309,276 @@ SuccessStateSeq check_element_sequence(const std::array<I,4>& mat, i32 n)
     return {SuccessStateSeq::SuccessType::NONE, 0};
 }
 
+export template<integral I>
+SuccessStateSeq check_element_sequence(const std::array<I,4>& mat, i32 n)
+{
+    return check_element_sequence_from(mat[0], mat[2], 0, n);
+}
+
+// Steps in i64 until one overflows, the rest of the sequence runs in i128
+export SuccessStateSeq check_element_sequence(const std::array<i64,4>& mat, i32 n)
+{
+    i64 x1 = mat[0];
+    i64 x3 = mat[2];
+    for (i32 k = 0; k < 6; ++k) {
+        i64 next_x1, next_x3;
+        bool overflow = __builtin_add_overflow(x1, x3, &next_x1);
+        overflow |= __builtin_mul_overflow(static_cast<i64>(n), x1, &next_x3);
+        overflow |= __builtin_add_overflow(next_x3, i64(1), &next_x3);
+        overflow |= next_x1 == std::numeric_limits<i64>::min() || next_x3 == std::numeric_limits<i64>::min();
+        if (overflow) {
+            bump_counter(Counter::WIDE_FALLBACK);
+            return check_element_sequence_from<i128>(x1, x3, k, n);
+        }
+        x1 = next_x1;
+        x3 = next_x3;
+
+        if (divides_radical(abs(x3), abs(x1))) {
+            return {SuccessStateSeq::SuccessType::SUCCESS, static_cast<u8>(k)};
+        }
+    }
+    return {SuccessStateSeq::SuccessType::NONE, 0};
+}
+
+
+// ---------- radical service ----------
+
+// Radicals of all values up to this limit come from one table lookup
+export constexpr u64 RADICAL_SIEVE_LIMIT = u64(1) << 22;
+
+// rad(a) for every a <= limit, from a linear smallest prime factor sieve.
+// The spf table is only needed while building, the primes are kept for
+// trial division of larger values.
+export class RadicalSieve {
+private:
+    std::vector<u32> _radicals;
+    std::vector<u32> _primes;
+
+public:
+    explicit RadicalSieve(u64 limit) : _radicals(limit + 1, 1) {
+        std::vector<u32> spf(limit + 1, 0);
+        for (u64 i = 2; i <= limit; ++i) {
+            if (spf[i] == 0) {
+                spf[i] = i;
+                _primes.push_back(i);
+            }
+            for (u32 p : _primes) {
+                if (p > spf[i] || i * p > limit)
+                    break;
+                spf[i * p] = p;
+            }
+            u64 m = i / spf[i];
+            // p already divides m, so it adds nothing to the radical
+            _radicals[i] = (spf[m] == spf[i]) ? _radicals[m] : _radicals[m] * spf[i];
+        }
+    }
+
+    u64 limit() const {
+        return _radicals.size() - 1;
+    }
+
+    u32 radical(u64 a) const {
+        return _radicals[a];
+    }
+
+    const std::vector<u32>& primes() const {
+        return _primes;
+    }
+};
+
+// Built on first use, shared by all threads
+export const RadicalSieve& radical_sieve() {
+    static const RadicalSieve sieve(RADICAL_SIEVE_LIMIT);
+    return sieve;
+}
+
+u64 mul_mod(u64 a, u64 b, u64 m) {
+    return static_cast<u64>(static_cast<u128>(a) * b % m);
+}
+
+u64 pow_mod(u64 base, u64 exp, u64 m) {
+    u64 result = 1;
+    base %= m;
+    while (exp) {
+        if (exp & 1)
+            result = mul_mod(result, base, m);
+        base = mul_mod(base, base, m);
+        exp >>= 1;
+    }
+    return result;
+}
+
+// Deterministic Miller-Rabin for all 64 bit values
+export bool is_prime_u64(u64 n) {
+    if (n < 2)
+        return false;
+    for (u64 p : {2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37}) {
+        if (n % p == 0)
+            return n == p;
+    }
+    u64 d = n - 1;
+    i32 s = 0;
+    while ((d & 1) == 0) {
+        d >>= 1;
+        ++s;
+    }
+    for (u64 a : {2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37}) {
+        u64 x = pow_mod(a, d, n);
+        if (x == 1 || x == n - 1)
+            continue;
+        bool composite = true;
+        for (i32 r = 1; r < s; ++r) {
+            x = mul_mod(x, x, n);
+            if (x == n - 1) {
+                composite = false;
+                break;
+            }
+        }
+        if (composite)
+            return false;
+    }
+    return true;
+}
+
+// A non-trivial factor of the odd composite n (Pollard rho, Brent's variant)
+u64 pollard_rho(u64 n) {
+    for (u64 c = 1;; ++c) {
+        u64 y = 2, x = 2, g = 1, q = 1, ys = 2;
+        u64 r = 1;
+        const u64 m = 128;
+        auto f = [n, c](u64 v) { return (mul_mod(v, v, n) + c) % n; };
+        do {
+            x = y;
+            for (u64 i = 0; i < r; ++i)
+                y = f(y);
+            u64 k = 0;
+            do {
+                ys = y;
+                for (u64 i = 0; i < std::min(m, r - k); ++i) {
+                    y = f(y);
+                    q = mul_mod(q, x > y ? x - y : y - x, n);
+                }
+                g = std::gcd(q, n);
+                k += m;
+            } while (k < r && g == 1);
+            r *= 2;
+        } while (g == 1);
+        if (g == n) {
+            // Batched gcd overshot, step one at a time from the last save
+            do {
+                ys = f(ys);
+                g = std::gcd(x > ys ? x - ys : ys - x, n);
+            } while (g == 1);
+        }
+        if (g != n)
+            return g;
+    }
+}
+
+// Squarefree parts whose lcm is rad(n), n has no prime factor below 1000
+void collect_prime_factors(u64 n, std::vector<u64>& primes) {
+    if (n == 1)
+        return;
+    const auto& sieve = radical_sieve();
+    if (n <= sieve.limit()) {
+        // The radical is what is needed, keep it as a single "factor"
+        primes.push_back(sieve.radical(n));
+        return;
+    }
+    if (is_prime_u64(n)) {
+        primes.push_back(n);
+        return;
+    }
+    u64 d = pollard_rho(n);
+    collect_prime_factors(d, primes);
+    collect_prime_factors(n / d, primes);
+}
+
+// Product of the distinct primes dividing |a|. For a != 0,
+// divides_radical(a, b) holds exactly when radical(a) divides b. radical(0)
+// is 1 since divides_radical(0, b) always holds. Values up to the sieve
+// limit are a lookup, larger ones are trial divided by small primes and
+// then factored with Pollard rho.
+export u64 radical(u64 a) {
+    if (a == 0)
+        return 1;
+    const auto& sieve = radical_sieve();
+    if (a <= sieve.limit())
+        return sieve.radical(a);
+
+    u64 rad = 1;
+    for (u32 p : sieve.primes()) {
+        if (p > 1000 || u64(p) * p > a)
+            break;
+        if (a % p == 0) {
+            rad *= p;
+            do {
+                a /= p;
+            } while (a % p == 0);
+        }
+    }
+    if (a <= sieve.limit())
+        return rad * sieve.radical(a);
+
+    std::vector<u64> factors;
+    collect_prime_factors(a, factors);
+    // Parts from the sieve are radicals themselves and may share primes
+    // with other parts, so combine them through lcm
+    u64 rest = 1;
+    for (u64 f : factors)
+        rest = std::lcm(rest, f);
+    return rad * rest;
+}
+
+export template<integral I>
+I radical(I a) {
+    I m = abs(a);
+    if constexpr (std::is_same_v<I, i128>) {
+        if (m > static_cast<I>(std::numeric_limits<u64>::max())) {
+            throw std::overflow_error("radical: value does not fit in 64 bits");
+        }
+    }
+    return static_cast<I>(radical(static_cast<u64>(m)));
+}
+
+// Radicals of a generator's entries and of the two bucket moduli used by
+// build_initial_equiv_classes
+export enum GeneratorRadical : u8 {
+    RAD_X1 = 0,
+    RAD_X2 = 1,
+    RAD_X3 = 2,
+    RAD_X4 = 3,
+    RAD_NX1_PLUS_1 = 4,
+    RAD_NX4_PLUS_1 = 5,
+    NUM_GENERATOR_RADICALS = 6
+};
+
+export using GeneratorRadicals = std::array<u64, NUM_GENERATOR_RADICALS>;
+
+export GeneratorRadicals generator_radicals(const std::array<i64,4>& gen, i32 n) {
+    auto rad = [](i64 x) { return radical(static_cast<u64>(abs(x))); };
+    return {
+        rad(gen[0]), rad(gen[1]), rad(gen[2]), rad(gen[3]),
+        rad(n * gen[0] + 1), rad(n * gen[3] + 1)
+    };
+}
+
+// check_element of a generator whose radicals are already known
+export CheckElementSuccessType check_element_radicals(
+    const std::array<i64,4>& mat, const GeneratorRadicals& rads, i32 n
+) {
+    bump_counter(Counter::CHECK_ELEMENT);
+    u64 x1 = abs(mat[idx(0,0)]);
+    if (x1 % rads[RAD_X3] == 0)
+        return CheckElementSuccessType::RAD_31;
+    if (x1 % rads[RAD_X2] == 0)
+        return CheckElementSuccessType::RAD_21;
+    if (abs(mat[idx(0,1)]) == n)
+        return CheckElementSuccessType::X2_EQ_N;
+    if (abs(mat[idx(1,0)]) == n)
+        return CheckElementSuccessType::X3_EQ_N;
+    return CheckElementSuccessType::NONE;
+}
 
 export template<integral I>
 I gcd(I a, I b) {
@@ -226,6 +592,10 @@ I gcd(I a, I b) {
 
 export template<integral I>
 bool divides_radical(I a, I b) {
+    bump_counter(Counter::DIVIDES_RADICAL);
+    // Small a: a single lookup and modulo instead of the gcd loop
+    if (a >= 0 && a <= static_cast<I>(RADICAL_SIEVE_LIMIT))
+        return b % static_cast<I>(radical_sieve().radical(a)) == 0;
     if (a == 0)
         return true;
     while (true) {
@@ -240,6 +610,13 @@ bool divides_radical(I a, I b) {
     }
 }
 
+// Representative of x modulo m in [0, m)
+export template<integral I>
+I residue(I x, I m) {
+    I r = x % m;
+    return r < 0 ? r + m : r;
+}
+
 
 // ---------- utility functions ----------
 export std::string get_project_file_path(const std::string& relative_path) {
@@ -0,0 +1,151 @@
+module;
+
+export module statstore;
+
+import std;
+import radlib;
+import genstore;
+
+// Per generator results of a TestGammaN run, written both as the
+// gamma_n_stat.txt text read by plot_statistics.py and as a compact binary
+// gamma_n_stat.bin (see load_stat_records in stats_data.py): a 64 byte
+// little-endian header followed by count fixed size StatRecords.
+
+export constexpr std::array<char,8> STATSTORE_MAGIC = {'H','R','G','S','T','A','T','S'};
+export constexpr u32 STATSTORE_VERSION = 1;
+
+export struct StatRecord {
+    u64 products;
+    u64 attempts;
+    // Generator the success was derived from, -1 if unsuccessful
+    i32 parent;
+    i32 multiplier1;
+    i32 multiplier2;
+    i32 k_value;
+    i32 inversion_bitmap;
+    i32 num_mult;
+    // SuccessState::SuccessType
+    u8 success_type;
+    // Position of the generator itself in perm, -1 if not a mult success
+    i8 ypos;
+    std::array<i8,4> perm;
+    std::array<u8,2> reserved;
+};
+static_assert(sizeof(StatRecord) == 48);
+
+export struct StatStoreHeader {
+    std::array<char,8> magic;
+    u32 version;
+    u32 header_size;
+    i64 n;
+    i64 count;
+    u32 record_size;
+    u32 checksum;
+    std::array<u8,24> reserved;
+};
+static_assert(sizeof(StatStoreHeader) == 64);
+
+export constexpr u8 STAT_SUCCESS_NONE = 0;
+export constexpr u8 STAT_SUCCESS_BY_EQUIVALENCE = 2;
+export constexpr u8 STAT_SUCCESS_BY_MULT_TEST = 5;
+
+export std::string stat_path(const std::string& directory, i64 n, const std::string& suffix) {
+    return directory + "/gamma_" + std::to_string(n) + "_stat" + suffix;
+}
+
+// Generators the success of generator genidx was built from, in product order
+export std::vector<i32> stat_dependencies(const StatRecord& record, i32 genidx) {
+    std::vector<i32> deps;
+    if (record.success_type == STAT_SUCCESS_BY_EQUIVALENCE) {
+        deps.push_back(record.parent);
+    } else if (record.success_type == STAT_SUCCESS_BY_MULT_TEST) {
+        std::array<i32,4> factors = {genidx, record.multiplier1, record.multiplier2, -1};
+        for (i32 j = 0; j < record.num_mult && j < 4; ++j) {
+            if (record.perm[j] < 0) {
+                continue;
+            }
+            i32 factor = factors[record.perm[j]];
+            if (factor != -1 && factor != genidx) {
+                deps.push_back(factor);
+            }
+        }
+    }
+    return deps;
+}
+
+// Written under a temporary name and renamed into place so readers never
+// see a partial file
+template<typename Writer>
+void write_atomically(const std::string& path, std::ios::openmode mode, Writer&& writer) {
+    auto parent = std::filesystem::path(path).parent_path();
+    if (!parent.empty()) {
+        std::filesystem::create_directories(parent);
+    }
+    std::string tmp_path = path + ".tmp";
+    {
+        std::ofstream file(tmp_path, mode);
+        if (!file.is_open()) {
+            throw std::runtime_error("Failed to open statistics file: " + tmp_path);
+        }
+        writer(file);
+        if (!file) {
+            throw std::runtime_error("Failed to write statistics file: " + tmp_path);
+        }
+    }
+    std::filesystem::rename(tmp_path, path);
+}
+
+// Five lines per generator: products_tested (0 for unsolved generators),
+// inversion bitmap, ypos, ":"-prefixed dependencies and ":"-prefixed factor
+// permutation
+export void write_stat_text(const std::string& path, std::span<const StatRecord> records) {
+    write_atomically(path, std::ios::out | std::ios::trunc, [&](std::ofstream& file) {
+        std::string block;
+        for (i32 i = 0; i < records.size(); ++i) {
+            const StatRecord& record = records[i];
+            bool solved = record.success_type != STAT_SUCCESS_NONE;
+            bool mult = record.success_type == STAT_SUCCESS_BY_MULT_TEST;
+
+            block.clear();
+            block += std::to_string(solved ? std::max<u64>(record.products, 1) : 0);
+            block += '\n';
+            block += std::to_string(mult ? record.inversion_bitmap : 0);
+            block += '\n';
+            block += std::to_string(mult ? record.ypos : 0);
+            block += "\n:";
+            auto deps = stat_dependencies(record, i);
+            for (std::size_t j = 0; j < deps.size(); ++j) {
+                if (j) block += ',';
+                block += std::to_string(deps[j]);
+            }
+            block += "\n:";
+            if (mult) {
+                for (i32 j = 0; j < record.num_mult && j < 4; ++j) {
+                    if (j) block += ',';
+                    block += std::to_string(record.perm[j]);
+                }
+            }
+            block += '\n';
+            file << block;
+        }
+    });
+}
+
+export void write_stat_store(const std::string& path, std::span<const StatRecord> records, i64 n) {
+    auto payload = reinterpret_cast<const u8*>(records.data());
+    std::size_t payload_size = records.size_bytes();
+
+    StatStoreHeader header{};
+    header.magic = STATSTORE_MAGIC;
+    header.version = STATSTORE_VERSION;
+    header.header_size = sizeof(StatStoreHeader);
+    header.n = n;
+    header.count = records.size();
+    header.record_size = sizeof(StatRecord);
+    header.checksum = crc32(payload, payload_size);
+
+    write_atomically(path, std::ios::out | std::ios::trunc | std::ios::binary, [&](std::ofstream& file) {
+        file.write(reinterpret_cast<const char*>(&header), sizeof(header));
+        file.write(reinterpret_cast<const char*>(payload), payload_size);
+    });
+}
@@ -10,56 +10,261 @@ import threadpool;
 import containers;
 import util;
 import tests;
+import instrument;
+import statstore;
+import genstore;
+import pair_cache;
 
 
 
 export class TestGammaN {
 private:
 	i32 _n;
-	std::vector<std::array<i64,4>> _generators;
+	// Owned storage when constructed from a vector, empty when viewing
+	// caller-owned memory (e.g. a NumPy array from the Python bindings)
+	std::vector<std::array<i64,4>> _owned_generators;
+	std::span<const std::array<i64,4>> _generators;
 	std::unordered_set<i32> _successful;
 	std::unordered_set<i32> _remaining;
 	std::vector<SuccessState> _success_states;
 
 	UnionFind _union_find;
 
-	ThreadPool _small_pool;
-	ThreadPool _large_pool;
+	// One pool for every phase, class tests fork their multiplier tasks
+	// onto the same workers
+	SchedulerConfig _scheduler_config;
+	ThreadPool _scheduler;
 
+	GeneratorCounters _generator_counters;
 	GeneratorsState _generators_state;
 
+	// Radicals of every generator, see generator_radicals. Built on first
+	// use unless set from a stored index.
+	std::optional<RadicalIndex> _radical_index;
+
+	// Products of successful pairs shared by the MULT2 and MULT2_AK rounds
+	PairProductCache _pair_products;
+
+	// Successful generators in the order they became successful. A mult
+	// class test that ran to completion has tried every combination of the
+	// first `tried` of them, later rounds only enumerate combinations with
+	// at least one newer one. Kept per MultType, keyed by the smallest
+	// class member.
+	struct TriedWatermark {
+		std::size_t class_size;
+		i32 tried;
+	};
+	std::vector<i32> _successful_order;
+	std::vector<u8> _in_successful_order;
+	std::array<std::unordered_map<i32, TriedWatermark>, 3> _tried_watermarks;
+
+	// Instrumentation, every phase appends its PhaseMetrics here and to
+	// the writer if one is set
+	MetricsWriter* _metrics_writer = nullptr;
+	std::vector<PhaseMetrics> _phase_metrics;
+	SlowestClasses _slowest_classes;
+	i32 _mult_round = 0;
+	PhaseTimer _run_timer;
+
 public:
 
-	TestGammaN(std::vector<std::array<i64,4>>&& gens, i32 n)
+	TestGammaN(std::vector<std::array<i64,4>>&& gens, i32 n, SchedulerConfig config = SchedulerConfig::FromEnv())
+		: TestGammaN(std::move(gens), std::span<const std::array<i64,4>>{}, n, config)
+	{}
+
+	// Non-owning, gens must outlive the TestGammaN
+	TestGammaN(std::span<const std::array<i64,4>> gens, i32 n, SchedulerConfig config = SchedulerConfig::FromEnv())
+		: TestGammaN(std::vector<std::array<i64,4>>{}, gens, n, config)
+	{}
+
+	const SchedulerConfig& get_scheduler_config() const {
+		return _scheduler_config;
+	}
+
+	GeneratorsState& get_generators_state() {
+		return _generators_state;
+	}
+
+	std::span<const std::array<i64,4>> get_generators() const {
+		return _generators;
+	}
+
+	const std::vector<SuccessState>& get_success_states() const {
+		return _success_states;
+	}
+
+	i32 get_n() const {
+		return _n;
+	}
+
+	// index[i] must be generator_radicals of generator i
+	void set_radical_index(RadicalIndex index) {
+		if (index.size() != _generators.size()) {
+			throw std::invalid_argument("Radical index does not match the generators");
+		}
+		_radical_index = std::move(index);
+	}
+
+	const RadicalIndex& get_radical_index() {
+		if (!_radical_index.has_value()) {
+			_radical_index = build_radical_index(_generators, _n);
+		}
+		return *_radical_index;
+	}
+
+	// Memory budget of the pair product cache, 0 disables it
+	void set_pair_cache_bytes(std::size_t max_bytes) {
+		_pair_products.set_max_bytes(max_bytes);
+	}
+
+	void set_metrics_writer(MetricsWriter* writer) {
+		_metrics_writer = writer;
+	}
+
+	const std::vector<PhaseMetrics>& get_phase_metrics() const {
+		return _phase_metrics;
+	}
+
+	// Products and attempts spent on every generator, only valid between phases
+	std::vector<GeneratorCounters::Count> get_generator_counts() {
+		return _generator_counters.totals();
+	}
+
+	std::vector<StatRecord> get_stat_records() {
+		auto counts = _generator_counters.totals();
+		std::vector<StatRecord> records(_generators.size());
+		for (i32 i = 0; i < records.size(); ++i) {
+			const SuccessState& state = _success_states[i];
+			StatRecord& record = records[i];
+			record.products = counts[i].products;
+			record.attempts = counts[i].attempts;
+			record.success_type = static_cast<u8>(state.success_type);
+			record.parent = state.success_type == SuccessState::SuccessType::NONE ? -1 : state.success_parent_genidx;
+			record.multiplier1 = -1;
+			record.multiplier2 = -1;
+			record.k_value = -1;
+			record.inversion_bitmap = -1;
+			record.num_mult = -1;
+			record.ypos = -1;
+			record.perm = {-1, -1, -1, -1};
+
+			if (state.ak_success_solution.has_value()) {
+				record.k_value = state.ak_success_solution->k_value;
+			}
+			if (state.seq_success_solution.has_value()) {
+				record.k_value = state.seq_success_solution->k_value;
+			}
+			if (state.mult_success_solution.has_value()) {
+				const auto& mult = *state.mult_success_solution;
+				record.multiplier1 = mult.multiplier1_genidx;
+				record.multiplier2 = mult.multiplier2_genidx;
+				record.k_value = mult.k_value;
+				record.inversion_bitmap = mult.mult_result.inversion_bitmap;
+				record.num_mult = mult.mult_result.num_mult;
+				const auto& perm = mult.mult_result.perm.get();
+				for (i32 j = 0; j < perm.size() && j < 4; ++j) {
+					record.perm[j] = perm[j];
+					if (perm[j] == 0) {
+						record.ypos = j;
+					}
+				}
+			}
+		}
+		return records;
+	}
+
+	// Writes gamma_<n>_stat.txt for plot_statistics.py and the binary
+	// gamma_<n>_stat.bin into directory
+	void write_statistics(const std::string& directory) {
+		auto records = get_stat_records();
+		write_stat_text(stat_path(directory, _n, ".txt"), records);
+		write_stat_store(stat_path(directory, _n, ".bin"), records, _n);
+	}
+
+	// Records the totals since construction as a "run" phase
+	void finish_run() {
+		PhaseMetrics metrics = _run_timer.stop("run");
+		metrics.round = _mult_round;
+		record_phase(std::move(metrics), 0);
+	}
+
+private:
+
+	TestGammaN(
+		std::vector<std::array<i64,4>>&& owned, std::span<const std::array<i64,4>> view, i32 n,
+		const SchedulerConfig& config
+	)
 		: 
 		_n(n), 
-		_generators(std::move(gens)), 
+		_owned_generators(std::move(owned)),
+		_generators(_owned_generators.empty() ? view : std::span<const std::array<i64,4>>(_owned_generators)), 
 		_successful(), 
 		_remaining(std::ranges::to<std::unordered_set<i32>>(std::ranges::iota_view{0uz, _generators.size()})), 
 		_success_states(_generators.size()),
 		_union_find(_generators.size()),
-		_small_pool(20),
-		_large_pool(20),
+		_scheduler_config(config),
+		_scheduler(config.threads),
+		_generator_counters(_generators.size()),
 		_generators_state(
 			_generators, _successful, _remaining, 
 			_n,
-			_generators.size(),
-			_large_pool
-		)
+			static_cast<i32>(config.max_tasks_per_class),
+			_scheduler,
+			_generator_counters
+		),
+		_pair_products(n),
+		_run_timer(pool_list())
 	{
 		_successful.reserve(_remaining.size());
+		_generators_state.pair_products = &_pair_products;
 	}
 
-	GeneratorsState& get_generators_state() {
-		return _generators_state;
+	// Appends the generators that became successful since the last call,
+	// in index order
+	void update_successful_order() {
+		_in_successful_order.resize(_generators.size(), 0);
+		auto first_added = _successful_order.size();
+		for (i32 idx : _successful) {
+			if (!_in_successful_order[idx]) {
+				_in_successful_order[idx] = 1;
+				_successful_order.push_back(idx);
+			}
+		}
+		std::sort(_successful_order.begin() + first_added, _successful_order.end());
 	}
 
-	std::unordered_map<i32, std::pair<std::vector<i32>, bool>> get_equiv_classes_with_bool() {
-		return _union_find.get_classes_with_bool();
+	std::vector<std::pair<std::string, ThreadPool*>> pool_list() {
+		return {{"scheduler", &_scheduler}};
 	}
 
-	std::vector<std::pair<std::vector<i32>, bool>> get_equiv_classes_list_with_bool() {
-		return _union_find.get_classes_list_with_bool();
+	void record_phase(PhaseMetrics metrics, i64 successful_before) {
+		metrics.n = _n;
+		metrics.successful_total = _successful.size();
+		metrics.remaining = _remaining.size();
+		metrics.new_successful = metrics.successful_total - successful_before;
+		metrics.slowest_classes = _slowest_classes.take();
+		if (_metrics_writer != nullptr) {
+			_metrics_writer->write(metrics);
+		}
+		_phase_metrics.push_back(std::move(metrics));
+	}
+
+	template<typename F>
+	auto timed_class_test(std::span<const i32> class_members, F&& test) {
+		auto begin = std::chrono::steady_clock::now();
+		auto result = test();
+		_slowest_classes.add(
+			class_members.size(),
+			std::chrono::duration<double>(std::chrono::steady_clock::now() - begin).count()
+		);
+		return result;
+	}
+
+public:
+
+	// Valid until the next phase runs
+	const ClassIndex& get_equiv_classes() {
+		return _union_find.classes();
 	}
 
 	const std::unordered_set<i32>& get_successful_generators() const {
@@ -68,13 +273,18 @@ public:
 
 	void run_initial_check()
     {
+		PhaseTimer timer(pool_list());
+		i64 successful_before = _successful.size();
+		i64 members_tested = _remaining.size();
 		i32 gens_per_invoc = 50;
+		const RadicalIndex& radicals = get_radical_index();
 
-        auto first_caller = [this, gens_per_invoc](i32 start_idx) {
+        auto first_caller = [this, gens_per_invoc, &radicals](i32 start_idx) {
             std::vector<i32> out;
 			i32 maxidx = std::min(start_idx + gens_per_invoc, (i32)_generators.size());
 			for (i32 idx = start_idx; idx < maxidx; ++idx) {
-                if (check_element(cast_matrix<i128>(_generators[idx]), _n) != CheckElementSuccessType::NONE) {
+				_generator_counters.add(idx, 0, 1);
+                if (check_element_radicals(_generators[idx], radicals[idx], _n) != CheckElementSuccessType::NONE) {
                     out.push_back(idx);
                 }
             }
@@ -84,7 +294,7 @@ public:
         // Test all remaining generators
 		std::deque<std::future<std::vector<i32>>> futures;
         for (i32 remidx = 0; remidx < _remaining.size(); remidx += gens_per_invoc) {
-            futures.emplace_back(_large_pool.Enqueue(
+            futures.emplace_back(_scheduler.Enqueue(
                 first_caller, remidx
             ));
         }
@@ -106,92 +316,65 @@ public:
 				};
 			}
 		}
+
+		PhaseMetrics metrics = timer.stop("initial_check");
+		metrics.class_members_tested = members_tested;
+		record_phase(std::move(metrics), successful_before);
 	}
 
 	void build_initial_equiv_classes() 
 	{
+		PhaseTimer timer(pool_list());
 		i32 gen_size = _generators.size();
 
-		std::unordered_map<i64, std::vector<i32>> same_map;
-		//same_map.clear();
-
-		// Same signed x1
-		for (i32 i = 0; i < gen_size; ++i) {
-			i64 x1 = _generators[i][0];
-			same_map[x1].push_back(i);
-		}
-		for (const auto& [x1, indices] : same_map) {
-			i32 indsize = indices.size();
-			for (i32 i = 0; i < indsize; ++i) {
-				for (i32 j = 0; j < indsize; ++j) {
-					if (i == j) {
-						continue;
-					}
-					auto gen1 = _generators[indices[i]];
-					auto gen2 = _generators[indices[j]];
-
-					if (divides_radical(abs(_n*x1 + 1), abs(gen1[2] - gen2[2]))) {
-						_union_find.unite(indices[i], indices[j]);
-					} else if (divides_radical(abs(_n*x1 + 1), abs(gen1[2] - gen2[2]))) {
-						_union_find.unite(indices[i], indices[j]);
-						std::println("Simon was wrong");
-					}
-				}
-			}
-		}
-		same_map.clear();
-
-		// Same x3 or x2
-		for (i32 i = 0; i < gen_size; ++i) {
-			i64 x2 = _generators[i][1];
-			i64 x3 = _generators[i][2];
-			same_map[abs(x3)].push_back(i);
-			same_map[abs(x2)].push_back(i);
-		}
-		for (const auto& [x2_or_x3, indices] : same_map) {
-			i32 indsize = indices.size();
-			for (i32 i = 0; i < indsize; ++i) {
-				for (i32 j = 0; j < indsize; ++j) {
-					if (i == j) continue;
-					auto gen1 = _generators[indices[i]];
-					auto gen2 = _generators[indices[j]];
-
-					if (divides_radical(abs(x2_or_x3), abs(gen1[0] - gen2[0]))) {
-						_union_find.unite(indices[i], indices[j]);
+		const RadicalIndex& radicals = get_radical_index();
+
+		// Generators sharing a key are united when divides_radical(modulus,
+		// |value_i - value_j|), which is value_i == value_j modulo
+		// radical(modulus). So every generator is united with the first one
+		// seen with the same (key, value mod radical(modulus)), linear in the
+		// number of generators. The radicals come from the radical index.
+		auto unite_by_residue = [this, gen_size](auto&& for_each_entry) {
+			std::unordered_map<std::pair<i64,i64>, i32, PairHash> representatives;
+			representatives.reserve(gen_size);
+			for (i32 i = 0; i < gen_size; ++i) {
+				for_each_entry(i, [&](i64 key, u64 rad, i64 value) {
+					auto [rep, first] = representatives.try_emplace(
+						std::make_pair(key, residue(value, static_cast<i64>(rad))), i
+					);
+					if (!first) {
+						_union_find.unite(rep->second, i);
 					}
-
-				}
+				});
 			}
-		}
-		same_map.clear();
-
-		// Same signed x4
-		for (i32 i = 0; i < gen_size; ++i) {
-			i64 x4 = _generators[i][3];
-			same_map[x4].push_back(i);
-		}
+		};
 
-		for (const auto& [x4, indices] : same_map) {
-			i32 indsize = indices.size();
-			for (i32 i = 0; i < indsize; ++i) {
-				for (i32 j = 0; j < indsize; ++j) {
-					if (i == j) continue;
-					auto gen1 = _generators[indices[i]];
-					auto gen2 = _generators[indices[j]];
-
-					if (divides_radical(abs(_n*x4 + 1), abs(gen1[2] - gen2[2]))) {
-						_union_find.unite(indices[i], indices[j]);
-					} else if (divides_radical(abs(_n*x4 + 1), abs(gen1[2] - gen2[2]))) {
-						_union_find.unite(indices[i], indices[j]);
-						std::println("Simon was wrong");
-					}
-				}
-			}
-		}
+		// Same signed x1, x3 modulo rad(n*x1 + 1)
+		unite_by_residue([this, &radicals](i32 i, auto&& emit) {
+			const auto& gen = _generators[i];
+			emit(gen[0], radicals[i][RAD_NX1_PLUS_1], gen[2]);
+		});
+
+		// Same x3 or x2, x1 modulo rad(|x3|) or rad(|x2|)
+		unite_by_residue([this, &radicals](i32 i, auto&& emit) {
+			const auto& gen = _generators[i];
+			emit(abs(gen[2]), radicals[i][RAD_X3], gen[0]);
+			emit(abs(gen[1]), radicals[i][RAD_X2], gen[0]);
+		});
+
+		// Same signed x4, x3 modulo rad(n*x4 + 1)
+		unite_by_residue([this, &radicals](i32 i, auto&& emit) {
+			const auto& gen = _generators[i];
+			emit(gen[3], radicals[i][RAD_NX4_PLUS_1], gen[2]);
+		});
+
+		PhaseMetrics metrics = timer.stop("build_equiv_classes");
+		metrics.class_members_tested = gen_size;
+		record_phase(std::move(metrics), _successful.size());
 	}
 
 	void update_success_states_from_class_test(
-		const std::vector<i32>& class_members,
+		std::span<const i32> class_members,
 		const SuccessState& success_state
 	) 
 	{
@@ -347,39 +530,48 @@ public:
 
 	void run_non_mult_class_tests()
 	{
-		std::vector<std::pair<std::vector<i32>, bool>> class_map = _union_find.get_classes_list_with_bool();
+		PhaseTimer timer(pool_list());
+		i64 successful_before = _successful.size();
+		PhaseMetrics metrics;
+
+		const ClassIndex& classes = _union_find.classes();
 		std::vector<i32> new_successful;
 		new_successful.reserve(_remaining.size());
 
 		using SuccessPair = std::pair<
 			SuccessState,
-			crefw<std::vector<i32>>
+			std::span<const i32>
 		>;
 
-		std::deque<std::future<SuccessPair>> futures;
-		for (const auto& [class_members, success] : class_map) {
-			if (success) {
+		CompletionQueue<SuccessPair> completions;
+		for (std::size_t class_idx = 0; class_idx < classes.size(); ++class_idx) {
+			if (classes.flag(class_idx)) {
 				continue;
 			}
-			futures.push_back({
-				_large_pool.Enqueue(
-					[this](const std::vector<i32>& class_members) 
-						-> SuccessPair
-					{
+			std::span<const i32> class_members = classes.members_of(class_idx);
+			metrics.classes_tested += 1;
+			metrics.class_members_tested += class_members.size();
+			metrics.max_class_size = std::max<u64>(metrics.max_class_size, class_members.size());
+			completions.Submit(
+				_scheduler,
+				[this](std::span<const i32> class_members) 
+					-> SuccessPair
+				{
+					return timed_class_test(class_members, [&] {
 						return std::make_pair(is_non_mult_successful(
 							class_members,
 							_generators_state
-						), std::cref(class_members));
-					}, 
-					std::cref(class_members)
-				)
-			});
+						), class_members);
+					});
+				}, 
+				class_members
+			);
 		}
 		std::vector<std::vector<i32>> successful_classes;
-		while (!futures.empty()) {
-			auto pair = pop_when_ready(futures);
+		while (!completions.Empty()) {
+			auto pair = completions.Next();
 			const auto& result = pair.first;
-			const auto& class_members = pair.second.get();
+			std::span<const i32> class_members = pair.second;
 
 			// Process result as needed
 			update_success_states_from_class_test(
@@ -387,7 +579,7 @@ public:
 				result
 			);
 			if (result.success_type != SuccessState::SuccessType::NONE) {
-				successful_classes.push_back(class_members);
+				successful_classes.emplace_back(class_members.begin(), class_members.end());
 				// std::println(
 				// 	"Class successful by non-mult test. Success type: {}. Class size: {}",
 				// 	static_cast<int>(result.success_type),
@@ -407,54 +599,66 @@ public:
 			}
 		}
 
-		// Unite all successful classes
-		class_map = _union_find.get_classes_list_with_bool();
+		// Unite all successful classes, the snapshot is patched with the
+		// unions made while processing the results
+		const ClassIndex& updated = _union_find.classes();
 		i32 last_success_index = -1;
-		for (const auto& [class_members, success] : class_map) {
-			if (success) {
+		for (std::size_t class_idx = 0; class_idx < updated.size(); ++class_idx) {
+			if (updated.flag(class_idx)) {
+				i32 first_member = updated.members_of(class_idx)[0];
 				if (last_success_index == -1) {
-					last_success_index = class_members[0];
+					last_success_index = first_member;
 				} else {
-					_union_find.unite(last_success_index, class_members[0]);
-					last_success_index = class_members[0];
+					_union_find.unite(last_success_index, first_member);
+					last_success_index = first_member;
 				}
 			}
 		}
 
+		PhaseMetrics timed = timer.stop("non_mult");
+		timed.classes_tested = metrics.classes_tested;
+		timed.class_members_tested = metrics.class_members_tested;
+		timed.max_class_size = metrics.max_class_size;
+		timed.new_successful_classes = successful_classes.size();
+		record_phase(std::move(timed), successful_before);
 	}
 
 	inline auto one_mult_class_test(
-		const std::vector<i32>& class_members,
+		std::span<const i32> class_members,
 		MultType mult_type,
-		std::atomic<bool>& stop_flag
-	) -> std::pair<MultAndAkSuccessSolution, crefw<std::vector<i32>>>
+		std::atomic<bool>& stop_flag,
+		i32 first_new
+	) -> std::pair<MultAndAkSuccessSolution, std::span<const i32>>
 	{
 		if (mult_type == MultType::MULT1) {
 			return std::make_pair(
 				is_mult1_successful(
 					class_members,
 					_generators_state,
-					stop_flag
+					stop_flag,
+					first_new
 				), 
-				std::cref(class_members)
+				class_members
 			);
 		} else if (mult_type == MultType::MULT2) {
 			return std::make_pair(
 				is_mult2_successful(
 					class_members,
 					_generators_state,
-					stop_flag
+					stop_flag,
+					first_new
 				), 
-				std::cref(class_members)
+				class_members
 			);
 		} else if (mult_type == MultType::MULT2_AK) {
 			return std::make_pair(
 				is_mult2_Ak_successful(
 					class_members,
 					_generators_state,
-					stop_flag
+					stop_flag,
+					first_new
 				), 
-				std::cref(class_members)
+				class_members
 			);
 		} else {
 			throw std::runtime_error(
@@ -465,10 +669,25 @@ public:
 
 	i32 run_mult_class_tests(MultType mult_type)
 	{
-		std::vector<std::pair<std::vector<i32>, bool>> classes_list = _union_find.get_classes_list_with_bool();
+		PhaseTimer timer(pool_list());
+		PhaseMetrics metrics;
+		_mult_round += 1;
+
+		const ClassIndex& classes = _union_find.classes();
 		i32 current_successful = _successful.size();
 
-		_generators_state.current_class_size = classes_list.size();
+		update_successful_order();
+		_generators_state.successful_order = _successful_order;
+		i32 order_size = _successful_order.size();
+		auto& tried_watermarks = _tried_watermarks[static_cast<std::size_t>(mult_type)];
+		// Set by the class tests that were neither successful nor stopped
+		std::vector<u8> completed(classes.size(), 0);
+
+		if (mult_type != MultType::MULT1) {
+			_pair_products.extend(_generators, _successful, _scheduler);
+			metrics.pair_cache_size = _pair_products.size();
+			metrics.pair_cache_capacity = _pair_products.capacity();
+		}
 
 		// std::unordered_set<i32> processed_indices;
 		// std::unordered_set<i32> all_successful_indices;
@@ -509,7 +728,7 @@ public:
 
 		std::println(
 			"Number of classes {}",
-			classes_list.size()
+			classes.size()
 		);
 
 		std::atomic<bool> stop_flag;
@@ -517,29 +736,46 @@ public:
 
 		using MultVecPair = std::pair<
 			MultAndAkSuccessSolution,
-			std::reference_wrapper<const std::vector<i32>>
+			std::span<const i32>
 		>;
 
-		std::deque<std::future<MultVecPair>> futures;
+		CompletionQueue<MultVecPair> completions;
 
 		std::optional<MultVecPair> result_pair;
 
 		auto one_class_mult_checker = [this] (
-							const std::vector<i32>& class_members, 
+							std::span<const i32> class_members, 
 							MultType mult_type, 
-							std::atomic<bool>& stop_flag) 
+							std::atomic<bool>& stop_flag,
+							i32 first_new,
+							u8& completed) 
 		{
-			return one_mult_class_test(
-				class_members,
-				mult_type,
-				stop_flag
-			);
+			auto result = timed_class_test(class_members, [&] {
+				return one_mult_class_test(
+					class_members,
+					mult_type,
+					stop_flag,
+					first_new
+				);
+			});
+			completed = !result.first.mult_result.success && !stop_flag.load();
+			return result;
 		};
 
-		i32 small_pool_size = _small_pool.NumberOfThreads();
-		for (const auto& [class_members, class_success] : classes_list) {
+		for (std::size_t class_idx = 0; class_idx < classes.size(); ++class_idx) {
 			// We shall only try non successful classes
-			if (class_success) {
+			if (classes.flag(class_idx)) {
+				continue;
+			}
+			std::span<const i32> class_members = classes.members_of(class_idx);
+			// Nor classes that have been tried against every successful generator
+			i32 first_new = 0;
+			auto watermark = tried_watermarks.find(std::ranges::min(class_members));
+			if (watermark != tried_watermarks.end() && watermark->second.class_size == class_members.size()) {
+				first_new = watermark->second.tried;
+			}
+			if (first_new >= order_size) {
+				metrics.classes_skipped += 1;
 				continue;
 			}
 			//std::println("Submitting class with first member idx {}", class_members[0]);
@@ -552,15 +788,18 @@ public:
 			// prom.set_value(std::move(ret));
 			// futures.push_back(prom.get_future());
 
-			futures.push_back({
-				_small_pool.Enqueue(
-					one_class_mult_checker,
-					std::cref(class_members), mult_type, std::ref(stop_flag)
-				),
-			});
+			metrics.classes_tested += 1;
+			metrics.class_members_tested += class_members.size();
+			metrics.max_class_size = std::max<u64>(metrics.max_class_size, class_members.size());
+			completions.Submit(
+				_scheduler,
+				one_class_mult_checker,
+				class_members, mult_type, std::ref(stop_flag),
+				first_new, std::ref(completed[class_idx])
+			);
 
-			if (futures.size() > small_pool_size) {
-				MultVecPair popped_pair = pop_when_ready(futures);
+			if (completions.Pending() >= _scheduler_config.max_classes_in_flight) {
+				MultVecPair popped_pair = completions.Next();
 				if (popped_pair.first.mult_result.success) {
 					stop_flag.store(true);
 					result_pair = std::move(popped_pair);
@@ -576,7 +815,7 @@ public:
 				if (result_pair_ref.first.mult_result.success) {
 					// Process result as needed
 					const auto& result = result_pair_ref.first;
-					const auto& class_members = result_pair_ref.second.get();
+					std::span<const i32> class_members = result_pair_ref.second;
 					update_success_states_from_class_test(
 						class_members,
 						SuccessState{
@@ -596,7 +835,7 @@ public:
 							}
 						}
 
-						successful_classes.push_back(class_members);
+						successful_classes.emplace_back(class_members.begin(), class_members.end());
 						// std::println(
 						// 	"Class successful by mult test. Class size: {}",
 						// 	class_members.size()
@@ -607,11 +846,18 @@ public:
 		};
 
 		process_result_pair();
-		while (!futures.empty()) {
-			result_pair = pop_when_ready(futures);
+		while (!completions.Empty()) {
+			result_pair = completions.Next();
 			process_result_pair();
 		}
 
+		for (std::size_t class_idx = 0; class_idx < classes.size(); ++class_idx) {
+			if (completed[class_idx]) {
+				std::span<const i32> class_members = classes.members_of(class_idx);
+				tried_watermarks[std::ranges::min(class_members)] = {class_members.size(), order_size};
+			}
+		}
+
 		for (const auto& class_members : successful_classes) {
 			_successful.insert(
 				class_members.begin(),
@@ -624,6 +870,18 @@ public:
 
 		i32 new_successful_size = _successful.size() - current_successful;
 
+		PhaseMetrics timed = timer.stop("mult");
+		timed.mult_type = mult_type_name(mult_type);
+		timed.round = _mult_round;
+		timed.classes_tested = metrics.classes_tested;
+		timed.class_members_tested = metrics.class_members_tested;
+		timed.max_class_size = metrics.max_class_size;
+		timed.classes_skipped = metrics.classes_skipped;
+		timed.pair_cache_size = metrics.pair_cache_size;
+		timed.pair_cache_capacity = metrics.pair_cache_capacity;
+		timed.new_successful_classes = successful_classes.size();
+		record_phase(std::move(timed), current_successful);
+
 		return new_successful_size;
 	}
 
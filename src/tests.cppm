@@ -9,31 +9,42 @@ import containers;
 import util;
 
 import mult_test;
+import pair_cache;
 
 export struct GeneratorsState {
 
     GeneratorsState(
-        const std::vector<std::array<i64,4>>& gens,
+        std::span<const std::array<i64,4>> gens,
         std::unordered_set<i32>& succ,
         std::unordered_set<i32>& rem,
         i32 n_val,
-        i32 current_class_size_val,
-        ThreadPool& thread_pool
+        i32 max_tasks_per_class_val,
+        ThreadPool& thread_pool,
+        GeneratorCounters& gen_counters
     )
         : generators(gens),
           successful(succ),
           remaining(rem),
           n(n_val),
-          current_class_size(current_class_size_val),
-          tp(thread_pool)
+          max_tasks_per_class(max_tasks_per_class_val),
+          tp(thread_pool),
+          counters(gen_counters)
     {}
 
-    const std::vector<std::array<i64,4>>& generators;
+    std::span<const std::array<i64,4>> generators;
     std::unordered_set<i32>& successful;
     std::unordered_set<i32>& remaining;
     i32 n;
-    i32 current_class_size;
+    // Multiplier tasks a mult class test keeps in flight on tp
+    i32 max_tasks_per_class;
     ThreadPool& tp;
+    // Products and attempts spent on each generator under test
+    GeneratorCounters& counters;
+    // Products of successful pairs for the MULT2 searches, optional
+    const PairProductCache* pair_products = nullptr;
+    // The successful generators in the order they became successful, the
+    // mult searches enumerate their multipliers from it
+    std::span<const i32> successful_order;
 };
 
 export struct InitialSuccessSolution {
@@ -42,7 +53,7 @@ export struct InitialSuccessSolution {
 };
 
 export InitialSuccessSolution is_initial_successful(
-    const std::vector<i32>& class_members,
+    std::span<const i32> class_members,
     const GeneratorsState& gen_state
 ) {
     for (i32 midx = 0; midx < class_members.size(); ++midx) {
@@ -60,16 +71,19 @@ export struct AkSuccessSolution {
 };
 
 export AkSuccessSolution is_Ak_successful(
-    const std::vector<i32>& class_members,
+    std::span<const i32> class_members,
     const GeneratorsState& gen_state
 ) {
     i32 n = gen_state.n;
     std::vector<i32> test_k_vals = {1, n, n*n+1, 2*n*n};
     for (i32 kidx = 0; kidx < test_k_vals.size()-1; ++kidx) {
         for (i32 midx = 0; midx < class_members.size(); ++midx) {
-            auto mat = cast_matrix<i128>(gen_state.generators[class_members[midx]]);
+            auto mat = gen_state.generators[class_members[midx]];
             auto ret = check_element_Ak(mat, n, test_k_vals[kidx], test_k_vals[kidx+1]);
-            if (ret.info != SuccessStateAk::SuccessType::NONE) {
+            bool success = ret.info != SuccessStateAk::SuccessType::NONE;
+            i32 num_k = success ? ret.k_value - test_k_vals[kidx] + 1 : test_k_vals[kidx+1] - test_k_vals[kidx];
+            gen_state.counters.add(class_members[midx], ret.num_products, num_k);
+            if (success) {
                 return {true, class_members[midx], ret.k_value};
             }
         }
@@ -84,13 +98,15 @@ export struct SeqSuccessSolution {
 };
 
 export SeqSuccessSolution is_sequence_successful(
-    const std::vector<i32>& class_members,
+    std::span<const i32> class_members,
     const GeneratorsState& gen_state
 ) {
     for (const auto& member : class_members) {
-        auto mat = cast_matrix<i128>(gen_state.generators[member]);
+        auto mat = gen_state.generators[member];
         auto res = check_element_sequence(mat, gen_state.n);
-        if (res.info != SuccessStateSeq::SuccessType::NONE) {
+        bool success = res.info != SuccessStateSeq::SuccessType::NONE;
+        gen_state.counters.add(member, 0, success ? res.k + 1 : 6);
+        if (success) {
             return {true, member, res.k};
         }
     }
@@ -112,28 +128,39 @@ export enum class MultType : u8 {
     MULT2_AK
 };
 
+export std::string mult_type_name(MultType mult_type) {
+    switch (mult_type) {
+    case MultType::MULT1: return "MULT1";
+    case MultType::MULT2: return "MULT2";
+    case MultType::MULT2_AK: return "MULT2_AK";
+    }
+    return "UNKNOWN";
+}
+
 export MultAndAkSuccessSolution is_mult1_successful(
-    const std::vector<i32>& class_members,
+    std::span<const i32> class_members,
     const GeneratorsState& gen_state,
-    std::atomic<bool>& stop_flag
+    std::atomic<bool>& stop_flag,
+    i32 first_new = 0
 ) 
 {
-    auto member_checker = [&class_members, &gen_state](i32 mat1_idx)
+    auto member_checker = [class_members, &gen_state](i32 mat1_idx)
         -> MultAndAkSuccessSolution
     {
-        std::vector<std::array<i128,4>> factors(2);
+        std::vector<std::array<i64,4>> factors(2);
         std::vector<bool> factors_are_k = {false, false};
 
-        factors[1] = cast_matrix<i128>(gen_state.generators[mat1_idx]);
+        factors[1] = gen_state.generators[mat1_idx];
 
         for (i32 midx : class_members) {
 
-            factors[0] = cast_matrix<i128>(gen_state.generators[midx]);
-            auto result = check_one_mult<i128>(
+            factors[0] = gen_state.generators[midx];
+            auto result = check_one_mult<i64>(
                                         factors, 
                                         factors_are_k, 
                                         gen_state.n
                                     );
+            gen_state.counters.add(midx, result.num_products, 1);
             if (result.success) {
                 return MultAndAkSuccessSolution{
                     midx, mat1_idx, -1, -1, result
@@ -148,62 +175,65 @@ export MultAndAkSuccessSolution is_mult1_successful(
 
     MultAndAkSuccessSolution result;
 
-    i32 pool_size = (i32)gen_state.tp.NumberOfThreads();
-    i32 local_queue_size = std::max(1, pool_size / gen_state.current_class_size);
     i32 succ_size = gen_state.successful.size();
-    std::deque<std::future<MultAndAkSuccessSolution>> futures;
-    // iterate over all permutations of 2 successful generators
-    for (auto it1 = gen_state.successful.begin(); it1 != gen_state.successful.end(); ++it1) {
-        i32 mat1_idx = *it1;
+    CompletionQueue<MultAndAkSuccessSolution> completions;
+    // iterate over the successful generators from successful_order[first_new] on,
+    // the earlier ones have already been tried against this class
+    const auto& order = gen_state.successful_order;
+    for (i32 i = first_new; i < order.size(); ++i) {
+        i32 mat1_idx = order[i];
 
         if (stop_flag.load()) {
             goto loop_done;
         }
-        if ((futures.size() > local_queue_size && gen_state.tp.PoolIsBusy()) || futures.size() > 4*pool_size) {
-            result = pop_when_ready(futures);
+        if (completions.Pending() >= gen_state.max_tasks_per_class) {
+            result = completions.Next();
             if (result.mult_result.success) {
                 goto loop_done;
             }
         }
 
-        futures.push_back(gen_state.tp.Enqueue(
-            member_checker, mat1_idx
-        ));
+        completions.Submit(gen_state.tp, member_checker, mat1_idx);
     }
     loop_done:
-    while (!futures.empty()) {
+    while (!completions.Empty()) {
         if (!result.mult_result.success) {
-            result = pop_when_ready(futures);
+            result = completions.Next();
         } else {
-            pop_when_ready(futures);
+            completions.Next();
         }
     }
     return result;
 }
 
 export MultAndAkSuccessSolution is_mult2_successful(
-    const std::vector<i32>& class_members,
+    std::span<const i32> class_members,
     const GeneratorsState& gen_state,
-    std::atomic<bool>& stop_flag
+    std::atomic<bool>& stop_flag,
+    i32 first_new = 0
 ) 
 {
-    auto member_checker = [&class_members, &gen_state](i32 mat1_idx, i32 mat2_idx)
+    auto member_checker = [class_members, &gen_state](i32 mat1_idx, i32 mat2_idx)
         -> MultAndAkSuccessSolution
     {
-        std::vector<std::array<i128,4>> factors(3);
+        std::vector<std::array<i64,4>> factors(3);
         std::vector<bool> factors_are_k = {false, false, false};
 
-        factors[1] = cast_matrix<i128>(gen_state.generators[mat1_idx]);
-        factors[2] = cast_matrix<i128>(gen_state.generators[mat2_idx]);
+        factors[1] = gen_state.generators[mat1_idx];
+        factors[2] = gen_state.generators[mat2_idx];
+        PairProductsRef pair = gen_state.pair_products != nullptr ?
+            gen_state.pair_products->find(mat1_idx, mat2_idx) : PairProductsRef{};
 
         for (i32 midx : class_members) {
 
-            factors[0] = cast_matrix<i128>(gen_state.generators[midx]);
-            auto result = check_one_mult<i128>(
+            factors[0] = gen_state.generators[midx];
+            auto result = check_one_mult<i64>(
                                         factors, 
                                         factors_are_k, 
-                                        gen_state.n
+                                        gen_state.n,
+                                        pair
                                     );
+            gen_state.counters.add(midx, result.num_products, 1);
             if (result.success) {
                 return MultAndAkSuccessSolution{
                     midx, mat1_idx, mat2_idx, -1, result
@@ -218,36 +248,35 @@ export MultAndAkSuccessSolution is_mult2_successful(
 
     MultAndAkSuccessSolution result;
 
-    i32 pool_size = (i32)gen_state.tp.NumberOfThreads();
-    i32 local_queue_size = std::max(1, pool_size / gen_state.current_class_size);
     i32 succ_size = gen_state.successful.size();
-    std::deque<std::future<MultAndAkSuccessSolution>> futures;
-    // iterate over all permutations of 2 successful generators
-    for (auto it1 = gen_state.successful.begin(); it1 != gen_state.successful.end(); ++it1) {
-    for (auto it2 = it1; it2 != gen_state.successful.end(); ++it2) {
-        i32 mat1_idx = *it1;
-        i32 mat2_idx = *it2;
+    CompletionQueue<MultAndAkSuccessSolution> completions;
+    // iterate over all unordered pairs of 2 successful generators with at least
+    // one from successful_order[first_new] on, pairs of earlier ones have
+    // already been tried against this class
+    const auto& order = gen_state.successful_order;
+    for (i32 j = first_new; j < order.size(); ++j) {
+    for (i32 i = 0; i <= j; ++i) {
+        i32 mat1_idx = order[i];
+        i32 mat2_idx = order[j];
 
         if (stop_flag.load()) {
             goto loop_done;
         }
-        if ((futures.size() > local_queue_size && gen_state.tp.PoolIsBusy()) || futures.size() > 4*pool_size) {
-            result = pop_when_ready(futures);
+        if (completions.Pending() >= gen_state.max_tasks_per_class) {
+            result = completions.Next();
             if (result.mult_result.success) {
                 goto loop_done;
             }
         }
 
-        futures.push_back(gen_state.tp.Enqueue(
-            member_checker, mat1_idx, mat2_idx
-        ));
+        completions.Submit(gen_state.tp, member_checker, mat1_idx, mat2_idx);
     }}
     loop_done:
-    while (!futures.empty()) {
+    while (!completions.Empty()) {
         if (!result.mult_result.success) {
-            result = pop_when_ready(futures);
+            result = completions.Next();
         } else {
-            pop_when_ready(futures);
+            completions.Next();
         }
     }
     return result;
@@ -255,41 +284,51 @@ export MultAndAkSuccessSolution is_mult2_successful(
 
 
 export MultAndAkSuccessSolution is_mult2_Ak_successful(
-    const std::vector<i32>& class_members,
+    std::span<const i32> class_members,
     const GeneratorsState& gen_state,
-    std::atomic<bool>& stop_flag
+    std::atomic<bool>& stop_flag,
+    i32 first_new = 0
 ) 
 {
-    auto member_checker = [&class_members, &gen_state](i32 mat1_idx, i32 mat2_idx)
+    auto member_checker = [class_members, &gen_state](i32 mat1_idx, i32 mat2_idx)
         -> MultAndAkSuccessSolution
     {
-        std::vector<std::array<i128,4>> factors(4);
+        std::vector<std::array<i64,4>> factors(4);
         std::vector<bool> factors_are_k = {false, false, false, true};
 
-        factors[1] = cast_matrix<i128>(gen_state.generators[mat1_idx]);
-        factors[2] = cast_matrix<i128>(gen_state.generators[mat2_idx]);
+        factors[1] = gen_state.generators[mat1_idx];
+        factors[2] = gen_state.generators[mat2_idx];
+        PairProductsRef pair = gen_state.pair_products != nullptr ?
+            gen_state.pair_products->find(mat1_idx, mat2_idx) : PairProductsRef{};
 
         for (i32 midx : class_members) {
 
-            factors[0] = cast_matrix<i128>(gen_state.generators[midx]);
+            factors[0] = gen_state.generators[midx];
 
+            u64 products = 0;
+            u64 attempts = 0;
             for (i32 k = 0; k < gen_state.n+1; ++k) {
                 factors[3][0] = k;
                 factors[3][1] = -k*k;
                 factors[3][2] = 1;
                 factors[3][3] = -k;
 
-                auto result = check_one_mult<i128>(
+                auto result = check_one_mult<i64>(
                                         factors, 
                                         factors_are_k, 
-                                        gen_state.n
+                                        gen_state.n,
+                                        pair
                                     );
+                products += result.num_products;
+                attempts += 1;
                 if (result.success) {
+                    gen_state.counters.add(midx, products, attempts);
                     return MultAndAkSuccessSolution{
                         midx, mat1_idx, mat2_idx, k, result
                     };
                 }
             }
+            gen_state.counters.add(midx, products, attempts);
 
         }
         return MultAndAkSuccessSolution{
@@ -299,36 +338,35 @@ export MultAndAkSuccessSolution is_mult2_Ak_successful(
 
     MultAndAkSuccessSolution result;
 
-    i32 pool_size = (i32)gen_state.tp.NumberOfThreads();
-    i32 local_queue_size = std::max(1, pool_size / gen_state.current_class_size);
     i32 succ_size = gen_state.successful.size();
-    std::deque<std::future<MultAndAkSuccessSolution>> futures;
-    // iterate over all permutations of 2 successful generators
-    for (auto it1 = gen_state.successful.begin(); it1 != gen_state.successful.end(); ++it1) {
-    for (auto it2 = it1; it2 != gen_state.successful.end(); ++it2) {
-        i32 mat1_idx = *it1;
-        i32 mat2_idx = *it2;
+    CompletionQueue<MultAndAkSuccessSolution> completions;
+    // iterate over all unordered pairs of 2 successful generators with at least
+    // one from successful_order[first_new] on, pairs of earlier ones have
+    // already been tried against this class
+    const auto& order = gen_state.successful_order;
+    for (i32 j = first_new; j < order.size(); ++j) {
+    for (i32 i = 0; i <= j; ++i) {
+        i32 mat1_idx = order[i];
+        i32 mat2_idx = order[j];
 
         if (stop_flag.load()) {
             goto loop_done;
         }
-        if ((futures.size() > local_queue_size && gen_state.tp.PoolIsBusy()) || futures.size() > 4*pool_size) {
-            result = pop_when_ready(futures);
+        if (completions.Pending() >= gen_state.max_tasks_per_class) {
+            result = completions.Next();
             if (result.mult_result.success) {
                 goto loop_done;
             }
         }
 
-        futures.push_back(gen_state.tp.Enqueue(
-            member_checker, mat1_idx, mat2_idx
-        ));
+        completions.Submit(gen_state.tp, member_checker, mat1_idx, mat2_idx);
     }}
     loop_done:
-    while (!futures.empty()) {
+    while (!completions.Empty()) {
         if (!result.mult_result.success) {
-            result = pop_when_ready(futures);
+            result = completions.Next();
         } else {
-            pop_when_ready(futures);
+            completions.Next();
         }
     }
     return result;
@@ -376,7 +414,7 @@ export struct SuccessState {
 };
 
 export SuccessState is_non_mult_successful(
-    const std::vector<i32>& class_members,
+    std::span<const i32> class_members,
     const GeneratorsState& gen_state
 )
 {
@@ -7,36 +7,215 @@ import std;
 export template <typename Signature>
 using MoveOnlyFunction = std::move_only_function<Signature>;
 
+// Cumulative utilization counters of a ThreadPool, see ThreadPool::Stats
+export struct PoolStats {
+  std::size_t threads = 0;
+  std::uint64_t tasks_enqueued = 0;
+  std::uint64_t tasks_completed = 0;
+  double idle_seconds = 0.0;
+  double busy_seconds = 0.0;
+  // Sum of the queue depth seen by every Enqueue, divide by tasks_enqueued
+  // for the mean depth
+  std::uint64_t queue_depth_sum = 0;
+  std::size_t max_queue_depth = 0;
+
+  // Counters accumulated since earlier, max_queue_depth is kept as is
+  PoolStats since(const PoolStats &earlier) const {
+    PoolStats out = *this;
+    out.tasks_enqueued -= earlier.tasks_enqueued;
+    out.tasks_completed -= earlier.tasks_completed;
+    out.idle_seconds -= earlier.idle_seconds;
+    out.busy_seconds -= earlier.busy_seconds;
+    out.queue_depth_sum -= earlier.queue_depth_sum;
+    return out;
+  }
+};
+
+export std::size_t hardware_threads() {
+  std::size_t threads = std::thread::hardware_concurrency();
+  return threads > 0 ? threads : 1;
+}
+
+// Sizing of the engine's scheduler, read from the environment so the same
+// build runs on a laptop and on a large node:
+//   HASTY_THREADS            worker threads (default: hardware threads)
+//   HASTY_CLASSES_IN_FLIGHT  class tests running at once in the mult phase
+//                            (default: worker threads)
+//   HASTY_TASKS_PER_CLASS    multiplier tasks one class test keeps in
+//                            flight (default: 4)
+export struct SchedulerConfig {
+  std::size_t threads = hardware_threads();
+  std::size_t max_classes_in_flight = hardware_threads();
+  std::size_t max_tasks_per_class = 4;
+
+  static SchedulerConfig FromEnv() {
+    auto read = [](const char *name, std::size_t fallback) -> std::size_t {
+      const char *value = std::getenv(name);
+      if (value == nullptr || *value == '\0') {
+        return fallback;
+      }
+      std::size_t parsed = std::stoull(value);
+      if (parsed == 0) {
+        throw std::invalid_argument(std::string(name) + " must be positive");
+      }
+      return parsed;
+    };
+    SchedulerConfig config;
+    config.threads = read("HASTY_THREADS", config.threads);
+    config.max_classes_in_flight = read("HASTY_CLASSES_IN_FLIGHT", config.threads);
+    config.max_tasks_per_class = read("HASTY_TASKS_PER_CLASS", config.max_tasks_per_class);
+    return config;
+  }
+};
+
+// Work-stealing pool. Every worker owns a deque: tasks enqueued from one of
+// the pool's own workers go to that worker's deque, others are spread
+// round-robin. A worker takes the newest task from the back of its own
+// deque and, when it is empty, steals the oldest from the front of the
+// others, so the deques are only contended while stealing. Workers sleep
+// on one condition variable while no task is pending. A task may itself
+// fork sub-tasks and wait for them through a CompletionQueue. The waiting
+// worker runs the newest tasks of its own deque in the meantime, its own
+// sub-tasks first (see RunPendingTask), while idle workers steal the
+// older, larger tasks, so nested fork-join needs no extra threads.
 export class ThreadPool {
 private:
-  std::deque<MoveOnlyFunction<void()>> tasks_{};
+  using Clock = std::chrono::steady_clock;
+
+  struct alignas(64) WorkerQueue {
+    std::mutex lock;
+    std::deque<MoveOnlyFunction<void()>> tasks;
+  };
+
+  std::vector<std::unique_ptr<WorkerQueue>> queues_;
+  // Start of the current wait of every worker in ns, -1 while it runs a task
+  std::vector<std::atomic<std::int64_t>> waiting_since_;
   std::vector<std::thread> threads_{};
-  std::mutex lock_{};
+  // Tasks enqueued but not yet taken by a worker
+  std::atomic<std::size_t> pending_{0};
+  std::atomic<std::size_t> next_queue_{0};
+  // Workers waiting on cv_, changed under sleep_lock_
+  std::atomic<std::size_t> sleeping_{0};
+  std::mutex sleep_lock_{};
   std::condition_variable cv_{};
-  bool stopped_ = false;
+  std::atomic<bool> stopped_{false};
+
+  std::atomic<std::uint64_t> tasks_completed_{0};
+  std::atomic<std::int64_t> idle_ns_{0};
+  std::atomic<std::int64_t> busy_ns_{0};
+  std::atomic<std::uint64_t> tasks_enqueued_{0};
+  std::atomic<std::uint64_t> queue_depth_sum_{0};
+  // Peak since the last FoldPeak, see OpenPeakWindow
+  std::atomic<std::size_t> max_queue_depth_{0};
+  std::mutex peak_lock_{};
+  std::size_t lifetime_peak_ = 0;
+  std::size_t next_peak_window_ = 0;
+  std::map<std::size_t, std::size_t> peak_windows_{};
+
+  // Pool and worker index of the calling thread, nullptr outside workers
+  static inline thread_local ThreadPool *current_pool_ = nullptr;
+  static inline thread_local std::size_t current_worker_ = 0;
+
+  static std::int64_t NowNs() {
+    return std::chrono::duration_cast<std::chrono::nanoseconds>(
+               Clock::now().time_since_epoch())
+        .count();
+  }
+
+  bool TryPopOwn(std::size_t worker, MoveOnlyFunction<void()> &task) {
+    WorkerQueue &own = *queues_[worker];
+    const auto guard = std::lock_guard<std::mutex>{own.lock};
+    if (own.tasks.empty()) {
+      return false;
+    }
+    task = std::move(own.tasks.back());
+    own.tasks.pop_back();
+    pending_.fetch_sub(1, std::memory_order_relaxed);
+    return true;
+  }
+
+  bool TryPop(std::size_t worker, MoveOnlyFunction<void()> &task) {
+    if (TryPopOwn(worker, task)) {
+      return true;
+    }
+    for (std::size_t offset = 1; offset < queues_.size(); ++offset) {
+      WorkerQueue &victim = *queues_[(worker + offset) % queues_.size()];
+      const auto guard = std::lock_guard<std::mutex>{victim.lock};
+      if (!victim.tasks.empty()) {
+        task = std::move(victim.tasks.front());
+        victim.tasks.pop_front();
+        pending_.fetch_sub(1, std::memory_order_relaxed);
+        return true;
+      }
+    }
+    return false;
+  }
+
+  void Push(MoveOnlyFunction<void()> task) {
+    std::size_t queue = current_pool_ == this
+                            ? current_worker_
+                            : next_queue_.fetch_add(1, std::memory_order_relaxed) % queues_.size();
+    // Counted before it is visible so pending_ never drops below the
+    // number of queued tasks
+    std::size_t depth = pending_.fetch_add(1) + 1;
+    {
+      WorkerQueue &target = *queues_[queue];
+      const auto guard = std::lock_guard<std::mutex>{target.lock};
+      target.tasks.push_back(std::move(task));
+    }
+    tasks_enqueued_.fetch_add(1, std::memory_order_relaxed);
+    queue_depth_sum_.fetch_add(depth, std::memory_order_relaxed);
+    std::size_t peak = max_queue_depth_.load(std::memory_order_relaxed);
+    while (depth > peak && !max_queue_depth_.compare_exchange_weak(peak, depth, std::memory_order_relaxed)) {
+    }
+    // A worker counts itself in sleeping_ before it checks pending_, so
+    // either it sees the task or this sees it sleeping. Taking the lock
+    // keeps the notify from landing between its check and its wait.
+    if (sleeping_.load() > 0) {
+      {
+        const auto guard = std::lock_guard<std::mutex>{sleep_lock_};
+      }
+      cv_.notify_one();
+    }
+  }
+
+  void WorkerLoop(std::size_t i) {
+    current_pool_ = this;
+    current_worker_ = i;
+    while (true) {
+      auto task = MoveOnlyFunction<void()>{};
+      if (!TryPop(i, task)) {
+        auto ulock = std::unique_lock<std::mutex>{sleep_lock_};
+        std::int64_t wait_start = NowNs();
+        waiting_since_[i].store(wait_start, std::memory_order_relaxed);
+        sleeping_.fetch_add(1);
+        cv_.wait(ulock, [this]() {
+          return stopped_.load() || pending_.load() > 0;
+        });
+        sleeping_.fetch_sub(1);
+        waiting_since_[i].store(-1, std::memory_order_relaxed);
+        idle_ns_.fetch_add(NowNs() - wait_start, std::memory_order_relaxed);
+
+        if (stopped_.load()) {
+          return;
+        }
+        continue;
+      }
+      std::int64_t task_start = NowNs();
+      task();
+      busy_ns_.fetch_add(NowNs() - task_start, std::memory_order_relaxed);
+      tasks_completed_.fetch_add(1, std::memory_order_relaxed);
+    }
+  }
 
 public:
-  explicit ThreadPool(std::size_t threads) {
+  explicit ThreadPool(std::size_t threads) : waiting_since_(threads) {
     for (std::size_t i = 0; i < threads; ++i) {
-      threads_.emplace_back([this]() {
-        while (true) {
-          auto task = MoveOnlyFunction<void()>{}; // benchmark inside or outside
-          {
-            auto ulock = std::unique_lock<std::mutex>{lock_};
-            cv_.wait(ulock, [this]() {
-              return this->stopped_ || !this->tasks_.empty();
-            });
-
-            if (stopped_) {
-              return;
-            }
-
-            task = std::move(tasks_.front());
-            tasks_.pop_front();
-          }
-          task();
-        }
-      });
+      queues_.push_back(std::make_unique<WorkerQueue>());
+      waiting_since_[i].store(-1);
+    }
+    for (std::size_t i = 0; i < threads; ++i) {
+      threads_.emplace_back([this, i]() { WorkerLoop(i); });
     }
   }
   ~ThreadPool() {
@@ -49,8 +228,7 @@ public:
   auto operator=(ThreadPool) -> ThreadPool & = delete;
 
   std::size_t NumberOfWorkitems() {
-    const auto guard = std::lock_guard<std::mutex>{lock_};
-    return tasks_.size();
+    return pending_.load();
   }
 
   std::size_t NumberOfThreads() const {
@@ -58,12 +236,97 @@ public:
   }
 
   bool PoolIsBusy() {
-    const auto guard = std::lock_guard<std::mutex>{lock_};
-    return !tasks_.empty();
+    return pending_.load() > 0;
+  }
+
+  // True on the pool's own worker threads
+  bool IsWorkerThread() const {
+    return current_pool_ == this;
+  }
+
+  // Runs the newest task of the calling worker's own deque, false if it
+  // is empty or the caller is not a worker of this pool. Tasks a worker
+  // enqueues go to its own deque, so a waiting task runs its own sub-tasks
+  // first and never steals other work. The time is accounted to the task
+  // the caller is already running.
+  bool RunPendingTask() {
+    if (!IsWorkerThread()) {
+      return false;
+    }
+    auto task = MoveOnlyFunction<void()>{};
+    if (!TryPopOwn(current_worker_, task)) {
+      return false;
+    }
+    task();
+    tasks_completed_.fetch_add(1, std::memory_order_relaxed);
+    return true;
+  }
+
+private:
+  // Moves the peak seen by Push into the lifetime peak and every open
+  // window, peak_lock_ must be held
+  void FoldPeak() {
+    std::size_t peak = max_queue_depth_.exchange(pending_.load(), std::memory_order_relaxed);
+    lifetime_peak_ = std::max(lifetime_peak_, peak);
+    for (auto &[id, window_peak] : peak_windows_) {
+      window_peak = std::max(window_peak, peak);
+    }
+  }
+
+public:
+  // Peak queue depths over nested intervals (e.g. one per phase inside a
+  // whole run) without resetting each other. Push only updates one atomic,
+  // it is folded into the open windows when one is opened, read or closed.
+  std::size_t OpenPeakWindow() {
+    const auto guard = std::lock_guard<std::mutex>{peak_lock_};
+    FoldPeak();
+    std::size_t id = next_peak_window_++;
+    peak_windows_.emplace(id, pending_.load());
+    return id;
+  }
+
+  std::size_t WindowPeak(std::size_t id) {
+    const auto guard = std::lock_guard<std::mutex>{peak_lock_};
+    FoldPeak();
+    return peak_windows_.at(id);
+  }
+
+  void ClosePeakWindow(std::size_t id) {
+    const auto guard = std::lock_guard<std::mutex>{peak_lock_};
+    peak_windows_.erase(id);
+  }
+
+  // Utilization since construction. Waits still in progress count as idle
+  // time up to now.
+  PoolStats Stats() {
+    PoolStats stats;
+    stats.threads = threads_.size();
+    stats.tasks_enqueued = tasks_enqueued_.load(std::memory_order_relaxed);
+    stats.queue_depth_sum = queue_depth_sum_.load(std::memory_order_relaxed);
+    {
+      const auto guard = std::lock_guard<std::mutex>{peak_lock_};
+      FoldPeak();
+      stats.max_queue_depth = lifetime_peak_;
+    }
+    std::int64_t now = NowNs();
+    std::int64_t idle_ns = idle_ns_.load(std::memory_order_relaxed);
+    for (const auto &since : waiting_since_) {
+      std::int64_t start = since.load(std::memory_order_relaxed);
+      if (start >= 0) {
+        idle_ns += now - start;
+      }
+    }
+    stats.idle_seconds = idle_ns * 1e-9;
+    stats.busy_seconds = busy_ns_.load(std::memory_order_relaxed) * 1e-9;
+    stats.tasks_completed = tasks_completed_.load(std::memory_order_relaxed);
+    return stats;
   }
 
   auto Stop() -> void {
-    stopped_ = true;
+    {
+      const auto guard = std::lock_guard<std::mutex>{sleep_lock_};
+      stopped_ = true;
+    }
     cv_.notify_all();
     for (auto &thread : threads_) {
       thread.join();
@@ -76,21 +339,134 @@ public:
 
     auto promise = std::promise<Return_Type>{};
     auto future = promise.get_future();
+    Push([promise = std::move(promise),
+          task = std::bind(std::forward<Callable>(func),
+                           std::forward<Args>(args)...)]() mutable {
+      if constexpr (std::is_void_v<Return_Type>) {
+        std::invoke(task);
+        promise.set_value();
+      } else {
+        promise.set_value(std::invoke(task));
+      }
+    });
+    return std::move(future);
+  }
+
+  // Runs func(args...) without a future, for callers that deliver the
+  // result themselves (see CompletionQueue)
+  template <typename Callable, typename... Args>
+  void Post(Callable &&func, Args &&...args) {
+    Push([task = std::bind(std::forward<Callable>(func),
+                           std::forward<Args>(args)...)]() mutable {
+      std::invoke(task);
+    });
+  }
+};
+
+// Results of tasks submitted through it, in the order the tasks finish.
+// Next() blocks until a result is available, so the coordinating thread
+// sleeps instead of polling futures; called from a worker of the pool it
+// runs pending tasks while it waits. Must not be destroyed while tasks
+// are outstanding, the destructor waits for them.
+export template <typename T>
+class CompletionQueue {
+private:
+  struct Completion {
+    std::optional<T> value;
+    std::exception_ptr error;
+  };
+
+  std::mutex lock_{};
+  std::condition_variable cv_{};
+  std::deque<Completion> done_{};
+  // Submitted and not yet returned by Next()
+  std::size_t pending_ = 0;
+  ThreadPool *pool_ = nullptr;
+
+  // On a worker of pool_, runs tasks of its own deque while waiting holds.
+  // Stops when that deque is empty: every task submitted here from this
+  // worker went to it, so from then on all of them have been taken and are
+  // running, and it is safe to block.
+  template <typename Predicate>
+  void HelpWhile(std::unique_lock<std::mutex> &ulock, Predicate waiting) {
+    if (pool_ == nullptr || !pool_->IsWorkerThread()) {
+      return;
+    }
+    while (waiting()) {
+      ulock.unlock();
+      bool ran = pool_->RunPendingTask();
+      ulock.lock();
+      if (!ran) {
+        return;
+      }
+    }
+  }
+
+  void Deliver(Completion completion) {
+    // Notified under the lock, the destructor may run as soon as it is released
+    const auto guard = std::lock_guard<std::mutex>{lock_};
+    done_.push_back(std::move(completion));
+    cv_.notify_all();
+  }
+
+public:
+  CompletionQueue() = default;
+  CompletionQueue(const CompletionQueue &) = delete;
+  auto operator=(const CompletionQueue &) -> CompletionQueue & = delete;
+
+  ~CompletionQueue() {
+    auto ulock = std::unique_lock<std::mutex>{lock_};
+    HelpWhile(ulock, [this]() { return done_.size() < pending_; });
+    cv_.wait(ulock, [this]() { return done_.size() == pending_; });
+  }
+
+  template <typename Callable, typename... Args>
+  void Submit(ThreadPool &pool, Callable &&func, Args &&...args) {
     {
       const auto guard = std::lock_guard<std::mutex>{lock_};
-      tasks_.emplace_back(
-          [promise = std::move(promise),
-           task = std::bind(std::forward<Callable>(func),
-                            std::forward<Args>(args)...)]() mutable {
-            if constexpr (std::is_void_v<Return_Type>) {
-              std::invoke(task);
-              promise.set_value();
-            } else {
-              promise.set_value(std::invoke(task));
-            }
-          });
-    }
-    cv_.notify_one();
-    return std::move(future);
+      if (pool_ != nullptr && pool_ != &pool) {
+        throw std::logic_error("CompletionQueue used with more than one ThreadPool");
+      }
+      pool_ = &pool;
+      ++pending_;
+    }
+    pool.Post([this, task = std::bind(std::forward<Callable>(func),
+                                      std::forward<Args>(args)...)]() mutable {
+      Completion completion;
+      try {
+        completion.value.emplace(std::invoke(task));
+      } catch (...) {
+        completion.error = std::current_exception();
+      }
+      Deliver(std::move(completion));
+    });
+  }
+
+  // Number of submitted results not yet taken with Next()
+  std::size_t Pending() {
+    const auto guard = std::lock_guard<std::mutex>{lock_};
+    return pending_;
+  }
+
+  bool Empty() {
+    return Pending() == 0;
+  }
+
+  // The result of the next task to finish, rethrows its exception
+  T Next() {
+    auto ulock = std::unique_lock<std::mutex>{lock_};
+    if (pending_ == 0) {
+      throw std::logic_error("CompletionQueue::Next called with no outstanding tasks");
+    }
+    HelpWhile(ulock, [this]() { return done_.empty(); });
+    cv_.wait(ulock, [this]() { return !done_.empty(); });
+    Completion completion = std::move(done_.front());
+    done_.pop_front();
+    --pending_;
+    ulock.unlock();
+    if (completion.error) {
+      std::rethrow_exception(completion.error);
+    }
+    return std::move(*completion.value);
   }
 };
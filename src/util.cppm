@@ -11,24 +11,14 @@ using refw = std::reference_wrapper<T>;
 export template<typename T>
 using crefw = std::reference_wrapper<const T>;
 
-// Waits until any future in the container is ready, pops and returns its value.
-// Returns the result directly (blocks until one is ready).
-export template <typename FutureContainer>
-inline auto pop_when_ready(FutureContainer& futures)
-    -> decltype(std::declval<FutureContainer&>().front().get())
-{
-    using namespace std::chrono_literals;
-    while (true) {
-        for (auto it = futures.begin(); it != futures.end(); ++it) {
-            if (it->wait_for(0s) == std::future_status::ready) {
-                auto val = it->get();
-                futures.erase(it);
-                return val;
-            }
-        }
-        std::this_thread::sleep_for(1ns);
+// Hash for std::pair keys of unordered containers
+export struct PairHash {
+    template<typename A, typename B>
+    std::size_t operator()(const std::pair<A,B>& p) const {
+        std::size_t h = std::hash<A>{}(p.first);
+        return h ^ (std::hash<B>{}(p.second) + 0x9e3779b97f4a7c15ull + (h << 6) + (h >> 2));
     }
-}
+};
 
 export template<typename T>
 bool contains_negative_idx(const std::vector<T>& vec) {
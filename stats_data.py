@@ -0,0 +1,690 @@
+#!/usr/bin/env python3
+"""
+Data layer for the Gamma(n) statistics dashboard
+
+Only an index of which gamma_n_stat.txt / generator files exist is built up
+front. Results for a given n are parsed the first time they are asked for and
+kept in a size-bounded LRU cache.
+"""
+
+import os
+import re
+import zlib
+import struct
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from generator_store import load_generators, load_text_generators, STORE_SUFFIX
+from gamma_isomorphism import gamma_isomorphism
+from dependency_graph import DependencyIndex
+
+CHUNK_BYTES = 1 << 22
+LINES_PER_RESULT = 5
+
+SUMMARY_CACHE_VERSION = 1
+SUMMARY_CACHE_NAME = 'summary_cache.npz'
+
+SUMMARY_COLUMNS = [
+    'n', 'total_generators', 'successful_generators',
+    'gens_with_0', 'gens_with_1', 'gens_with_2', 'gens_with_3plus',
+    'perm_index_0', 'perm_index_1', 'perm_index_2', 'perm_index_3', 'perm_index_4plus',
+    'ypos_0', 'ypos_1', 'ypos_2', 'ypos_3',
+    'most_used_gen', 'avg_products_tested', 'median_products_tested',
+    'max_products_tested', 'total_products_tested'
+]
+
+# Precomputed box plot statistics, one set per distribution shown in the trend plots
+BOX_FIELDS = ['q1', 'median', 'q3', 'lowerfence', 'upperfence', 'mean']
+BOX_DISTRIBUTIONS = ['seq_length', 'inv_perm']
+
+STATS_PATTERN = re.compile(r'gamma_(\d+)_stat\.txt$')
+
+# Binary gamma_n_stat.bin written by the engine next to the text file, see
+# src/statstore.cppm. A 64 byte header followed by one record per generator.
+STAT_STORE_MAGIC = b"HRGSTATS"
+STAT_STORE_VERSION = 1
+STAT_HEADER_STRUCT = struct.Struct("<8sIIqqII")
+STAT_RECORD_DTYPE = np.dtype([
+    ('products', '<u8'),
+    ('attempts', '<u8'),
+    ('parent', '<i4'),
+    ('multiplier1', '<i4'),
+    ('multiplier2', '<i4'),
+    ('k_value', '<i4'),
+    ('inversion_bitmap', '<i4'),
+    ('num_mult', '<i4'),
+    ('success_type', 'u1'),
+    ('ypos', 'i1'),
+    ('perm', 'i1', (4,)),
+    ('reserved', 'u1', (2,)),
+])
+SUCCESS_BY_EQUIVALENCE = 2
+SUCCESS_BY_MULT_TEST = 5
+GENERATORS_PATTERN = re.compile(r'gamma_(\d+)_generators\.(txt|bin)$')
+
+class CheckResult(NamedTuple):
+    products_tested: int
+    inversion_permutation_at_success: int
+    ypos_at_success: int
+    gens_giving_success: List[int]
+    gens_permutation: List[int]
+
+class CheckResults:
+    """
+    Struct-of-arrays view of all CheckResults of one gamma_n_stat.txt file.
+    gens_giving_success and gens_permutation of result i are
+    success_values[success_offsets[i]:success_offsets[i+1]] and
+    permutation_values[permutation_offsets[i]:permutation_offsets[i+1]].
+    Indexing or iterating yields CheckResult tuples for code that wants them.
+    """
+    def __init__(self, products_tested, inversion_permutation_at_success, ypos_at_success,
+                 success_offsets, success_values, permutation_offsets, permutation_values):
+        self.products_tested = products_tested
+        self.inversion_permutation_at_success = inversion_permutation_at_success
+        self.ypos_at_success = ypos_at_success
+        self.success_offsets = success_offsets
+        self.success_values = success_values
+        self.permutation_offsets = permutation_offsets
+        self.permutation_values = permutation_values
+
+    @classmethod
+    def empty(cls):
+        scalar = np.empty(0, dtype=np.int64)
+        offsets = np.zeros(1, dtype=np.int64)
+        return cls(scalar, scalar, scalar, offsets, scalar, offsets, scalar)
+
+    @classmethod
+    def concatenate(cls, parts):
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+
+        def join_offsets(offsets):
+            shifted = [offsets[0]]
+            base = offsets[0][-1]
+            for o in offsets[1:]:
+                shifted.append(o[1:] + base)
+                base += o[-1]
+            return np.concatenate(shifted)
+
+        return cls(
+            np.concatenate([p.products_tested for p in parts]),
+            np.concatenate([p.inversion_permutation_at_success for p in parts]),
+            np.concatenate([p.ypos_at_success for p in parts]),
+            join_offsets([p.success_offsets for p in parts]),
+            np.concatenate([p.success_values for p in parts]),
+            join_offsets([p.permutation_offsets for p in parts]),
+            np.concatenate([p.permutation_values for p in parts])
+        )
+
+    def __len__(self):
+        return len(self.products_tested)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"CheckResults index {i} out of range")
+        return CheckResult(
+            int(self.products_tested[i]),
+            int(self.inversion_permutation_at_success[i]),
+            int(self.ypos_at_success[i]),
+            self.gens_giving_success(i).tolist(),
+            self.gens_permutation(i).tolist()
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def gens_giving_success(self, i):
+        return self.success_values[self.success_offsets[i]:self.success_offsets[i + 1]]
+
+    def gens_permutation(self, i):
+        return self.permutation_values[self.permutation_offsets[i]:self.permutation_offsets[i + 1]]
+
+    def successful(self):
+        """Boolean mask of the generators that were solved"""
+        return self.products_tested > 0
+
+    def sequence_lengths(self):
+        """Length of gens_giving_success for every result"""
+        return np.diff(self.success_offsets)
+
+    def success_values_of(self, mask):
+        """Concatenated gens_giving_success of the results selected by mask"""
+        return self.success_values[np.repeat(mask, self.sequence_lengths())]
+
+def _parse_vector_column(column, first_line, column_offset):
+    # column: bytes lines of the form ":a,b,c", ":" for an empty vector
+    column = np.char.strip(column)
+    bad = ~np.char.startswith(column, b':')
+    if bad.any():
+        entry = int(np.flatnonzero(bad)[0])
+        line = first_line + LINES_PER_RESULT*entry + column_offset
+        raise ValueError(f"line {line}: expected ':'-prefixed vector, got {column[entry]!r}")
+    lengths = np.char.str_len(column)
+    counts = np.where(lengths > 1, np.char.count(column, b',') + 1, 0)
+    offsets = np.zeros(len(column) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    bodies = [c[1:] for c in column[lengths > 1].tolist()]
+    if bodies:
+        values = np.array(b','.join(bodies).split(b','), dtype='S').astype(np.int64)
+    else:
+        values = np.empty(0, dtype=np.int64)
+    return offsets, values
+
+def _parse_result_lines(lines, first_line):
+    # lines: a multiple of LINES_PER_RESULT byte strings, first_line is the
+    # 1-based line number of lines[0] for error messages
+    block = np.array(lines, dtype='S').reshape(-1, LINES_PER_RESULT)
+    try:
+        scalars = block[:, :3].astype(np.int64)
+    except ValueError as e:
+        raise ValueError(f"line {first_line}+: invalid integer in result block: {e}") from None
+    success_offsets, success_values = _parse_vector_column(block[:, 3], first_line, 3)
+    permutation_offsets, permutation_values = _parse_vector_column(block[:, 4], first_line, 4)
+    return CheckResults(
+        np.ascontiguousarray(scalars[:, 0]),
+        np.ascontiguousarray(scalars[:, 1]),
+        np.ascontiguousarray(scalars[:, 2]),
+        success_offsets, success_values,
+        permutation_offsets, permutation_values
+    )
+
+def parse_check_results(filename, chunk_bytes=CHUNK_BYTES) -> CheckResults:
+    """
+    Parse a gamma_n_stat.txt file into CheckResults. The file is streamed in
+    chunks of whole results; malformed input raises ValueError. An incomplete
+    last result, as left by a run killed while writing, is dropped.
+    """
+    parts = []
+    pending = []
+    tail = b''
+    first_line = 1
+    with open(filename, 'rb') as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind(b'\n') + 1
+            tail = block[cut:]
+            if not cut:
+                continue
+            pending.extend(block[:cut - 1].split(b'\n'))
+            complete = len(pending) - len(pending) % LINES_PER_RESULT
+            if complete:
+                parts.append(_parse_result_lines(pending[:complete], first_line))
+                first_line += complete
+                del pending[:complete]
+    if tail:
+        pending.append(tail)
+    # Trailing blank lines are not an error
+    while pending and not pending[-1].strip():
+        pending.pop()
+    partial = len(pending) % LINES_PER_RESULT
+    if partial:
+        print(f"{filename}: dropping incomplete result at line {first_line + len(pending) - partial}")
+        del pending[len(pending) - partial:]
+    if pending:
+        parts.append(_parse_result_lines(pending, first_line))
+    return CheckResults.concatenate(parts)
+
+def _from_check_result_list(results):
+    # CheckResults from a list of CheckResult tuples
+    def csr(vectors):
+        offsets = np.zeros(len(vectors) + 1, dtype=np.int64)
+        np.cumsum([len(v) for v in vectors], out=offsets[1:])
+        values = np.array([x for v in vectors for x in v], dtype=np.int64)
+        return offsets, values
+    return CheckResults(
+        np.array([r.products_tested for r in results], dtype=np.int64),
+        np.array([r.inversion_permutation_at_success for r in results], dtype=np.int64),
+        np.array([r.ypos_at_success for r in results], dtype=np.int64),
+        *csr([r.gens_giving_success for r in results]),
+        *csr([r.gens_permutation for r in results])
+    )
+
+def load_check_results(filename) -> CheckResults:
+    """
+    parse_check_results that reports problems and returns no results instead
+    of raising, as the dashboard expects
+    """
+    try:
+        return parse_check_results(filename)
+    except FileNotFoundError:
+        print(f"File {filename} not found")
+    except Exception as e:
+        print(f"Error reading file {filename}: {e}")
+    return CheckResults.empty()
+
+def deserialize_check_results(filename: str) -> List[CheckResult]:
+    """
+    Deserialize CheckResult vector from text file.
+    """
+    return list(load_check_results(filename))
+
+def load_stat_records(filename, verify=True):
+    """
+    (n, records) of a gamma_n_stat.bin file, records is a structured array
+    of STAT_RECORD_DTYPE with one entry per generator
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if len(data) < STAT_HEADER_STRUCT.size:
+        raise ValueError(f"{filename}: truncated header")
+    magic, version, header_size, n, count, record_size, checksum = STAT_HEADER_STRUCT.unpack_from(data)
+    if magic != STAT_STORE_MAGIC:
+        raise ValueError(f"{filename}: not a statistics store (bad magic)")
+    if version != STAT_STORE_VERSION or record_size != STAT_RECORD_DTYPE.itemsize:
+        raise ValueError(f"{filename}: unsupported statistics store version {version}")
+    payload = data[header_size:]
+    if len(payload) != count * record_size:
+        raise ValueError(f"{filename}: size does not match its header")
+    if verify and zlib.crc32(payload) != checksum:
+        raise ValueError(f"{filename}: checksum mismatch")
+    return n, np.frombuffer(payload, dtype=STAT_RECORD_DTYPE)
+
+def check_results_from_records(records) -> CheckResults:
+    """
+    The CheckResults the engine wrote to gamma_n_stat.txt for the same run
+    """
+    num = len(records)
+    success_type = records['success_type']
+    solved = success_type != 0
+    mult = success_type == SUCCESS_BY_MULT_TEST
+    equivalence = success_type == SUCCESS_BY_EQUIVALENCE
+    perm = records['perm'].astype(np.int64)
+    # Factor j of a mult product is perm[j] into (self, multiplier1, multiplier2, k)
+    in_product = mult[:, None] & (np.arange(4) < records['num_mult'][:, None]) & (perm >= 0)
+
+    factors = np.stack([
+        np.arange(num, dtype=np.int64),
+        records['multiplier1'].astype(np.int64),
+        records['multiplier2'].astype(np.int64),
+        np.full(num, -1, dtype=np.int64)
+    ], axis=1)
+    used = np.take_along_axis(factors, np.where(perm >= 0, perm, 3), axis=1)
+    deps = np.concatenate([records['parent'].astype(np.int64)[:, None], used], axis=1)
+    dep_mask = np.concatenate([
+        equivalence[:, None],
+        in_product & (used != -1) & (used != np.arange(num)[:, None])
+    ], axis=1)
+
+    def csr(values, mask):
+        offsets = np.zeros(num + 1, dtype=np.int64)
+        np.cumsum(mask.sum(axis=1), out=offsets[1:])
+        return offsets, values[mask]
+
+    return CheckResults(
+        np.where(solved, np.maximum(records['products'], 1), 0).astype(np.int64),
+        np.where(mult, records['inversion_bitmap'], 0).astype(np.int64),
+        np.where(mult, records['ypos'], 0).astype(np.int64),
+        *csr(deps, dep_mask),
+        *csr(perm, in_product)
+    )
+
+def index_files(directory, pattern):
+    """
+    Map n -> path for every file in directory whose name matches pattern.
+    Only directory entries are read, no file contents.
+    """
+    index = {}
+    if not os.path.isdir(directory):
+        return index
+    for entry in os.scandir(directory):
+        match = pattern.match(entry.name)
+        if match:
+            n = int(match.group(1))
+            # Prefer the binary generator store over the text file
+            if n in index and not entry.name.endswith(STORE_SUFFIX):
+                continue
+            index[n] = entry.path
+    return index
+
+def gamma_isomorphism_np(mat: np.ndarray, n: int) -> np.ndarray:
+    """
+    Apply the gamma_isomorphism transformation to a 2x2 numpy matrix (in-place).
+    mat: shape (2,2), dtype np.int64
+    """
+    mat = mat.copy()
+    mat[0,0] -= 1
+    mat[1,1] -= 1
+    mat[0,0] //= n
+    mat[0,1] //= n
+    mat[1,0] //= n
+    mat[1,1] //= n
+    return mat
+
+def load_generator_matrices_for_n(path, n):
+    """
+    gamma_isomorphism transformed generators of Gamma(n) as an (N,2,2) int64 array
+    """
+    if path.endswith(STORE_SUFFIX):
+        _, gens = load_generators(path)
+    else:
+        gens = load_text_generators(path)
+    return gamma_isomorphism(gens, n).reshape(-1, 2, 2)
+
+class LRUCache:
+    """
+    Thread-safe size-bounded mapping, least recently used entries are evicted
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        # Load outside the lock so a slow parse does not block other keys
+        value = loader()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+def box_statistics(values):
+    """
+    Quartiles, mean and 1.5 IQR whisker ends of values, as plotly draws them
+    """
+    if len(values) == 0:
+        return {field: np.nan for field in BOX_FIELDS}
+    values = np.asarray(values, dtype=np.float64)
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'lowerfence': values[values >= q1 - 1.5*iqr].min(),
+        'upperfence': values[values <= q3 + 1.5*iqr].max(),
+        'mean': values.mean()
+    }
+
+def summarize_results(n, results):
+    """
+    Summary table row of Gamma(n), plus box statistics of the generator
+    sequence lengths and inversion permutations of successful generators
+    """
+    if not isinstance(results, CheckResults):
+        results = _from_check_result_list(results)
+    products_tested = results.products_tested
+    successful = results.successful()
+    successful_generators = int(successful.sum())
+
+    # Generator sequence statistics (sequence length = number of generators used in successful product)
+    generator_seq_lengths = results.sequence_lengths()[successful]
+
+    # Count generators by sequence length (0, 1, 2, 3+ products)
+    generators_with_0 = len(results) - successful_generators  # Failed generators
+    generators_with_1 = int(np.count_nonzero(generator_seq_lengths == 1))
+    generators_with_2 = int(np.count_nonzero(generator_seq_lengths == 2))
+    generators_with_3plus = int(np.count_nonzero(generator_seq_lengths >= 3))
+
+    # Count generators by inversion permutation index at success
+    inversion_perms = results.inversion_permutation_at_success[successful]
+    perm_index_0, perm_index_1, perm_index_2, perm_index_3 = (
+        int(np.count_nonzero(inversion_perms == i)) for i in range(4)
+    )
+    perm_index_4plus = int(np.count_nonzero(inversion_perms >= 4))
+
+    # Count generators by Y position at success
+    ypos_values = results.ypos_at_success[successful]
+    ypos_0, ypos_1, ypos_2, ypos_3 = (int(np.count_nonzero(ypos_values == i)) for i in range(4))
+
+    # Most frequently used generators, smallest index on ties
+    all_gens_used = results.success_values_of(successful)
+    if all_gens_used.size:
+        used, counts = np.unique(all_gens_used, return_counts=True)
+        most_used_generator = int(used[np.argmax(counts)])
+    else:
+        most_used_generator = -1
+
+    # Products tested statistics
+    has_products = products_tested.size > 0
+    median_products_tested = float(np.median(products_tested)) if has_products else 0
+
+    row = {
+        'n': n,
+        'total_generators': len(results),
+        'successful_generators': successful_generators,
+        'gens_with_0': generators_with_0,
+        'gens_with_1': generators_with_1,
+        'gens_with_2': generators_with_2,
+        'gens_with_3plus': generators_with_3plus,
+        'perm_index_0': perm_index_0,
+        'perm_index_1': perm_index_1,
+        'perm_index_2': perm_index_2,
+        'perm_index_3': perm_index_3,
+        'perm_index_4plus': perm_index_4plus,
+        'ypos_0': ypos_0,
+        'ypos_1': ypos_1,
+        'ypos_2': ypos_2,
+        'ypos_3': ypos_3,
+        'most_used_gen': most_used_generator,
+        'avg_products_tested': float(products_tested.mean()) if has_products else 0,
+        'median_products_tested': median_products_tested,
+        'max_products_tested': int(products_tested.max()) if has_products else 0,
+        'total_products_tested': int(products_tested.sum())
+    }
+    for name, values in (('seq_length', generator_seq_lengths), ('inv_perm', inversion_perms)):
+        for field, value in box_statistics(values).items():
+            row[f'{name}_{field}'] = value
+    return row
+
+def create_summary_dataframe(gamma_data):
+    """Create summary statistics DataFrame"""
+    summary_data = [summarize_results(n, results) for n, results in gamma_data.items() if results]
+    df = pd.DataFrame(summary_data)
+    if not df.empty:
+        return df.sort_values('n')
+    else:
+        return df
+
+def file_key(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+class SummaryCache:
+    """
+    On-disk table of summarize_results rows, one per n, keyed by the size and
+    mtime of the stat file it was computed from
+    """
+    def __init__(self, path):
+        self.path = path
+        self.rows = {}    # n -> row dict
+        self.keys = {}    # n -> (size, mtime_ns)
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if int(data['version']) != SUMMARY_CACHE_VERSION:
+                    return
+                columns = [c for c in data.files if c not in ('version', 'size', 'mtime_ns')]
+                for i, n in enumerate(data['n'].tolist()):
+                    self.rows[n] = {c: data[c][i].item() for c in columns}
+                    self.keys[n] = (int(data['size'][i]), int(data['mtime_ns'][i]))
+        except Exception as e:
+            print(f"Ignoring unreadable summary cache {self.path}: {e}")
+            self.rows, self.keys = {}, {}
+
+    def save(self):
+        ns = sorted(self.rows)
+        columns = list(self.rows[ns[0]]) if ns else ['n']
+        arrays = {c: np.array([self.rows[n][c] for n in ns]) for c in columns}
+        arrays['size'] = np.array([self.keys[n][0] for n in ns], dtype=np.int64)
+        arrays['mtime_ns'] = np.array([self.keys[n][1] for n in ns], dtype=np.int64)
+        arrays['version'] = np.array(SUMMARY_CACHE_VERSION)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.path)
+
+    def update(self, stats_index, load_results):
+        """
+        Bring the table in line with stats_index (n -> stat file), recomputing
+        only n whose file is new or changed. Returns True if anything changed.
+        """
+        changed = False
+        for n in list(self.rows):
+            if n not in stats_index:
+                del self.rows[n], self.keys[n]
+                changed = True
+        for n, path in sorted(stats_index.items()):
+            key = file_key(path)
+            if self.keys.get(n) == key:
+                continue
+            results = load_results(n)
+            if results:
+                self.rows[n] = summarize_results(n, results)
+                self.keys[n] = key
+            else:
+                self.rows.pop(n, None)
+                self.keys.pop(n, None)
+            changed = True
+        return changed
+
+    def dataframe(self):
+        return pd.DataFrame([self.rows[n] for n in sorted(self.rows)])
+
+class GammaStatsStore:
+    """
+    Lazily loaded statistics and generator matrices for every available n
+    """
+    def __init__(self, stats_dir='statistics', generators_dir='generators', max_cached=8,
+                 summary_cache_path=None):
+        self.stats_dir = stats_dir
+        self.generators_dir = generators_dir
+        self._results = LRUCache(max_cached)
+        self._matrices = LRUCache(max_cached)
+        self._dependencies = LRUCache(max_cached)
+        if summary_cache_path is None:
+            summary_cache_path = os.path.join(stats_dir, SUMMARY_CACHE_NAME)
+        self._summary_cache = SummaryCache(summary_cache_path)
+        self._summary_lock = threading.Lock()
+        self._summary = None
+        self._summary_keys = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Rebuild the index of available files and drop cached data
+        """
+        self.stats_index = index_files(self.stats_dir, STATS_PATTERN)
+        self.generators_index = index_files(self.generators_dir, GENERATORS_PATTERN)
+        self._results.clear()
+        self._matrices.clear()
+        self._dependencies.clear()
+
+    def available_n(self):
+        return sorted(self.stats_index)
+
+    def has(self, n):
+        return n in self.stats_index
+
+    def has_matrices(self, n):
+        return n in self.generators_index
+
+    def results(self, n):
+        """
+        CheckResults of Gamma(n), parsed on first use
+        """
+        if n not in self.stats_index:
+            return []
+        return self._results.get_or_load(n, lambda: load_check_results(self.stats_index[n]))
+
+    def dependency_index(self, n):
+        """
+        DependencyIndex of Gamma(n), built once per cached n
+        """
+        return self._dependencies.get_or_load(n, lambda: DependencyIndex(self.results(n)))
+
+    def iter_results(self):
+        """
+        Yield (n, results) for every n without pinning them all in memory
+        """
+        for n in self.available_n():
+            yield n, self.results(n)
+
+    def summary(self):
+        """
+        Summary DataFrame of every n, served from the on-disk summary cache.
+        Stat files are only re-read when their size or mtime changed.
+        """
+        with self._summary_lock:
+            keys = {n: file_key(path) for n, path in self.stats_index.items() if os.path.exists(path)}
+            if self._summary is not None and keys == self._summary_keys:
+                return self._summary
+            index = {n: self.stats_index[n] for n in keys}
+            if self._summary_cache.update(index, self.results) and os.path.isdir(self.stats_dir):
+                self._summary_cache.save()
+            self._summary = self._summary_cache.dataframe()
+            self._summary_keys = keys
+            return self._summary
+
+    def generator_matrices(self, n):
+        """
+        gamma_isomorphism transformed (N,2,2) generators of Gamma(n), loaded on first use
+        """
+        if n not in self.generators_index:
+            return None
+        return self._matrices.get_or_load(
+            n, lambda: load_generator_matrices_for_n(self.generators_index[n], n)
+        )
+
+def load_all_gamma_stats(stats_dir='statistics'):
+    """Load all gamma_n_stat.txt files"""
+    data = {}
+    if not os.path.exists(stats_dir):
+        print("Statistics directory not found!")
+        return data
+    for n, filename in sorted(index_files(stats_dir, STATS_PATTERN).items()):
+        results = load_check_results(filename)
+        if results:
+            data[n] = results
+            print(f"Loaded {len(results)} results for Gamma({n})")
+    return data
+
+def load_generator_matrices(generators_dir='generators'):
+    """
+    Load 2x2 matrices for each generator for each n.
+    Expects files: generators/gamma_{n}_generators.txt (or .bin stores)
+    Applies gamma_isomorphism to each matrix.
+    """
+    matrices = {}
+    for n, filename in index_files(generators_dir, GENERATORS_PATTERN).items():
+        try:
+            matrices[n] = load_generator_matrices_for_n(filename, n)
+        except Exception as e:
+            print(f"Error loading generator matrices from {filename}: {e}")
+    return matrices
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Cost- and memory-aware asyncio scheduler for Gamma(n) generator sweeps
+
+Jobs are started longest-first according to a cost model fitted on the
+generator count of Gamma(n) and on runtimes recorded in earlier sweeps, and
+are admitted against a memory budget. Every job runs sage_worker.py in its own
+process, the worker writes its output under a temporary name and renames it
+into place, and the state of every n is kept in a JSON manifest so an
+interrupted sweep resumes where it stopped.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+from sagegen_parallel import worker_command
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST = 'generators/sweep_manifest.json'
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def prime_factors(n):
+    factors = []
+    p = 2
+    while p * p <= n:
+        if n % p == 0:
+            factors.append(p)
+            while n % p == 0:
+                n //= p
+        p += 1
+    if n > 1:
+        factors.append(n)
+    return factors
+
+
+def expected_generator_count(n):
+    """
+    Number of generators SageMath returns for Gamma(n). For n >= 3 the group
+    is free of rank 1 + mu/6 with mu = n^3/2 prod_{p|n} (1 - 1/p^2).
+    """
+    if n == 1:
+        return 2
+    if n == 2:
+        return 3
+    mu = n**3
+    for p in prime_factors(n):
+        mu = mu * (p*p - 1) // (p*p)
+    return 1 + mu // 12
+
+
+class CostModel:
+    """
+    Runtime model seconds = scale * count**exponent, fitted in log-log space
+    on (generator count, seconds) pairs from finished jobs
+    """
+    def __init__(self, scale=1e-6, exponent=2.0):
+        self.scale = scale
+        self.exponent = exponent
+
+    def fit(self, samples):
+        samples = [(c, s) for c, s in samples if c > 1 and s and s > 0]
+        if len(samples) == 1:
+            count, seconds = samples[0]
+            self.scale = seconds / count**self.exponent
+        elif len(samples) >= 2:
+            x = np.log([c for c, _ in samples])
+            y = np.log([s for _, s in samples])
+            if np.ptp(x) > 0:
+                self.exponent, log_scale = np.polyfit(x, y, 1)
+                self.scale = math.exp(log_scale)
+        return self
+
+    def predict(self, n):
+        return self.scale * expected_generator_count(n)**self.exponent
+
+
+class MemoryModel:
+    """
+    Peak memory estimate of one job, base interpreter cost plus a per generator cost
+    """
+    def __init__(self, base_mb=1024.0, per_generator_kb=64.0):
+        self.base_mb = base_mb
+        self.per_generator_kb = per_generator_kb
+
+    def predict(self, n):
+        return self.base_mb + self.per_generator_kb * expected_generator_count(n) / 1024.0
+
+
+class Manifest:
+    """
+    JSON record of every n in a sweep, rewritten atomically after each change
+    """
+    def __init__(self, path):
+        self.path = path
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                raise ValueError(f"{path}: unsupported manifest version {data.get('version')}")
+            self.jobs = {int(n): entry for n, entry in data['jobs'].items()}
+
+    def get(self, n):
+        return self.jobs.setdefault(n, {'status': STATUS_PENDING})
+
+    def update(self, n, **fields):
+        self.get(n).update(fields)
+        self.save()
+
+    def runtime_samples(self):
+        return [
+            (entry['count'], entry['seconds'])
+            for entry in self.jobs.values()
+            if entry.get('status') == STATUS_DONE and entry.get('count') and entry.get('seconds')
+        ]
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'jobs': {str(n): e for n, e in sorted(self.jobs.items())}}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class SweepScheduler:
+    """
+    Runs Gamma(n) jobs longest-first, at most max_workers at a time and within
+    memory_budget_mb of estimated peak memory. A job larger than the whole
+    budget is still run, but only when nothing else is running.
+    """
+    def __init__(self, n_values, max_workers=8, memory_budget_mb=32*1024, engine='sage',
+                 manifest_path=DEFAULT_MANIFEST, output_dir='generators',
+                 cost_model=None, memory_model=None):
+        self.max_workers = max_workers
+        self.memory_budget_mb = memory_budget_mb
+        self.command = worker_command(engine)
+        self.output_dir = output_dir
+        self.manifest = Manifest(manifest_path)
+        self.cost_model = (cost_model or CostModel()).fit(self.manifest.runtime_samples())
+        self.memory_model = memory_model or MemoryModel()
+        self.n_values = list(n_values)
+
+        self._running = 0
+        self._memory_in_use = 0.0
+        self._cond = None
+
+    def output_path(self, n):
+        return os.path.join(self.output_dir, f"gamma_{n}_generators.txt")
+
+    def pending_jobs(self):
+        """
+        n values that still need to run, longest predicted runtime first
+        """
+        pending = []
+        for n in self.n_values:
+            entry = self.manifest.get(n)
+            if entry['status'] == STATUS_DONE and os.path.exists(self.output_path(n)):
+                continue
+            pending.append(n)
+        pending.sort(key=self.cost_model.predict, reverse=True)
+        return pending
+
+    def _fits(self, n):
+        if self._running >= self.max_workers:
+            return False
+        if self._running == 0:
+            return True
+        return self._memory_in_use + self.memory_model.predict(n) <= self.memory_budget_mb
+
+    async def _run_job(self, n):
+        request = json.dumps({'n': n, 'path': self.output_path(n)}) + "\n"
+        proc = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE
+        )
+        # One request, then EOF so the worker exits after answering
+        stdout, _ = await proc.communicate(request.encode())
+        for line in stdout.decode().splitlines():
+            line = line.strip()
+            if line.startswith('{'):
+                message = json.loads(line)
+                if message.get('event') == 'result':
+                    return message
+        return {'n': n, 'ok': False, 'error': f"Worker exited with return code {proc.returncode} without a result"}
+
+    async def _job(self, n, memory_mb):
+        start = time.time()
+        self.manifest.update(n, status=STATUS_RUNNING, started=start,
+                             predicted_seconds=self.cost_model.predict(n), predicted_memory_mb=memory_mb)
+        try:
+            result = await self._run_job(n)
+        except Exception as e:
+            result = {'n': n, 'ok': False, 'error': str(e)}
+        elapsed = time.time() - start
+
+        if result['ok']:
+            self.manifest.update(n, status=STATUS_DONE, count=result['count'],
+                                 seconds=result.get('seconds', elapsed), path=result['path'], finished=time.time())
+            print(f"Gamma({n}): {result['count']} generators in {elapsed:.2f}s")
+        else:
+            self.manifest.update(n, status=STATUS_FAILED, error=result.get('error'), finished=time.time())
+            print(f"FAILED Gamma({n}): {result.get('error')}")
+
+        async with self._cond:
+            self._running -= 1
+            self._memory_in_use -= memory_mb
+            self._cond.notify_all()
+        return result
+
+    async def run(self):
+        self._cond = asyncio.Condition()
+        pending = self.pending_jobs()
+        print(f"{len(pending)} of {len(self.n_values)} jobs to run, longest first: {pending[:10]}")
+
+        tasks = []
+        while pending:
+            async with self._cond:
+                await self._cond.wait_for(lambda: any(self._fits(n) for n in pending))
+                # Longest job that fits the budget, smaller ones backfill
+                n = next(n for n in pending if self._fits(n))
+                pending.remove(n)
+                memory_mb = self.memory_model.predict(n)
+                self._running += 1
+                self._memory_in_use += memory_mb
+            tasks.append(asyncio.create_task(self._job(n, memory_mb)))
+
+        results = await asyncio.gather(*tasks)
+        completed = sum(1 for r in results if r['ok'])
+        return completed, len(self.n_values) - len(results), len(results) - completed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Resumable Gamma(n) generator sweep')
+    parser.add_argument('start_n', type=int)
+    parser.add_argument('end_n', type=int)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--memory-gb', type=float, default=32.0, help='memory budget for concurrently running jobs')
+    parser.add_argument('--engine', choices=['sage', 'farey'], default='sage')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    args = parser.parse_args(argv)
+
+    scheduler = SweepScheduler(
+        range(args.start_n, args.end_n + 1),
+        max_workers=args.workers,
+        memory_budget_mb=args.memory_gb * 1024,
+        engine=args.engine,
+        manifest_path=args.manifest
+    )
+    start = time.time()
+    completed, skipped, failed = asyncio.run(scheduler.run())
+    print("-" * 60)
+    print(f"Completed: {completed}")
+    print(f"Skipped (done in manifest): {skipped}")
+    print(f"Failed: {failed}")
+    print(f"Total time: {time.time() - start:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())